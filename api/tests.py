@@ -0,0 +1,130 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from attendance.models import Attendance
+from employee_attendance_system.testing import TestCase
+from employees.models import Department, Employee, SalaryCalculation
+
+
+STATUSES = [status for status, _ in Attendance.STATUS_CHOICES]
+
+
+def create_employee(number, department, role='EMPLOYEE'):
+    user = User.objects.create_user(f'employe{number}', first_name='Employé', last_name=f'{number:03d}')
+    return Employee.objects.create(
+        user=user,
+        employee_id=f'EMP{number:03d}',
+        department=department,
+        role=role,
+        base_salary=Decimal('1000.00'),
+        hire_date=date(2020, 1, 1),
+    )
+
+
+class ApiTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        rng = random.Random(19)
+        self.it = Department.objects.create(name='Informatique')
+        self.sales = Department.objects.create(name='Ventes')
+        self.hr = create_employee(1, self.it, 'HR')
+        self.manager = create_employee(2, self.sales, 'MANAGER')
+        self.employee = create_employee(3, self.sales)
+        self.other = create_employee(4, self.it)
+        for employee in (self.hr, self.manager, self.employee, self.other):
+            for i in range(12):
+                Attendance.objects.create(
+                    employee=employee, date=date(2025, 3, 3) + timedelta(days=i), status=rng.choice(STATUSES),
+                )
+
+    def get(self, user, name, **params):
+        self.client.force_login(user.user)
+        return self.client.get(reverse(name), params)
+
+    def walk(self, user, name, **params):
+        """Résultats de toutes les pages, en suivant les liens `next`"""
+        self.client.force_login(user.user)
+        results = []
+        url = reverse(name) + '?' + '&'.join(f'{key}={value}' for key, value in params.items())
+        while url:
+            body = self.client.get(url).json()
+            results.extend(body['results'])
+            url = body['next']
+        return results
+
+    def test_attendance_visibility(self):
+        def employees(user):
+            return {row['employee_id'] for row in self.walk(user, 'api:attendance', page_size=50)}
+
+        self.assertEqual(employees(self.hr), {self.hr.id, self.manager.id, self.employee.id, self.other.id})
+        self.assertEqual(employees(self.manager), {self.manager.id, self.employee.id})
+        self.assertEqual(employees(self.employee), {self.employee.id})
+
+    def test_cursor_pages_cover_the_filtered_rows_once(self):
+        rows = self.walk(self.hr, 'api:attendance', page_size=7, date_from='2025-03-05', date_to='2025-03-10')
+        expected = Attendance.objects.filter(date__range=(date(2025, 3, 5), date(2025, 3, 10))).order_by('-date', '-id')
+        self.assertEqual([row['id'] for row in rows], list(expected.values_list('id', flat=True)))
+
+        self.client.force_login(self.hr.user)
+        invalid = self.client.get(reverse('api:attendance'), {'page_size': 7, 'cursor': 'abc'})
+        self.assertEqual(invalid.status_code, 400)
+
+    def test_etag_revalidation(self):
+        first = self.get(self.employee, 'api:attendance', page_size=5)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('private', first['Cache-Control'])
+
+        again = self.client.get(reverse('api:attendance'), {'page_size': 5}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
+
+        attendance = Attendance.objects.filter(employee=self.employee).order_by('-date').first()
+        attendance.notes = 'Corrigé'
+        attendance.save()
+        changed = self.client.get(reverse('api:attendance'), {'page_size': 5}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+        self.assertEqual(changed.json()['results'][0]['notes'], 'Corrigé')
+
+    def test_salaries_and_parameters(self):
+        for employee in (self.employee, self.other):
+            SalaryCalculation.objects.create(
+                employee=employee, month=3, year=2025, base_salary=Decimal('1000.00'),
+                attendance_percentage=Decimal('80.00'), net_salary=Decimal('1000.00'),
+            )
+        self.assertEqual(len(self.get(self.hr, 'api:salaries', month=3).json()['results']), 2)
+        own = self.get(self.employee, 'api:salaries').json()['results']
+        self.assertEqual([row['employee_id'] for row in own], [self.employee.id])
+        self.assertEqual(own[0]['net_salary'], '1000.00')
+
+        self.assertEqual(self.get(self.hr, 'api:salaries', month=13).status_code, 400)
+        self.assertEqual(self.get(self.hr, 'api:attendance', date_from='2025-02-30').status_code, 400)
+
+    def test_access_errors(self):
+        self.assertEqual(self.client.get(reverse('api:attendance')).status_code, 401)
+        self.client.force_login(self.hr.user)
+        self.assertEqual(self.client.post(reverse('api:attendance')).status_code, 405)
+        self.client.force_login(User.objects.create_user('sans_profil'))
+        self.assertEqual(self.client.get(reverse('api:attendance')).status_code, 403)
+
+    def test_calendar_and_heatmap(self):
+        calendar = self.get(self.employee, 'api:calendar', year=2025).json()
+        march = calendar['months']['3']
+        self.assertEqual(len(march), 31)
+        attendance = Attendance.objects.get(employee=self.employee, date=date(2025, 3, 5))
+        self.assertEqual(calendar['statuses'][march[4]], attendance.status)
+        self.assertEqual(march[:2] + march[14:], [None] * 19)
+
+        self.assertEqual(self.get(self.employee, 'api:calendar', employee=self.other.id).status_code, 404)
+        self.assertEqual(self.get(self.manager, 'api:calendar', employee=self.employee.id).status_code, 200)
+        self.assertEqual(self.get(self.employee, 'api:heatmap').status_code, 403)
+        self.assertEqual(self.get(self.manager, 'api:heatmap', department=self.it.id).status_code, 403)
+
+        heatmap = self.get(self.manager, 'api:heatmap', year=2025).json()
+        self.assertEqual([row['employee_id'] for row in heatmap['employees']], ['EMP002', 'EMP003'])
+        self.assertEqual(heatmap['employees'][1]['months']['3'], march)
@@ -0,0 +1,12 @@
+from django.urls import path
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('v1/attendance/', views.attendance, name='attendance'),
+    path('v1/leaves/', views.leaves, name='leaves'),
+    path('v1/salaries/', views.salaries, name='salaries'),
+    path('v1/calendar/', views.calendar, name='calendar'),
+    path('v1/heatmap/', views.heatmap, name='heatmap'),
+]
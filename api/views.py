@@ -0,0 +1,319 @@
+"""
+API JSON en lecture seule (v1) : présences, demandes de congé et salaires.
+
+Mêmes règles de visibilité que les pages HTML : HR voit tout, un manager
+les présences de son département, les autres rôles uniquement leurs
+propres données. Les listes sont paginées par curseur (keyset) et ne
+lisent que des projections values() des colonnes de la table.
+
+Chaque page porte un ETag fort dérivé des identifiants des lignes et de
+leur date de modification la plus récente : un client qui renvoie
+If-None-Match reçoit un 304 sans que la page soit sérialisée ni renvoyée.
+
+Le calendrier d'un employé et la heatmap d'un département sont décodés
+des bitmaps des résumés mensuels (attendance.bitmaps) : une année de tout
+un département se lit en une requête de quelques Ko.
+"""
+
+import hashlib
+import json
+from functools import wraps
+
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date
+from django.utils import timezone
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_safe
+
+from attendance.archive import attendance_sources
+from attendance.bitmaps import CODE_STATUSES, day_codes
+from attendance.models import AttendanceMonthlySummary, LeaveRequest
+from attendance.pagination import InvalidCursor, keyset_page, page_links, page_size_from
+from employees.middleware import get_employee_context
+from employees.models import Employee, SalaryCalculation
+
+
+API_VERSION = 1
+
+ATTENDANCE_FIELDS = [
+    'id', 'employee_id', 'date', 'status', 'check_in_time', 'check_out_time',
+    'notes', 'marked_by_id', 'created_at', 'updated_at',
+]
+LEAVE_FIELDS = [
+    'id', 'employee_id', 'start_date', 'end_date', 'reason', 'status',
+    'approved_by_id', 'approved_at', 'created_at', 'updated_at',
+]
+SALARY_FIELDS = [
+    'id', 'employee_id', 'year', 'month', 'base_salary', 'attendance_percentage',
+    'deduction_amount', 'net_salary', 'is_paid', 'created_at', 'updated_at',
+]
+# Statut de chaque code des calendriers
+CALENDAR_STATUSES = [CODE_STATUSES[code] for code in sorted(CODE_STATUSES)]
+
+
+class BadRequest(ValueError):
+    """Paramètre de requête invalide (réponse 400)"""
+
+
+def api_view(*roles):
+    """
+    Vue d'API en lecture seule (GET/HEAD) réservée aux employés connectés
+    et, si `roles` est donné, à ces rôles. Les erreurs sont renvoyées en
+    JSON (401, 403, 400) au lieu d'une redirection.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        @require_safe
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return JsonResponse({'error': 'Authentification requise.'}, status=401)
+            context = get_employee_context(request)
+            if context is None:
+                return JsonResponse({'error': 'Profil employé non trouvé.'}, status=403)
+            if roles and context.role not in roles:
+                return JsonResponse({'error': 'Accès non autorisé.'}, status=403)
+            try:
+                return view_func(request, *args, **kwargs)
+            except (BadRequest, InvalidCursor) as e:
+                return JsonResponse({'error': str(e)}, status=400)
+        return wrapper
+    return decorator
+
+
+def date_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise BadRequest(f"Paramètre {name} invalide (format AAAA-MM-JJ attendu).")
+    return parsed
+
+
+def int_param(params, name, minimum=None, maximum=None):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        raise BadRequest(f"Paramètre {name} invalide (entier attendu).")
+    if (minimum is not None and number < minimum) or (maximum is not None and number > maximum):
+        raise BadRequest(f"Paramètre {name} hors limites.")
+    return number
+
+
+def page_etag(page, timestamps):
+    """ETag fort d'une page : identifiants, modification la plus récente et curseurs"""
+    rows = page['object_list']
+    latest = max(
+        (row[field] for row in rows for field in timestamps if row[field] is not None),
+        default=None,
+    )
+    payload = json.dumps(
+        [API_VERSION, [row['id'] for row in rows], latest, page['next_cursor'], page['previous_cursor']],
+        default=str,
+    )
+    return quote_etag(hashlib.sha256(payload.encode()).hexdigest()[:32])
+
+
+def page_response(request, queryset, fields, cursor_fields, timestamps):
+    """
+    Page JSON de `queryset` (ou d'une liste de querysets, voir
+    keyset_page) projetée sur `fields`, ou 304 si l'ETag envoyé par le
+    client correspond toujours à la page.
+    """
+    querysets = queryset if isinstance(queryset, list) else [queryset]
+    page = page_links(request, keyset_page(
+        [queryset.values(*fields) for queryset in querysets],
+        cursor=request.GET.get('cursor'),
+        page_size=page_size_from(request.GET),
+        fields=cursor_fields,
+    ))
+    etag = page_etag(page, timestamps)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse({
+            'version': API_VERSION,
+            'count': len(page['object_list']),
+            'next': f"{request.path}?{page['next_query']}" if page['next_query'] else None,
+            'previous': f"{request.path}?{page['previous_query']}" if page['previous_query'] else None,
+            'results': page['object_list'],
+        })
+    response['ETag'] = etag
+    # Données personnelles : jamais dans un cache partagé, revalidées à chaque requête
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def json_response(request, payload):
+    """Réponse JSON de `payload` avec un ETag fort de son contenu, ou 304"""
+    body = json.dumps(payload).encode()
+    etag = quote_etag(hashlib.sha256(body).hexdigest()[:32])
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def year_param(params):
+    return int_param(params, 'year', 1900, 9999) or timezone.localdate().year
+
+
+@api_view()
+def attendance(request):
+    """
+    Présences : toutes pour HR, celles du département pour un manager,
+    les siennes pour un employé. Filtres : status, date_from, date_to,
+    employee, department.
+    """
+    context = request.employee_context
+    params = request.GET
+
+    conditions = Q()
+    if context.role == 'MANAGER':
+        conditions &= Q(employee__department_id=context.department_id)
+    elif context.role != 'HR':
+        conditions &= Q(employee_id=context.id)
+
+    if params.get('status'):
+        conditions &= Q(status=params['status'])
+    employee_id = int_param(params, 'employee')
+    if employee_id:
+        conditions &= Q(employee_id=employee_id)
+    department_id = int_param(params, 'department')
+    if department_id:
+        conditions &= Q(employee__department_id=department_id)
+
+    # Table vive et archives des années de la période
+    attendances = [
+        source.filter(conditions)
+        for source in attendance_sources(date_param(params, 'date_from'), date_param(params, 'date_to'))
+    ]
+    return page_response(request, attendances, ATTENDANCE_FIELDS, ('date', 'id'), ('updated_at',))
+
+
+@api_view()
+def leaves(request):
+    """Demandes de congé : toutes pour HR, les siennes pour les autres rôles. Filtre : status"""
+    context = request.employee_context
+
+    leave_requests = LeaveRequest.objects.all()
+    if context.role != 'HR':
+        leave_requests = leave_requests.filter(employee_id=context.id)
+    if request.GET.get('status'):
+        leave_requests = leave_requests.filter(status=request.GET['status'])
+
+    # Tout changement de statut (y compris l'annulation) avance updated_at
+    return page_response(request, leave_requests, LEAVE_FIELDS, ('created_at', 'id'), ('updated_at',))
+
+
+@api_view()
+def salaries(request):
+    """
+    Calculs de salaire : tous pour HR, les siens pour les autres rôles.
+    Filtres : year, month, employee.
+    """
+    context = request.employee_context
+    params = request.GET
+
+    calculations = SalaryCalculation.objects.all()
+    if context.role != 'HR':
+        calculations = calculations.filter(employee_id=context.id)
+
+    year = int_param(params, 'year')
+    if year:
+        calculations = calculations.filter(year=year)
+    month = int_param(params, 'month', 1, 12)
+    if month:
+        calculations = calculations.filter(month=month)
+    employee_id = int_param(params, 'employee')
+    if employee_id:
+        calculations = calculations.filter(employee_id=employee_id)
+
+    return page_response(
+        request, calculations, SALARY_FIELDS, ('year', 'month', 'id'), ('created_at', 'updated_at')
+    )
+
+
+@api_view()
+def calendar(request):
+    """
+    Calendrier d'une année d'un employé : pour chaque mois marqué, le code
+    du statut de chaque jour (null si non marqué). Paramètres : year,
+    employee (tous pour HR, ceux du département pour un manager, sinon soi-même).
+    """
+    context = request.employee_context
+    year = year_param(request.GET)
+    employee_id = int_param(request.GET, 'employee') or context.id
+
+    if employee_id != context.id:
+        employees = Employee.objects.filter(id=employee_id)
+        if context.role == 'MANAGER':
+            employees = employees.filter(department_id=context.department_id)
+        elif context.role != 'HR':
+            employees = employees.none()
+        if not employees.exists():
+            return JsonResponse({'error': 'Employé non trouvé.'}, status=404)
+
+    rows = AttendanceMonthlySummary.objects.filter(employee_id=employee_id, year=year).order_by(
+        'month'
+    ).values_list('month', 'marked_days', 'day_statuses')
+    return json_response(request, {
+        'version': API_VERSION,
+        'employee': employee_id,
+        'year': year,
+        'statuses': CALENDAR_STATUSES,
+        'months': {month: day_codes(marked, statuses, year, month) for month, marked, statuses in rows},
+    })
+
+
+@api_view('HR', 'MANAGER')
+def heatmap(request):
+    """
+    Heatmap d'une année d'un département : le calendrier de chaque employé,
+    en une seule requête sur les résumés mensuels. Paramètres : year,
+    department (tous pour HR, le sien pour un manager).
+    """
+    context = request.employee_context
+    year = year_param(request.GET)
+    department_id = int_param(request.GET, 'department') or context.department_id
+    if department_id is None:
+        raise BadRequest("Paramètre department requis.")
+    if context.role == 'MANAGER' and department_id != context.department_id:
+        return JsonResponse({'error': 'Accès non autorisé.'}, status=403)
+
+    rows = AttendanceMonthlySummary.objects.filter(
+        employee__department_id=department_id,
+        year=year,
+    ).order_by('employee_id', 'month').values_list(
+        'employee_id', 'employee__employee_id', 'employee__user__first_name', 'employee__user__last_name',
+        'month', 'marked_days', 'day_statuses',
+    )
+    employees = []
+    for employee_id, number, first_name, last_name, month, marked, statuses in rows:
+        if not employees or employees[-1]['id'] != employee_id:
+            employees.append({
+                'id': employee_id,
+                'employee_id': number,
+                'name': f'{first_name} {last_name}'.strip(),
+                'months': {},
+            })
+        employees[-1]['months'][month] = day_codes(marked, statuses, year, month)
+
+    return json_response(request, {
+        'version': API_VERSION,
+        'department': department_id,
+        'year': year,
+        'statuses': CALENDAR_STATUSES,
+        'employees': employees,
+    })
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class AttendanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'attendance'
+
+    def ready(self):
+        from .archive import sync_archive_schemas
+
+        # Les tables d'archive, hors migrations, suivent le modèle Attendance
+        post_migrate.connect(sync_archive_schemas, sender=self, dispatch_uid='attendance.sync_archive_schemas')
@@ -0,0 +1,267 @@
+"""
+Archivage annuel des présences.
+
+Les années closes sont déplacées de la table vive vers une table par
+année (attendance_attendance_<année>, mêmes colonnes et mêmes index),
+inscrite dans AttendanceArchive. La table vive ne garde que les années
+ouvertes : ses index, et les opérations du mois courant, ne grossissent
+plus avec l'historique.
+
+Les résumés mensuels (compteurs et bitmaps) restent en place : paie,
+tableaux de bord et calendriers des années archivées n'ont pas besoin des
+archives. Les lectures ligne à ligne passent par `attendance_sources`,
+qui route une requête bornée en dates vers la table vive et les seules
+archives des années concernées.
+
+Un jour n'a qu'une ligne, toutes tables confondues. Les écritures en
+masse (attendance.bulk) mettent à jour un jour archivé dans son archive
+et créent un nouveau jour d'une année archivée dans la table vive, où il
+prend son identifiant, avant de l'y déplacer (`move_to_archive`) ;
+Attendance.save() refuse de créer un tel jour.
+
+Les tables d'archive n'ont pas de contraintes de clé étrangère : la
+suppression d'un employé ou d'une demande de congé ne les modifie pas.
+
+Elles sont créées hors des migrations, d'après le modèle Attendance
+courant. Après chaque migrate, `sync_archive_schemas` (post_migrate)
+reconstruit celles dont le schéma ne correspond plus au modèle : une
+migration d'Attendance n'a rien à faire de plus. Une colonne ajoutée
+prend sa valeur par défaut dans les archives, une colonne supprimée ou
+renommée y est perdue (à recopier par une migration de données si
+besoin).
+"""
+
+import hashlib
+import json
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connection, connections, models, transaction
+from django.utils import timezone
+
+from .models import Attendance, AttendanceArchive
+from .periods import year_filter
+
+
+# Présences déplacées par transaction
+CHUNK_SIZE = 5000
+
+_archive_models = {}
+
+
+def archive_table(year):
+    return f'{Attendance._meta.db_table}_{year}'
+
+
+def _archive_field(field):
+    name, path, args, kwargs = field.deconstruct()
+    if field.is_relation:
+        kwargs.update(related_name='+', on_delete=models.DO_NOTHING, db_constraint=False)
+    # Index de champ déclarés dans Meta.indexes (voir archive_model)
+    kwargs['db_index'] = False
+    # Les dates de création et de modification sont recopiées telles quelles
+    kwargs.pop('auto_now', None)
+    kwargs.pop('auto_now_add', None)
+    return field.__class__(*args, **kwargs)
+
+
+def archive_model(year):
+    """Modèle (non géré par les migrations) de la table d'archive de `year`"""
+    if year not in _archive_models:
+        indexes = []
+        for index in Attendance._meta.indexes:
+            index = index.clone()
+            index.name = index.name.replace('attendance_', f'att{year}_')
+            indexes.append(index)
+        for field in Attendance._meta.local_concrete_fields:
+            if field.db_index and not field.unique:
+                indexes.append(models.Index(fields=[field.name], name=f'att{year}_{field.column}'[:26] + '_idx'))
+        meta = type('Meta', (), {
+            'app_label': Attendance._meta.app_label,
+            'db_table': archive_table(year),
+            'managed': False,
+            'unique_together': Attendance._meta.unique_together,
+            'indexes': indexes,
+        })
+        attrs = {'__module__': __name__, 'Meta': meta}
+        for field in Attendance._meta.local_concrete_fields:
+            attrs[field.name] = _archive_field(field)
+        _archive_models[year] = type(f'AttendanceArchive{year}', (models.Model,), attrs)
+    return _archive_models[year]
+
+
+def archived_years():
+    """
+    Années inscrites dans AttendanceArchive, de la plus récente à la plus
+    ancienne. Une requête par appel : une opération la lit une fois et la
+    passe (`archived=`) aux fonctions qu'elle appelle.
+    """
+    return list(AttendanceArchive.objects.order_by('-year').values_list('year', flat=True))
+
+
+def attendance_sources(date_from=None, date_to=None, archived=None):
+    """
+    Querysets couvrant [date_from, date_to] (bornes incluses, facultatives),
+    filtrés sur ces dates : la table vive, puis l'archive de chaque année
+    archivée qui recoupe l'intervalle, de la plus récente à la plus ancienne.
+    `archived` : années archivées déjà lues par l'opération en cours
+    (archived_years), pour ne pas les relire à chaque appel.
+
+    La table vive est toujours interrogée (par l'index sur date, une
+    recherche vide ne coûte rien) : une année en cours d'archivage est
+    répartie entre les deux tables.
+    """
+    dates = {}
+    if date_from is not None:
+        dates['date__gte'] = date_from
+    if date_to is not None:
+        dates['date__lte'] = date_to
+
+    sources = [Attendance.objects.filter(**dates)]
+    for year in archived_years() if archived is None else archived:
+        if (date_from is None or year >= date_from.year) and (date_to is None or year <= date_to.year):
+            sources.append(archive_model(year).objects.filter(**dates))
+    return sources
+
+
+def schema_signature(year, using=DEFAULT_DB_ALIAS):
+    """
+    Empreinte du schéma que le modèle Attendance courant donne à l'archive
+    de `year` : colonnes (type, nullité), index et unicité
+    """
+    model = archive_model(year)
+    columns = [
+        [field.column, field.db_parameters(connections[using])['type'], field.null, field.primary_key, field.unique]
+        for field in model._meta.local_concrete_fields
+    ]
+    indexes = sorted([index.name, list(index.fields)] for index in model._meta.indexes)
+    unique = sorted(list(fields) for fields in model._meta.unique_together)
+    return hashlib.sha256(json.dumps([columns, indexes, unique]).encode()).hexdigest()
+
+
+def _create_table(editor, model):
+    """
+    Crée la table de `model` et ses index : pour un modèle non géré,
+    create_model ne crée que la table et ses contraintes d'unicité
+    """
+    editor.create_model(model)
+    for index in model._meta.indexes:
+        editor.add_index(model, index)
+
+
+def create_archive(year):
+    """Crée la table d'archive de `year` si besoin et l'inscrit dans AttendanceArchive"""
+    model = archive_model(year)
+    if model._meta.db_table not in connection.introspection.table_names():
+        with connection.schema_editor() as editor:
+            _create_table(editor, model)
+    archive, _ = AttendanceArchive.objects.get_or_create(
+        year=year,
+        defaults={'table_name': model._meta.db_table, 'schema': schema_signature(year)},
+    )
+    return archive
+
+
+def rebuild_archive(year, using=DEFAULT_DB_ALIAS):
+    """
+    Recrée la table d'archive de `year` d'après le modèle Attendance
+    courant et y recopie ses lignes : colonnes conservées telles quelles,
+    colonnes ajoutées à leur valeur par défaut, colonnes disparues
+    abandonnées. Une seule transaction là où le SGBD le permet.
+    """
+    db = connections[using]
+    model = archive_model(year)
+    table = model._meta.db_table
+    backup = f'{table}_old'
+    qn = db.ops.quote_name
+    with db.cursor() as cursor:
+        old_columns = {column.name for column in db.introspection.get_table_description(cursor, table)}
+
+    with db.schema_editor() as editor:
+        columns, values, params = [], [], []
+        for field in model._meta.local_concrete_fields:
+            columns.append(qn(field.column))
+            if field.column in old_columns:
+                values.append(qn(field.column))
+                continue
+            default = editor.effective_default(field)
+            if default is None and not field.null:
+                raise ImproperlyConfigured(
+                    f"Attendance.{field.name} n'a pas de valeur par défaut : "
+                    f"impossible de l'ajouter à l'archive {year}."
+                )
+            values.append('%s')
+            params.append(default)
+
+        editor.execute(f'CREATE TABLE {qn(backup)} AS SELECT * FROM {qn(table)}')
+        editor.execute(editor.sql_delete_table % {'table': qn(table)})
+        _create_table(editor, model)
+        editor.execute(
+            f'INSERT INTO {qn(table)} ({", ".join(columns)}) SELECT {", ".join(values)} FROM {qn(backup)}',
+            params,
+        )
+        editor.execute(editor.sql_delete_table % {'table': qn(backup)})
+
+
+def sync_archive_schemas(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Récepteur post_migrate : reconstruit les tables d'archive dont
+    l'empreinte de schéma ne correspond plus au modèle Attendance courant
+    """
+    db = connections[using]
+    if AttendanceArchive._meta.db_table not in db.introspection.table_names():
+        return
+    for archive in AttendanceArchive.objects.using(using):
+        signature = schema_signature(archive.year, using)
+        if archive.schema == signature:
+            continue
+        rebuild_archive(archive.year, using)
+        AttendanceArchive.objects.using(using).filter(pk=archive.pk).update(schema=signature)
+
+
+def move_to_archive(year, attendances):
+    """
+    Déplace les présences `attendances` (queryset de la table vive, toutes
+    de l'année `year`) dans l'archive de `year` : INSERT ... SELECT puis
+    DELETE, en gardant leurs identifiants. À appeler dans une transaction.
+    Les résumés mensuels ne changent pas. Retourne le nombre de présences
+    déplacées.
+    """
+    model = archive_model(year)
+    qn = connection.ops.quote_name
+    fields = Attendance._meta.local_concrete_fields
+    insert = 'INSERT INTO {} ({}) '.format(
+        qn(model._meta.db_table),
+        ', '.join(qn(field.column) for field in fields),
+    )
+    attendances = attendances.order_by()
+    select, params = attendances.values_list(*(field.attname for field in fields)).query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(insert + select, params)
+    moved, _ = attendances.delete()
+    AttendanceArchive.objects.filter(year=year).update(rows=models.F('rows') + moved)
+    return moved
+
+
+def archive_year(year, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Déplace les présences de `year` de la table vive vers son archive, par
+    lots de `chunk_size` présences (une transaction par lot). Une reprise
+    après interruption continue là où le déplacement s'est arrêté.
+    `progress(présences déplacées)` est appelé après chaque lot. Retourne
+    le nombre de présences déplacées.
+    """
+    archive = create_archive(year)
+    attendances = Attendance.objects.filter(**year_filter(year)).order_by()
+    moved = last_id = 0
+    while True:
+        ids = list(attendances.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            moved += move_to_archive(year, attendances.filter(id__gt=last_id, id__lte=ids[-1]))
+        last_id = ids[-1]
+        if progress is not None:
+            progress(moved)
+
+    AttendanceArchive.objects.filter(pk=archive.pk).update(completed_at=timezone.now())
+    return moved
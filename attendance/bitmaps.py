@@ -0,0 +1,93 @@
+"""
+Encodage compact des présences d'un mois, stocké dans AttendanceMonthlySummary.
+
+Deux entiers par (employé, mois) :
+- `marked_days` : bit j-1 à 1 si le jour j est marqué (31 bits) ;
+- `day_statuses` : code du statut du jour j sur les bits 2(j-1) et 2j-1
+  (2 bits par jour, 62 bits), lu seulement si le jour est marqué.
+
+Une année de calendrier d'un employé tient ainsi en 12 lignes de quelques
+octets, au lieu de centaines d'instances Attendance.
+"""
+
+from calendar import monthrange
+
+from django.db.models import BigIntegerField, Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Cast, ExtractDay
+
+
+# Statut -> code sur 2 bits
+STATUS_CODES = {
+    'PRESENT': 0,
+    'ABSENT': 1,
+    'HALF_DAY': 2,
+    'LEAVE': 3,
+}
+CODE_STATUSES = {code: status for status, code in STATUS_CODES.items()}
+
+DAY_BITS = 2
+DAY_MASK = (1 << DAY_BITS) - 1
+ALL_DAYS = (1 << 31) - 1
+ALL_STATUSES = (1 << (31 * DAY_BITS)) - 1
+
+
+def day_bit(day):
+    return 1 << (day.day - 1)
+
+
+def status_bits(day, status):
+    return STATUS_CODES[status] << (DAY_BITS * (day.day - 1))
+
+
+def status_mask(day):
+    return DAY_MASK << (DAY_BITS * (day.day - 1))
+
+
+def mark_day(day, status):
+    """Mise à jour (expressions F) qui marque `day` avec `status`"""
+    return {
+        'marked_days': F('marked_days').bitor(day_bit(day)),
+        'day_statuses': F('day_statuses').bitand(ALL_STATUSES ^ status_mask(day)).bitor(status_bits(day, status)),
+    }
+
+
+def unmark_day(day):
+    """Mise à jour (expressions F) qui efface `day`"""
+    return {
+        'marked_days': F('marked_days').bitand(ALL_DAYS ^ day_bit(day)),
+        'day_statuses': F('day_statuses').bitand(ALL_STATUSES ^ status_mask(day)),
+    }
+
+
+def bitmap_aggregates():
+    """
+    Agrégats SQL des deux entiers d'un groupe (employé, mois) de présences.
+    Un employé n'a qu'une présence par jour : la somme des bits vaut leur OU.
+    """
+    day = Cast(ExtractDay('date'), IntegerField()) - 1
+    code = Case(
+        *(When(status=status, then=Value(code)) for status, code in STATUS_CODES.items()),
+        output_field=BigIntegerField(),
+    )
+    return {
+        'marked_days': Sum(Value(1).bitleftshift(day), output_field=IntegerField()),
+        'day_statuses': Sum(
+            Cast(code, BigIntegerField()).bitleftshift(day * DAY_BITS), output_field=BigIntegerField()
+        ),
+    }
+
+
+def day_codes(marked_days, day_statuses, year, month):
+    """Code du statut de chaque jour du mois, None pour un jour non marqué"""
+    return [
+        (day_statuses >> (DAY_BITS * i)) & DAY_MASK if (marked_days >> i) & 1 else None
+        for i in range(monthrange(year, month)[1])
+    ]
+
+
+def day_statuses_of(marked_days, day_statuses, year, month):
+    """Statut de chaque jour du mois, None pour un jour non marqué"""
+    return [
+        None if code is None else CODE_STATUSES[code]
+        for code in day_codes(marked_days, day_statuses, year, month)
+    ]
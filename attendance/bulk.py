@@ -0,0 +1,212 @@
+"""
+Écritures de présences en masse.
+
+bulk_create contourne Attendance.save() : ces fonctions regroupent les
+écritures en quelques requêtes puis mettent à jour les résumés mensuels
+des clés touchées.
+
+Chaque couple (employee, date) n'a qu'une ligne, toutes tables confondues
+(attendance.archive) : un jour déjà enregistré est écrit dans la table qui
+le contient ; un nouveau jour d'une année archivée est créé dans la table
+vive (il y prend son identifiant) puis déplacé dans l'archive de l'année.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .archive import archive_model, archived_years, move_to_archive
+from .models import Attendance
+from .summaries import month_key, refresh_summaries
+
+
+# Nombre de lignes Attendance écrites par requête
+BATCH_SIZE = 1000
+
+# Dates d'un même employé distantes d'au plus RANGE_GAP lues en un seul
+# intervalle (un congé, une semaine de badges)
+RANGE_GAP = timedelta(days=7)
+# Termes d'un OR par requête : SQLite limite la profondeur d'une expression
+# et un OR en chaîne gagne un niveau par terme
+TERMS_PER_QUERY = 500
+
+UPSERT_FIELDS = ['status', 'check_in_time', 'check_out_time', 'notes', 'marked_by', 'updated_at']
+
+
+def _cell_ranges(cells):
+    """
+    Intervalles (employee_id, début, fin) qui couvrent les couples `cells` :
+    par employé, les dates distantes d'au plus RANGE_GAP sont regroupées
+    """
+    by_employee = defaultdict(list)
+    for employee_id, day in cells:
+        by_employee[employee_id].append(day)
+    ranges = []
+    for employee_id, days in by_employee.items():
+        days.sort()
+        start = end = days[0]
+        for day in days[1:]:
+            if day - end > RANGE_GAP:
+                ranges.append((employee_id, start, end))
+                start = day
+            end = day
+        ranges.append((employee_id, start, end))
+    return ranges
+
+
+def _covering_rows(model, cells, *fields):
+    """
+    Valeurs `fields` des lignes de `model` dans les intervalles qui couvrent
+    `cells`, une requête par TERMS_PER_QUERY intervalles : seules les dates
+    proches des couples demandés sont lues, pas toute la période du lot
+    """
+    ranges = _cell_ranges(cells)
+    for i in range(0, len(ranges), TERMS_PER_QUERY):
+        condition = Q()
+        for employee_id, start, end in ranges[i:i + TERMS_PER_QUERY]:
+            condition |= Q(employee_id=employee_id, date__gte=start, date__lte=end)
+        yield from model.objects.filter(condition).order_by().values_list(*fields)
+
+
+def existing_cells(cells, model=Attendance):
+    """Couples (employee_id, date) de `cells` déjà présents dans la table de `model`"""
+    cells = set(cells)
+    return {cell for cell in _covering_rows(model, cells, 'employee_id', 'date') if cell in cells}
+
+
+def _by_table(attendances, archived):
+    """
+    Répartit les présences : ({modèle: [présences]}, {année: couples}).
+    Les présences d'une année archivée déjà enregistrées dans l'archive y
+    sont recopiées en instances du modèle de l'archive ; les nouvelles
+    restent dans la table vive et leurs couples sont à déplacer ensuite
+    (voir _move_late).
+    """
+    tables = defaultdict(list)
+    moves = defaultdict(set)
+    archived = set(archived)
+    late = defaultdict(list)
+    for attendance in attendances:
+        if attendance.date.year in archived:
+            late[attendance.date.year].append(attendance)
+        else:
+            tables[Attendance].append(attendance)
+
+    now = timezone.now()
+    fields = Attendance._meta.local_concrete_fields
+    for year, rows in late.items():
+        cells = {(row.employee_id, row.date) for row in rows}
+        # Un jour encore dans la table vive (archivage en cours) y est mis à jour
+        live = existing_cells(cells, Attendance)
+        model = archive_model(year)
+        archived_cells = existing_cells(cells - live, model)
+        for row in rows:
+            cell = (row.employee_id, row.date)
+            if cell in archived_cells:
+                copy = model(**{field.attname: getattr(row, field.attname) for field in fields})
+                # Les champs de l'archive n'ont pas auto_now / auto_now_add
+                copy.created_at = copy.created_at or now
+                copy.updated_at = now
+                tables[model].append(copy)
+            else:
+                tables[Attendance].append(row)
+                if cell not in live:
+                    moves[year].add(cell)
+    return tables, moves
+
+
+def _move_late(moves):
+    """Déplace dans leur archive les jours d'années archivées créés dans la table vive"""
+    for year, cells in moves.items():
+        ids = [
+            attendance_id
+            for attendance_id, employee_id, day in _covering_rows(Attendance, cells, 'id', 'employee_id', 'date')
+            if (employee_id, day) in cells
+        ]
+        move_to_archive(year, Attendance.objects.filter(id__in=ids))
+
+
+def _cells_conditions(cells):
+    """Conditions qui sélectionnent exactement les couples `cells`, par TERMS_PER_QUERY couples"""
+    for i in range(0, len(cells), TERMS_PER_QUERY):
+        condition = Q()
+        for employee_id, day in cells[i:i + TERMS_PER_QUERY]:
+            condition |= Q(employee_id=employee_id, date=day)
+        yield condition
+
+
+def upsert_attendances(attendances, update_fields=UPSERT_FIELDS, batch_size=BATCH_SIZE, archived=None):
+    """
+    Crée ou met à jour les présences sur la contrainte unique (employee, date),
+    en une requête par lot et par table. Seuls `update_fields` sont écrasés
+    en cas de conflit. `archived` : années archivées déjà lues par
+    l'appelant (voir attendance_sources). Retourne le nombre de présences
+    écrites.
+    """
+    attendances = list(attendances)
+    if not attendances:
+        return 0
+    if archived is None:
+        archived = archived_years()
+    with transaction.atomic():
+        tables, moves = _by_table(attendances, archived)
+        for model, rows in tables.items():
+            model.objects.bulk_create(
+                rows,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['employee', 'date'],
+                update_fields=update_fields,
+            )
+        _move_late(moves)
+        refresh_summaries({month_key(a.employee_id, a.date) for a in attendances}, archived)
+    return len(attendances)
+
+
+def insert_attendances(attendances, batch_size=BATCH_SIZE, archived=None):
+    """
+    Crée les présences absentes en une requête par lot, sans toucher aux
+    couples (employee, date) déjà marqués, dans la table vive ou une
+    archive. `archived` comme pour upsert_attendances. Retourne le nombre
+    de présences créées.
+    """
+    attendances = list(attendances)
+    if not attendances:
+        return 0
+    if archived is None:
+        archived = archived_years()
+    with transaction.atomic():
+        tables, moves = _by_table(attendances, archived)
+        # Les jours déjà archivés sont marqués : rien à insérer
+        rows = tables.get(Attendance, [])
+        # ignore_conflicts ne dit pas quelles lignes ont été ignorées
+        cells = {(row.employee_id, row.date) for row in rows}
+        existing = existing_cells(cells)
+        Attendance.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+        _move_late(moves)
+        refresh_summaries({month_key(a.employee_id, a.date) for a in attendances}, archived)
+    return len(cells - existing)
+
+
+def delete_attendances(cells, archived=None):
+    """
+    Supprime les présences des couples (employee_id, date), en une requête
+    par table et par TERMS_PER_QUERY couples. `archived` comme pour
+    upsert_attendances.
+    """
+    cells = list(cells)
+    if not cells:
+        return 0
+    if archived is None:
+        archived = archived_years()
+    models = [Attendance] + [archive_model(year) for year in {day.year for _, day in cells} & set(archived)]
+    deleted = 0
+    with transaction.atomic():
+        for model in models:
+            for condition in _cells_conditions(cells):
+                deleted += model.objects.filter(condition).delete()[0]
+        refresh_summaries({month_key(employee_id, day) for employee_id, day in cells}, archived)
+    return deleted
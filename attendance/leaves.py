@@ -0,0 +1,175 @@
+"""
+Jours de congé des demandes approuvées.
+
+L'approbation d'une demande crée une présence LEAVE pour chaque jour
+ouvré de [start_date, end_date], en une insertion en masse qui ignore les
+jours déjà marqués : une présence saisie à la main n'est jamais écrasée,
+ni rattachée à la demande.
+
+Seule une demande en attente est approuvée ou refusée ; les vues
+verrouillent la demande (select_for_update) pour qu'une double
+approbation ou une annulation concurrente ne crée ni ne retire les jours
+deux fois. L'annulation d'une demande approuvée supprime en masse les
+seuls jours LEAVE que son approbation a créés (ceux qui lui sont
+rattachés) ; les jours remarqués depuis (présent, absent...) sont
+conservés et seulement détachés de la demande.
+
+Les demandes actives (en attente ou approuvées) d'un même employé ne
+doivent pas se chevaucher : `overlapping_leaves` contrôle une nouvelle
+demande et `find_overlaps` retrouve les chevauchements existants.
+"""
+
+import heapq
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .archive import archived_years, attendance_sources
+from .bulk import insert_attendances
+from .models import Attendance, LeaveRequest
+from .periods import working_days
+from .summaries import month_key, refresh_summaries
+
+
+# Nombre de demandes traitées par lot lors d'une reprise
+CHUNK_SIZE = 200
+
+# Statuts d'une demande qui réserve ses jours
+ACTIVE_STATUSES = ('PENDING', 'APPROVED')
+
+# Durée maximale d'une demande : borne aussi la recherche des chevauchements
+MAX_LEAVE_DAYS = 366
+
+
+def leave_attendances(leave):
+    """Présences LEAVE (non enregistrées) des jours ouvrés de la demande, marquées par l'approbateur"""
+    return [
+        Attendance(
+            employee_id=leave.employee_id,
+            date=day,
+            status='LEAVE',
+            leave_request_id=leave.id,
+            marked_by_id=leave.approved_by_id,
+            notes=f'Congé approuvé (demande n°{leave.id})',
+        )
+        for day in working_days(leave.start_date, leave.end_date)
+    ]
+
+
+def materialize_leaves(leaves, archived=None):
+    """
+    Crée les jours LEAVE des demandes `leaves` (approuvées) en une
+    insertion en masse ; les jours déjà marqués, même LEAVE, sont laissés
+    tels quels. `archived` : années archivées déjà lues (voir
+    attendance_sources). Retourne le nombre de jours LEAVE créés.
+    """
+    rows = [attendance for leave in leaves for attendance in leave_attendances(leave)]
+    return insert_attendances(rows, archived=archived)
+
+
+def release_leaves(leaves):
+    """
+    Supprime les jours LEAVE créés par l'approbation des demandes `leaves`
+    (annulées) et détache les jours remarqués depuis. Retourne
+    le nombre de jours supprimés.
+    """
+    leaves = list(leaves)
+    if not leaves:
+        return 0
+    ids = [leave.id for leave in leaves]
+    # Les jours d'une année archivée sont dans la table de son archive
+    archived = archived_years()
+    sources = attendance_sources(
+        min(leave.start_date for leave in leaves), max(leave.end_date for leave in leaves), archived
+    )
+    keys = set()
+    deleted = 0
+    with transaction.atomic():
+        for source in sources:
+            attendances = source.filter(leave_request__in=ids)
+            keys.update(month_key(employee_id, day) for employee_id, day in attendances.values_list('employee_id', 'date'))
+            deleted += attendances.filter(status='LEAVE').delete()[0]
+            attendances.update(leave_request=None, updated_at=timezone.now())
+        refresh_summaries(keys, archived)
+    return deleted
+
+
+def backfill_leaves(leaves, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Crée les jours LEAVE des demandes approuvées `leaves` (queryset) par
+    lots de `chunk_size` demandes, une transaction par lot.
+    `progress(demandes traitées, total, jours créés)` est appelé après
+    chaque lot. Retourne (demandes traitées, jours LEAVE créés).
+    """
+    leaves = leaves.filter(status='APPROVED').order_by('id')
+    total = leaves.count()
+    archived = archived_years()
+    done = days = last_id = 0
+    while True:
+        chunk = list(leaves.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            break
+        days += materialize_leaves(chunk, archived)
+        done += len(chunk)
+        last_id = chunk[-1].id
+        if progress is not None:
+            progress(done, total, days)
+    return done, days
+
+
+def overlapping_leaves(employee_id, start_date, end_date, exclude_id=None):
+    """
+    Demandes actives de l'employé qui chevauchent [start_date, end_date].
+
+    Une seule recherche dans l'index (employee, start_date, end_date) : la
+    durée maximale d'une demande borne start_date des deux côtés, sans
+    parcourir tout l'historique de l'employé.
+    """
+    leaves = LeaveRequest.objects.filter(
+        employee_id=employee_id,
+        start_date__gte=start_date - timedelta(days=MAX_LEAVE_DAYS),
+        start_date__lte=end_date,
+        end_date__gte=start_date,
+        status__in=ACTIVE_STATUSES,
+    )
+    if exclude_id is not None:
+        leaves = leaves.exclude(id=exclude_id)
+    return leaves.order_by('start_date')
+
+
+def find_overlaps(intervals):
+    """
+    Paires de demandes qui se chevauchent, par balayage.
+
+    `intervals` : suite de (id, employee_id, start_date, end_date) triée
+    par (employee_id, start_date). Chaque demande n'est comparée qu'aux
+    demandes du même employé encore ouvertes à sa date de début (tas par
+    date de fin) : O(n log n + nombre de paires), au lieu de O(n²).
+    Produit (id_a, id_b, employee_id, début, fin) du chevauchement.
+    """
+    active = []
+    current = None
+    for leave_id, employee_id, start, end in intervals:
+        if employee_id != current:
+            active = []
+            current = employee_id
+        while active and active[0][0] < start:
+            heapq.heappop(active)
+        for other_end, other_id in active:
+            yield other_id, leave_id, employee_id, start, min(end, other_end)
+        heapq.heappush(active, (end, leave_id))
+
+
+def find_leave_conflicts(leaves=None, chunk_size=5000):
+    """
+    Chevauchements entre demandes actives de toute l'entreprise : une
+    lecture triée par l'index (employee, start_date, end_date), en flux,
+    puis un seul balayage.
+    """
+    if leaves is None:
+        leaves = LeaveRequest.objects.all()
+    intervals = leaves.filter(status__in=ACTIVE_STATUSES).order_by(
+        'employee_id', 'start_date', 'end_date'
+    ).values_list('id', 'employee_id', 'start_date', 'end_date').iterator(chunk_size=chunk_size)
+    return find_overlaps(intervals)
@@ -0,0 +1,75 @@
+"""
+Commande Django pour déplacer les années closes de présences dans leurs tables d'archive
+Usage: python manage.py archive_attendance [--keep-years N] [--year AAAA] [--chunk-size N] [--dry-run]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from attendance.archive import CHUNK_SIZE, archive_table, archive_year
+from attendance.models import Attendance
+from attendance.periods import year_filter
+
+
+class Command(BaseCommand):
+    help = 'Déplace les présences des années closes vers une table d\'archive par année'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-years',
+            type=int,
+            default=1,
+            help='Années closes conservées dans la table vive, en plus de l\'année en cours (défaut: 1)',
+        )
+        parser.add_argument('--year', type=int, help='Archiver seulement cette année (close)')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Nombre de présences déplacées par transaction (défaut: {CHUNK_SIZE})',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Afficher les années à archiver sans rien déplacer')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        current_year = timezone.localdate().year
+
+        if options['year'] is not None:
+            if options['year'] >= current_year:
+                raise CommandError(f"L'année {options['year']} n'est pas close")
+            years = [options['year']]
+        else:
+            first = Attendance.objects.aggregate(first=Min('date'))['first']
+            last_year = current_year - 1 - max(options['keep_years'], 0)
+            years = list(range(first.year, last_year + 1)) if first else []
+
+        years = [year for year in years if Attendance.objects.filter(**year_filter(year)).exists()]
+        if not years:
+            self.stdout.write(self.style.WARNING('Aucune année à archiver.'))
+            return
+
+        total = 0
+        for year in years:
+            if options['dry_run']:
+                count = Attendance.objects.filter(**year_filter(year)).count()
+                self.stdout.write(f'   {year} : {count} présences -> {archive_table(year)}')
+                continue
+
+            self.stdout.write(self.style.SUCCESS(f'🔄 Archivage de {year} dans {archive_table(year)}...'))
+            total += archive_year(
+                year,
+                chunk_size=max(options['chunk_size'], 1),
+                progress=self.report_progress,
+            )
+
+        if not options['dry_run']:
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                self.style.SUCCESS(f'✅ {total} présences archivées ({len(years)} année(s)) en {elapsed:.2f}s')
+            )
+
+    def report_progress(self, moved):
+        self.stdout.write(f'   {moved} présences déplacées')
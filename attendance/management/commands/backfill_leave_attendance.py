@@ -0,0 +1,49 @@
+"""
+Commande Django pour créer les jours LEAVE des congés déjà approuvés
+Usage: python manage.py backfill_leave_attendance [--chunk-size N] [--since AAAA-MM-JJ]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from attendance.leaves import CHUNK_SIZE, backfill_leaves
+from attendance.models import LeaveRequest
+
+
+class Command(BaseCommand):
+    help = 'Crée les présences LEAVE des demandes de congé approuvées, sans écraser les jours déjà marqués'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Nombre de demandes traitées par lot (défaut: {CHUNK_SIZE})',
+        )
+        parser.add_argument('--since', help='Seulement les congés se terminant à partir de cette date (AAAA-MM-JJ)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        leaves = LeaveRequest.objects.all()
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError('Date --since invalide (format AAAA-MM-JJ)')
+            leaves = leaves.filter(end_date__gte=since)
+
+        self.stdout.write(self.style.SUCCESS('🔄 Création des jours de congé des demandes approuvées...'))
+        processed, days = backfill_leaves(
+            leaves,
+            chunk_size=max(options['chunk_size'], 1),
+            progress=self.report_progress,
+        )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ {processed} demandes traitées, {days} jours LEAVE créés en {elapsed:.2f}s')
+        )
+
+    def report_progress(self, done, total, days):
+        self.stdout.write(f'   {done}/{total} demandes traitées ({days} jours LEAVE)')
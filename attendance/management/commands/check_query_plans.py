@@ -0,0 +1,96 @@
+"""
+Commande Django pour vérifier que les requêtes principales utilisent un index
+Usage: python manage.py check_query_plans [--verbose-plans]
+"""
+
+import re
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from attendance.models import Attendance, LeaveRequest
+from attendance.periods import month_filter
+from employees.models import Employee, SalaryCalculation
+
+
+def sample_values():
+    """Employé, département et mois existants (ou valeurs neutres si la base est vide)"""
+    latest = Attendance.objects.order_by('-date').values('employee_id', 'employee__department_id', 'date').first()
+    if latest:
+        return latest['employee_id'], latest['employee__department_id'], latest['date']
+    employee = Employee.objects.values('id', 'department_id').first() or {'id': 0, 'department_id': 0}
+    return employee['id'], employee['department_id'], date.today()
+
+
+def main_queries():
+    """(nom, queryset, table devant être lue par index)"""
+    employee_id, department_id, day = sample_values()
+    leave_id = LeaveRequest.objects.values_list('id', flat=True).first() or 0
+    user_id = Attendance.objects.exclude(marked_by=None).values_list('marked_by_id', flat=True).first() or 0
+    month = month_filter(day.year, day.month)
+    attendance = Attendance._meta.db_table
+    return [
+        ('Statistiques du mois', Attendance.objects.filter(**month).order_by().values('status').annotate(n=Count('id')), attendance),
+        ("Présences d'un employé sur le mois", Attendance.objects.filter(employee_id=employee_id, **month), attendance),
+        ("Présences d'un département sur le mois", Attendance.objects.filter(employee__department_id=department_id, **month), attendance),
+        ('Liste paginée', Attendance.objects.order_by('-date', '-id')[:51], attendance),
+        ("Historique paginé d'un employé", Attendance.objects.filter(employee_id=employee_id).order_by('-date', '-id')[:51], attendance),
+        ("Jours d'une demande de congé", Attendance.objects.filter(leave_request_id=leave_id), attendance),
+        ("Jours déjà marqués d'un lot (congés, import)", Attendance.objects.filter(
+            Q(employee_id=employee_id, date__gte=day - timedelta(days=60), date__lte=day - timedelta(days=30))
+            | Q(employee_id=employee_id, date__gte=day, date__lte=day)
+        ).order_by().values_list('employee_id', 'date'), attendance),
+        ("Présences marquées par un utilisateur (suppression de l'utilisateur)", Attendance.objects.filter(marked_by_id=user_id), attendance),
+        ('Congés en attente', LeaveRequest.objects.filter(status='PENDING').order_by('-created_at'), LeaveRequest._meta.db_table),
+        ('Paie du mois', SalaryCalculation.objects.filter(year=day.year, month=day.month), SalaryCalculation._meta.db_table),
+    ]
+
+
+def uses_index(plan, table):
+    """True si `table` n'est lue que par index dans le plan (SQLite ou PostgreSQL)"""
+    table = re.escape(table)
+    if connection.vendor == 'sqlite':
+        accesses = re.findall(rf'(?:SCAN|SEARCH) {table}\b.*', plan)
+        return bool(accesses) and all('USING' in line for line in accesses)
+    if re.search(rf'Seq Scan on {table}\b', plan):
+        return False
+    return bool(re.search(rf'(Index Scan|Index Only Scan|Bitmap Heap Scan)[^\n]* on {table}\b', plan))
+
+
+class Command(BaseCommand):
+    help = 'Vérifie par EXPLAIN que les requêtes principales utilisent un index (SQLite et PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Affiche le plan complet de chaque requête',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'Base de données non prise en charge: {connection.vendor}')
+
+        failures = []
+        for name, queryset, table in main_queries():
+            with transaction.atomic():
+                if connection.vendor == 'postgresql':
+                    # Sur une petite base le planificateur préfère le parcours
+                    # séquentiel : on vérifie ici qu'un index est utilisable
+                    with connection.cursor() as cursor:
+                        cursor.execute('SET LOCAL enable_seqscan = off')
+                plan = queryset.explain()
+
+            if uses_index(plan, table):
+                self.stdout.write(self.style.SUCCESS(f'✅ {name}'))
+            else:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'❌ {name} : parcours complet de {table}'))
+            if options['verbose_plans'] or name in failures:
+                self.stdout.write('   ' + plan.replace('\n', '\n   '))
+
+        if failures:
+            raise CommandError(f'{len(failures)} requête(s) sans index')
+        self.stdout.write(self.style.SUCCESS('✅ Toutes les requêtes principales utilisent un index'))
@@ -0,0 +1,232 @@
+"""
+Commande Django pour importer les présences exportées par le système de badges
+Usage: python manage.py import_attendance FICHIER [--format csv|jsonl] [--batch-size N]
+       [--on-conflict update|skip] [--reject-file FICHIER]
+
+Colonnes / clés attendues : employee_id, date (AAAA-MM-JJ), status, et en option
+check_in_time, check_out_time (HH:MM[:SS]) et notes. Une colonne facultative vide
+n'écrase pas la valeur déjà enregistrée. Les lignes qui ne sont pas en UTF-8 valide
+sont rejetées.
+"""
+
+import csv
+import io
+import json
+import sys
+import time
+from collections import defaultdict
+from datetime import date, time as clock
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.archive import archived_years
+from attendance.bulk import BATCH_SIZE, insert_attendances, upsert_attendances
+from attendance.models import Attendance
+from employees.models import Employee
+
+
+VALID_STATUSES = {value for value, label in Attendance.STATUS_CHOICES}
+
+# Afficher la progression toutes les N lignes lues
+PROGRESS_EVERY = 100000
+
+# Colonnes facultatives : écrasées en cas de conflit seulement si renseignées
+OPTIONAL_FIELDS = ['check_in_time', 'check_out_time', 'notes']
+
+
+def read_records(stream, fmt):
+    """
+    Générateur des (numéro de ligne dans le fichier, enregistrement), lus
+    une ligne à la fois. En CSV, l'en-tête et les lignes vides comptent ;
+    un enregistrement sur plusieurs lignes (champ entre guillemets) porte
+    le numéro de sa dernière ligne.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = {'_raw': line}
+            yield line_number, record
+
+
+def parse_time(value):
+    if not value:
+        return None
+    return clock.fromisoformat(value)
+
+
+def field(record, name):
+    value = record.get(name)
+    return '' if value is None else str(value).strip()
+
+
+def check_encoding(record):
+    """Le fichier est lu avec errors='surrogateescape' : un octet non UTF-8 y laisse un substitut"""
+    for value in [*record.keys(), *record.values()]:
+        if isinstance(value, str):
+            try:
+                value.encode('utf-8')
+            except UnicodeEncodeError:
+                raise ValueError("encodage invalide (UTF-8 attendu)")
+
+
+def parse_record(record, employee_map):
+    """Valide un enregistrement et retourne une Attendance non sauvegardée"""
+    if not isinstance(record, dict):
+        raise ValueError("enregistrement invalide")
+    check_encoding(record)
+    if '_raw' in record:
+        raise ValueError("JSON invalide")
+
+    employee_pk = employee_map.get(field(record, 'employee_id'))
+    if employee_pk is None:
+        raise ValueError(f"employé inconnu: {record.get('employee_id')!r}")
+
+    status = field(record, 'status').upper()
+    if status not in VALID_STATUSES:
+        raise ValueError(f"statut invalide: {record.get('status')!r}")
+
+    try:
+        day = date.fromisoformat(field(record, 'date'))
+    except ValueError:
+        raise ValueError(f"date invalide: {record.get('date')!r}")
+
+    try:
+        check_in = parse_time(field(record, 'check_in_time'))
+        check_out = parse_time(field(record, 'check_out_time'))
+    except ValueError:
+        raise ValueError("heure invalide")
+    if check_in and check_out and check_out < check_in:
+        raise ValueError("heure de sortie antérieure à l'heure d'arrivée")
+
+    return Attendance(
+        employee_id=employee_pk,
+        date=day,
+        status=status,
+        check_in_time=check_in,
+        check_out_time=check_out,
+        notes=field(record, 'notes'),
+    )
+
+
+def upsert_batch(attendances, batch_size, archived=None):
+    """
+    Upsert d'un lot, par groupes de lignes ayant les mêmes colonnes
+    facultatives renseignées : seules celles-ci (et le statut) écrasent la
+    présence existante. marked_by n'est jamais modifié par l'import.
+    """
+    groups = defaultdict(list)
+    for attendance in attendances:
+        filled = tuple(name for name in OPTIONAL_FIELDS if getattr(attendance, name) not in (None, ''))
+        groups[filled].append(attendance)
+    return sum(
+        upsert_attendances(rows, update_fields=['status', *filled, 'updated_at'], batch_size=batch_size, archived=archived)
+        for filled, rows in groups.items()
+    )
+
+
+class Command(BaseCommand):
+    help = 'Importe en masse des présences depuis un fichier CSV ou JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help="Fichier à importer ('-' pour l'entrée standard)",
+        )
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help="Format du fichier. Par défaut: déduit de l'extension",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Nombre de lignes écrites par requête (défaut: {BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--on-conflict',
+            choices=['update', 'skip'],
+            default='update',
+            help='Présence déjà marquée pour (employé, date) : écraser ou ignorer (défaut: update)',
+        )
+        parser.add_argument(
+            '--reject-file',
+            help='Fichier JSONL des lignes rejetées. Par défaut: FICHIER.rejects.jsonl',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        if path == '-' and not options['format']:
+            raise CommandError("--format est obligatoire pour l'entrée standard")
+        reject_path = options['reject_file'] or (
+            'import_attendance.rejects.jsonl' if path == '-' else f'{path}.rejects.jsonl'
+        )
+        batch_size = max(options['batch_size'], 1)
+        write = upsert_batch if options['on_conflict'] == 'update' else insert_attendances
+
+        # employee_id (matricule) -> clé primaire et années archivées, lus une seule fois
+        employee_map = dict(Employee.objects.values_list('employee_id', 'id'))
+        archived = archived_years()
+
+        started = time.perf_counter()
+        read = imported = rejected = 0
+        batch = {}
+
+        # Octets non UTF-8 conservés en substituts : la ligne est rejetée, pas tout l'import
+        try:
+            if path == '-':
+                stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', errors='surrogateescape', newline='')
+            else:
+                stream = open(path, newline='', encoding='utf-8', errors='surrogateescape')
+        except OSError as e:
+            raise CommandError(f"Impossible d'ouvrir {path}: {e}")
+
+        with stream, open(reject_path, 'w', encoding='utf-8', errors='backslashreplace') as rejects:
+            for line_number, record in read_records(stream, fmt):
+                read += 1
+                try:
+                    attendance = parse_record(record, employee_map)
+                except ValueError as e:
+                    rejected += 1
+                    rejects.write(json.dumps(
+                        {'line': line_number, 'error': str(e), 'record': record},
+                        ensure_ascii=False, default=str
+                    ) + '\n')
+                    continue
+
+                # Dernière valeur gagnante pour un même (employé, date) dans le lot
+                batch[(attendance.employee_id, attendance.date)] = attendance
+                if len(batch) >= batch_size:
+                    imported += write(batch.values(), batch_size=batch_size, archived=archived)
+                    batch = {}
+
+                if read % PROGRESS_EVERY == 0:
+                    self.report(read, imported, rejected, started)
+
+            if batch:
+                imported += write(batch.values(), batch_size=batch_size, archived=archived)
+
+        self.report(read, imported, rejected, started)
+        self.stdout.write(self.style.SUCCESS(f'✅ Import terminé : {imported} présences écrites'))
+        if rejected:
+            self.stdout.write(
+                self.style.WARNING(f'⚠️  {rejected} lignes rejetées, voir {reject_path}')
+            )
+
+    def report(self, read, imported, rejected, started):
+        elapsed = time.perf_counter() - started
+        rate = read / elapsed if elapsed > 0 else 0
+        self.stdout.write(
+            f'   {read} lignes lues, {imported} écrites, {rejected} rejetées '
+            f'({rate:,.0f} lignes/s)'
+        )
@@ -0,0 +1,42 @@
+"""
+Commande Django pour reconstruire les résumés mensuels de présence
+Usage: python manage.py rebuild_attendance_summaries [--chunk-size N]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from attendance.summaries import CHUNK_SIZE, rebuild_summaries
+from employees.models import Employee
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit la table AttendanceMonthlySummary à partir des présences'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f"Nombre d'employés traités par lot (défaut: {CHUNK_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        employee_ids = Employee.objects.order_by('id').values_list('id', flat=True)
+
+        self.stdout.write(self.style.SUCCESS('🔄 Reconstruction des résumés mensuels de présence...'))
+        written = rebuild_summaries(
+            employee_ids,
+            chunk_size=max(options['chunk_size'], 1),
+            progress=self.report_progress,
+        )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ {written} résumés écrits en {elapsed:.2f}s')
+        )
+
+    def report_progress(self, done, total, written):
+        self.stdout.write(f'   {done}/{total} employés traités ({written} résumés)')
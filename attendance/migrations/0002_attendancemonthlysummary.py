@@ -0,0 +1,60 @@
+# Generated by Django 4.2.21 on 2026-10-18 12:30
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractMonth, ExtractYear
+import django.db.models.deletion
+
+
+def populate_summaries(apps, schema_editor):
+    """Remplit les résumés à partir des présences existantes"""
+    Attendance = apps.get_model('attendance', 'Attendance')
+    AttendanceMonthlySummary = apps.get_model('attendance', 'AttendanceMonthlySummary')
+    rows = Attendance.objects.order_by().annotate(
+        year=ExtractYear('date'),
+        month=ExtractMonth('date'),
+    ).values('employee_id', 'year', 'month').annotate(
+        total=Count('id'),
+        present=Count('id', filter=Q(status='PRESENT')),
+        absent=Count('id', filter=Q(status='ABSENT')),
+        half_day=Count('id', filter=Q(status='HALF_DAY')),
+        leave=Count('id', filter=Q(status='LEAVE')),
+    )
+    AttendanceMonthlySummary.objects.bulk_create(
+        (AttendanceMonthlySummary(**row) for row in rows),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0002_salarycalculation_updated_at'),
+        ('attendance', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceMonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)])),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('half_day', models.PositiveIntegerField(default=0)),
+                ('leave', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to='employees.employee')),
+            ],
+            options={
+                'verbose_name': 'Résumé Mensuel de Présence',
+                'verbose_name_plural': 'Résumés Mensuels de Présence',
+                'ordering': ['-year', '-month'],
+                'unique_together': {('employee', 'year', 'month')},
+            },
+        ),
+        migrations.RunPython(populate_summaries, migrations.RunPython.noop),
+    ]
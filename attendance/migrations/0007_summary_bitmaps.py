@@ -0,0 +1,66 @@
+# Generated by Django 4.2.21 on 2026-10-18 13:06
+
+from django.db import migrations, models
+from django.db.models import BigIntegerField, Case, IntegerField, Sum, Value, When
+from django.db.models.functions import Cast, ExtractDay, ExtractMonth, ExtractYear
+
+
+def populate_bitmaps(apps, schema_editor):
+    """Remplit les bitmaps des résumés à partir des présences existantes"""
+    Attendance = apps.get_model('attendance', 'Attendance')
+    AttendanceMonthlySummary = apps.get_model('attendance', 'AttendanceMonthlySummary')
+    day = Cast(ExtractDay('date'), IntegerField()) - 1
+    code = Case(
+        When(status='PRESENT', then=Value(0)),
+        When(status='ABSENT', then=Value(1)),
+        When(status='HALF_DAY', then=Value(2)),
+        When(status='LEAVE', then=Value(3)),
+        output_field=BigIntegerField(),
+    )
+    rows = Attendance.objects.order_by().annotate(
+        year=ExtractYear('date'),
+        month=ExtractMonth('date'),
+    ).values('employee_id', 'year', 'month').annotate(
+        marked_days=Sum(Value(1).bitleftshift(day), output_field=IntegerField()),
+        day_statuses=Sum(Cast(code, BigIntegerField()).bitleftshift(day * 2), output_field=BigIntegerField()),
+    )
+    ids = {
+        (employee_id, year, month): pk
+        for pk, employee_id, year, month in AttendanceMonthlySummary.objects.values_list(
+            'id', 'employee_id', 'year', 'month'
+        ).iterator()
+    }
+    AttendanceMonthlySummary.objects.bulk_update(
+        [
+            AttendanceMonthlySummary(
+                id=ids[(row['employee_id'], row['year'], row['month'])],
+                marked_days=row['marked_days'],
+                day_statuses=row['day_statuses'],
+            )
+            for row in rows.iterator()
+            if (row['employee_id'], row['year'], row['month']) in ids
+        ],
+        ['marked_days', 'day_statuses'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0006_leave_period_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancemonthlysummary',
+            name='day_statuses',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='attendancemonthlysummary',
+            name='marked_days',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(populate_bitmaps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.21 on 2026-10-18 13:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0004_salarycalculation_attendance_as_of'),
+        ('attendance', '0008_attendancearchive'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='attendance',
+            name='attendance_emp_date_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='attendance',
+            name='attendance_emp_date_st_idx',
+        ),
+        migrations.AlterField(
+            model_name='attendance',
+            name='employee',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='attendances', to='employees.employee'),
+        ),
+    ]
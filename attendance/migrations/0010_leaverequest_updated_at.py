@@ -0,0 +1,28 @@
+# Generated by Django 4.2.21 on 2026-10-18 14:02
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+import django.utils.timezone
+
+
+def copy_last_change(apps, schema_editor):
+    """Demandes existantes : dernière modification connue (décision, sinon création)"""
+    LeaveRequest = apps.get_model('attendance', 'LeaveRequest')
+    LeaveRequest.objects.update(updated_at=Coalesce('approved_at', 'created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0009_prune_attendance_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leaverequest',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_last_change, migrations.RunPython.noop),
+    ]
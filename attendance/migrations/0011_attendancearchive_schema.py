@@ -0,0 +1,18 @@
+# Generated by Django 4.2.21 on 2026-10-18 13:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0010_leaverequest_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancearchive',
+            name='schema',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -1,9 +1,35 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 from employees.models import Employee
+from employees.stats_cache import attendance_group, invalidate
+from .bitmaps import day_bit, mark_day, status_bits, unmark_day
+
+
+# Champs qui déterminent la ligne et le compteur du résumé mensuel
+SUMMARY_KEY_FIELDS = ('employee_id', 'date', 'status')
+
+# Clé de résumé non chargée (instance lue sans ses champs)
+NOT_LOADED = object()
 
 
 class Attendance(models.Model):
+    """
+    Présence d'un employé pour un jour.
+
+    save() et delete() tiennent à jour AttendanceMonthlySummary. Les
+    écritures en masse (bulk_create, QuerySet.update / delete) ne passent
+    pas par eux : elles doivent appeler attendance.summaries.refresh_summaries
+    (voir attendance.bulk).
+
+    save() refuse d'ajouter à la table vive un jour d'une année archivée :
+    il appartient à la table de l'archive, où attendance.bulk l'écrit.
+    """
+    
     STATUS_CHOICES = [
         ('PRESENT', 'Présent'),
         ('ABSENT', 'Absent'),
@@ -11,24 +37,97 @@ class Attendance(models.Model):
         ('LEAVE', 'Congé'),
     ]
     
-    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='attendances')
+    # Pas d'index propre : (employee, date) unique le couvre
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='attendances', db_index=False)
     date = models.DateField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES)
     check_in_time = models.TimeField(null=True, blank=True)
     check_out_time = models.TimeField(null=True, blank=True)
     notes = models.TextField(blank=True)
     marked_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='marked_attendances')
+    # Demande de congé approuvée dont ce jour LEAVE provient (voir attendance.leaves)
+    leave_request = models.ForeignKey(
+        'LeaveRequest', on_delete=models.SET_NULL, null=True, blank=True, related_name='attendances'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.employee} - {self.date} ({self.get_status_display()})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Clé chargée, pour appliquer le delta au résumé mensuel lors du save().
+        # Lue dans __dict__ : accéder à un champ différé rechargerait l'instance
+        # (et rappellerait from_db). Sans ces champs, save() relit la clé en base.
+        if all(name in instance.__dict__ for name in SUMMARY_KEY_FIELDS):
+            instance._summary_key = instance.summary_key()
+        return instance
+    
+    def summary_key(self):
+        """(employee_id, date, status) tel qu'il compte dans le résumé mensuel"""
+        if self.employee_id is None or self.date is None or not self.status:
+            return None
+        return (self.employee_id, self._meta.get_field('date').to_python(self.date), self.status)
+    
+    def stored_summary_key(self):
+        """Clé enregistrée en base pour cette présence, None si elle n'existe pas"""
+        if self.pk is None:
+            return None
+        return Attendance.objects.filter(pk=self.pk).order_by().values_list(*SUMMARY_KEY_FIELDS).first()
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = self.__dict__.get('_summary_key', NOT_LOADED)
+            if previous is NOT_LOADED:
+                previous = self.stored_summary_key()
+            current = self.summary_key()
+            if current is not None and (previous is None or previous[:2] != current[:2]):
+                self.check_not_archived(current[1])
+            super().save(*args, **kwargs)
+            if previous != current:
+                if previous is not None:
+                    AttendanceMonthlySummary.apply_delta(*previous, delta=-1)
+                if current is not None:
+                    AttendanceMonthlySummary.apply_delta(*current, delta=1)
+        self._summary_key = current
+    
+    @staticmethod
+    def check_not_archived(day):
+        """ValidationError si l'année de `day` a été déplacée dans une archive"""
+        if AttendanceArchive.objects.filter(year=day.year).exists():
+            raise ValidationError(
+                f"L'année {day.year} est archivée : saisissez ce jour par la grille mensuelle ou l'import."
+            )
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = self.__dict__.get('_summary_key', NOT_LOADED)
+            if previous is NOT_LOADED:
+                previous = self.stored_summary_key()
+            result = super().delete(*args, **kwargs)
+            if previous is not None:
+                AttendanceMonthlySummary.apply_delta(*previous, delta=-1)
+        self._summary_key = None
+        return result
+    
     class Meta:
         verbose_name = "Présence"
         verbose_name_plural = "Présences"
+        # Sert aussi les présences d'un employé sur une période et son
+        # historique paginé : la date étant unique par employé, l'ordre
+        # (date, id) est celui de l'index
         unique_together = ['employee', 'date']
         ordering = ['-date', 'employee__user__last_name']
+        # Chaque index correspond à un cas de check_query_plans ; la table
+        # est écrite en masse, n'en ajouter qu'avec le cas qui le justifie
+        indexes = [
+            # Statistiques d'un mois : intervalle sur date, regroupement par statut
+            models.Index(fields=['date', 'status'], name='attendance_date_status_idx'),
+            # Pagination par curseur de toutes les présences : (date, id) décroissants
+            models.Index(fields=['-date', '-id'], name='attendance_date_id_idx'),
+        ]
     
     @property
     def is_present(self):
@@ -52,6 +151,7 @@ class LeaveRequest(models.Model):
         ('PENDING', 'En attente'),
         ('APPROVED', 'Approuvé'),
         ('REJECTED', 'Rejeté'),
+        ('CANCELLED', 'Annulé'),
     ]
     
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='leave_requests')
@@ -62,6 +162,8 @@ class LeaveRequest(models.Model):
     approved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='approved_leaves')
     approved_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Tout changement de statut (approbation, refus, annulation) passe par save()
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.employee} - {self.start_date} to {self.end_date}"
@@ -69,4 +171,100 @@ class LeaveRequest(models.Model):
     class Meta:
         verbose_name = "Demande de Congé"
         verbose_name_plural = "Demandes de Congés"
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            # Demandes en attente, les plus récentes d'abord
+            models.Index(fields=['status', 'created_at'], name='leave_status_created_idx'),
+            # Chevauchements : intervalle sur start_date par employé, end_date lu dans l'index
+            models.Index(fields=['employee', 'start_date', 'end_date'], name='leave_emp_period_idx'),
+        ]
+
+
+class AttendanceMonthlySummary(models.Model):
+    """Compteurs de présence par (employé, année, mois), tenus à jour à chaque écriture"""
+    
+    # Statut de présence -> compteur correspondant
+    STATUS_FIELDS = {
+        'PRESENT': 'present',
+        'ABSENT': 'absent',
+        'HALF_DAY': 'half_day',
+        'LEAVE': 'leave',
+    }
+    
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='attendance_summaries')
+    year = models.IntegerField()
+    month = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(12)])
+    total = models.PositiveIntegerField(default=0)
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    half_day = models.PositiveIntegerField(default=0)
+    leave = models.PositiveIntegerField(default=0)
+    # Jours marqués et statut de chaque jour, encodés bit à bit (voir attendance.bitmaps)
+    marked_days = models.IntegerField(default=0)
+    day_statuses = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.employee} - {self.month}/{self.year}"
+    
+    class Meta:
+        verbose_name = "Résumé Mensuel de Présence"
+        verbose_name_plural = "Résumés Mensuels de Présence"
+        unique_together = ['employee', 'year', 'month']
+        ordering = ['-year', '-month']
+    
+    @property
+    def attendance_percentage(self):
+        if not self.total:
+            return 0
+        return round((self.present + self.half_day * 0.5) / self.total * 100, 2)
+    
+    @classmethod
+    def apply_delta(cls, employee_id, day, status, delta):
+        """
+        Ajoute `delta` au compteur du statut et au total du mois de `day`,
+        et marque (delta > 0) ou efface (delta < 0) le jour dans les bitmaps
+        """
+        field = cls.STATUS_FIELDS[status]
+        changes = {
+            # Borné à 0 : un résumé décalé par une écriture en masse non
+            # répercutée ne doit pas faire échouer l'écriture (compteurs positifs)
+            field: Greatest(F(field) + delta, 0),
+            'total': Greatest(F('total') + delta, 0),
+            'updated_at': timezone.now(),
+            **(mark_day(day, status) if delta > 0 else unmark_day(day)),
+        }
+        invalidate(attendance_group(day.year, day.month))
+        rows = cls.objects.filter(employee_id=employee_id, year=day.year, month=day.month)
+        if rows.update(**changes) or delta < 0:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    employee_id=employee_id, year=day.year, month=day.month, total=delta,
+                    marked_days=day_bit(day), day_statuses=status_bits(day, status), **{field: delta}
+                )
+        except IntegrityError:
+            # Créé entre-temps par une autre requête
+            rows.update(**changes)
+
+
+class AttendanceArchive(models.Model):
+    """Année de présences déplacée dans sa table d'archive (voir attendance.archive)"""
+    
+    year = models.PositiveIntegerField(unique=True)
+    table_name = models.CharField(max_length=63)
+    rows = models.PositiveIntegerField(default=0)
+    # Empreinte du schéma de la table (archive.schema_signature), tenue à jour après chaque migrate
+    schema = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Renseigné quand toutes les présences de l'année ont été déplacées
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Archive {self.year} ({self.table_name})"
+    
+    class Meta:
+        verbose_name = "Archive de Présences"
+        verbose_name_plural = "Archives de Présences"
+        ordering = ['-year']
@@ -0,0 +1,141 @@
+"""
+Pagination par curseur (keyset).
+
+Au lieu d'un OFFSET et d'un COUNT complet, chaque page part de la clé
+(date, id) de la dernière ligne affichée : la requête descend l'index à
+partir de cette clé, et la page 500 coûte autant que la page 1.
+"""
+
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import BadRequest, FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+DEFAULT_PAGE_SIZE = getattr(settings, 'ATTENDANCE_PAGE_SIZE', 50)
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(BadRequest):
+    """Curseur indécodable ou dont les valeurs ne correspondent pas aux champs (réponse 400)"""
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps([direction, values], default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Retourne (direction, valeurs) ou None si le curseur est invalide"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        return None
+    return direction, values
+
+
+def page_size_from(params):
+    """Taille de page demandée (?page_size=), bornée à MAX_PAGE_SIZE"""
+    try:
+        size = int(params.get('page_size', DEFAULT_PAGE_SIZE))
+    except (ValueError, TypeError):
+        size = DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def cursor_values(model, fields, values):
+    """Valeurs d'un curseur converties dans le type de chaque champ de `model`"""
+    try:
+        values = [model._meta.get_field(field).to_python(value) for field, value in zip(fields, values)]
+    except (FieldDoesNotExist, ValidationError):
+        values = [None]
+    if None in values:
+        raise InvalidCursor('Curseur de pagination invalide.')
+    return values
+
+
+def _after(fields, values, lookup):
+    """Condition « (f1, f2, ...) strictement après (v1, v2, ...) » dans l'ordre lexicographique"""
+    condition = Q()
+    for i, field in enumerate(fields):
+        step = Q(**{f'{field}__{lookup}': values[i]})
+        for previous, value in zip(fields[:i], values[:i]):
+            step &= Q(**{previous: value})
+        condition |= step
+    return condition
+
+
+def keyset_page(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE, fields=('date', 'id')):
+    """
+    Une page de `queryset` triée par `fields` décroissants.
+
+    `queryset` peut aussi être une liste de querysets (table vive et
+    archives, voir attendance.archive) : chacun fournit au plus une page
+    depuis le curseur, et les lignes sont fusionnées dans l'ordre.
+
+    Retourne un dict : object_list, has_next, has_previous, next_cursor,
+    previous_cursor. Les curseurs sont des jetons opaques à repasser en
+    paramètre ?cursor= ; un curseur indécodable ou forgé lève
+    InvalidCursor (400).
+    """
+    fields = list(fields)
+    querysets = list(queryset) if isinstance(queryset, (list, tuple)) else [queryset]
+    direction, values = 'next', None
+    if cursor:
+        decoded = decode_cursor(cursor)
+        if decoded is None or len(decoded[1]) != len(fields):
+            raise InvalidCursor('Curseur de pagination invalide.')
+        direction, values = decoded[0], cursor_values(querysets[0].model, fields, decoded[1])
+
+    def key(row):
+        if isinstance(row, dict):
+            return [row[field] for field in fields]
+        return [getattr(row, field) for field in fields]
+
+    rows = []
+    for queryset in querysets:
+        if direction == 'prev':
+            queryset = queryset.filter(_after(fields, values, 'gt')).order_by(*fields)
+        else:
+            if values is not None:
+                queryset = queryset.filter(_after(fields, values, 'lt'))
+            queryset = queryset.order_by(*[f'-{field}' for field in fields])
+        rows.extend(queryset[:page_size + 1])
+    if len(querysets) > 1:
+        rows.sort(key=key, reverse=direction != 'prev')
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if direction == 'prev':
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, values is not None
+
+    return {
+        'object_list': rows,
+        'page_size': page_size,
+        'has_next': has_next and bool(rows),
+        'has_previous': has_previous and bool(rows),
+        'next_cursor': encode_cursor('next', key(rows[-1])) if has_next and rows else None,
+        'previous_cursor': encode_cursor('prev', key(rows[0])) if has_previous and rows else None,
+    }
+
+
+def page_links(request, page):
+    """Ajoute à `page` les querystrings suivante / précédente qui conservent les filtres"""
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    for name, cursor in (('next_query', page['next_cursor']), ('previous_query', page['previous_cursor'])):
+        if cursor:
+            params['cursor'] = cursor
+            page[name] = params.urlencode()
+        else:
+            page[name] = None
+    return page
@@ -0,0 +1,66 @@
+"""
+Périodes mensuelles.
+
+Un filtre `date__year` / `date__month` enveloppe la colonne dans une
+fonction et empêche l'utilisation des index. Les requêtes par mois
+passent donc par un intervalle semi-ouvert [1er du mois, 1er du mois
+suivant[ qui se traduit par une recherche dans l'index sur `date`.
+"""
+
+import calendar
+from datetime import date, timedelta
+
+from django.utils.dateparse import parse_date
+
+
+def month_start(value):
+    """Convertit 'AAAA-MM' en date du premier jour du mois"""
+    year, month = value.split('-')
+    return date(int(year), int(month), 1)
+
+
+def next_month(day):
+    """Premier jour du mois suivant"""
+    if day.month == 12:
+        return date(day.year + 1, 1, 1)
+    return date(day.year, day.month + 1, 1)
+
+
+def month_range(year, month):
+    """Intervalle semi-ouvert (premier jour, premier jour du mois suivant)"""
+    start = date(int(year), int(month), 1)
+    return start, next_month(start)
+
+
+def month_filter(year, month, field='date'):
+    """Arguments de filtre limitant `field` au mois donné : filter(**month_filter(2025, 9))"""
+    start, end = month_range(year, month)
+    return {f'{field}__gte': start, f'{field}__lt': end}
+
+
+def year_filter(year, field='date'):
+    """Arguments de filtre limitant `field` à l'année donnée : [1er janvier, 1er janvier suivant["""
+    return {f'{field}__gte': date(int(year), 1, 1), f'{field}__lt': date(int(year) + 1, 1, 1)}
+
+
+def parse_day(value):
+    """Date AAAA-MM-JJ, ou None si absente ou invalide"""
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+def month_days(year, month):
+    """Liste des jours du mois"""
+    start = date(int(year), int(month), 1)
+    return [start.replace(day=day) for day in range(1, calendar.monthrange(start.year, start.month)[1] + 1)]
+
+
+def working_days(start, end):
+    """Jours ouvrés (lundi à vendredi) de [start, end]"""
+    day = start
+    while day <= end:
+        if day.weekday() < 5:
+            yield day
+        day += timedelta(days=1)
@@ -0,0 +1,145 @@
+"""
+Maintenance de la table AttendanceMonthlySummary.
+
+Les écritures unitaires (Attendance.save / delete) appliquent un delta au
+résumé du mois et marquent ou effacent le jour dans ses bitmaps. Les
+écritures en masse (bulk_create, QuerySet.update / delete) contournent
+save() : elles doivent appeler `refresh_summaries` avec les clés
+(employee_id, année, mois) touchées.
+
+Les recalculs lisent la table vive et les archives des années
+concernées (attendance.archive) : archiver une année ne change pas ses
+résumés.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from employees.stats_cache import attendance_group, invalidate
+from .archive import archived_years, attendance_sources
+from .bitmaps import bitmap_aggregates
+from .models import AttendanceMonthlySummary
+from .periods import month_range
+
+
+COUNTER_FIELDS = ['total'] + list(AttendanceMonthlySummary.STATUS_FIELDS.values())
+BITMAP_FIELDS = ['marked_days', 'day_statuses']
+
+# Nombre d'employés traités par lot lors d'une reconstruction complète
+CHUNK_SIZE = 500
+
+
+def _counters():
+    counters = {'total': Count('id')}
+    for status, field in AttendanceMonthlySummary.STATUS_FIELDS.items():
+        counters[field] = Count('id', filter=Q(status=status))
+    counters.update(bitmap_aggregates())
+    return counters
+
+
+def _upsert(rows):
+    """Écrit les lignes de résumé calculées, en une requête par lot"""
+    now = timezone.now()
+    AttendanceMonthlySummary.objects.bulk_create(
+        [AttendanceMonthlySummary(updated_at=now, **row) for row in rows],
+        batch_size=CHUNK_SIZE,
+        update_conflicts=True,
+        unique_fields=['employee', 'year', 'month'],
+        update_fields=COUNTER_FIELDS + BITMAP_FIELDS + ['updated_at'],
+    )
+
+
+def _aggregate(querysets, *group):
+    """
+    Compteurs et bitmaps groupés par `group`, additionnés sur toutes les
+    sources (un mois en cours d'archivage est réparti entre deux tables)
+    """
+    merged = {}
+    for queryset in querysets:
+        for row in queryset.order_by().values(*group).annotate(**_counters()):
+            key = tuple(row[field] for field in group)
+            if key in merged:
+                for field in COUNTER_FIELDS + BITMAP_FIELDS:
+                    merged[key][field] += row[field]
+            else:
+                merged[key] = row
+    return list(merged.values())
+
+
+def month_key(employee_id, day):
+    """Clé (employee_id, année, mois) du résumé couvrant `day`"""
+    return (employee_id, day.year, day.month)
+
+
+def refresh_summaries(keys, archived=None):
+    """
+    Recalcule depuis Attendance les résumés des clés (employee_id, année,
+    mois). `archived` : années archivées déjà lues (voir attendance_sources).
+    """
+    by_month = defaultdict(set)
+    for employee_id, year, month in keys:
+        by_month[(year, month)].add(employee_id)
+    if not by_month:
+        return
+    if archived is None:
+        archived = archived_years()
+
+    invalidate(*(attendance_group(year, month) for year, month in by_month))
+    with transaction.atomic():
+        for (year, month), employee_ids in by_month.items():
+            start, end = month_range(year, month)
+            sources = attendance_sources(start, end - timedelta(days=1), archived)
+            employee_ids = sorted(employee_ids)
+            for i in range(0, len(employee_ids), CHUNK_SIZE):
+                chunk = employee_ids[i:i + CHUNK_SIZE]
+                rows = _aggregate(
+                    (source.filter(employee_id__in=chunk) for source in sources),
+                    'employee_id',
+                )
+                for row in rows:
+                    row.update(year=year, month=month)
+                _upsert(rows)
+
+                found = {row['employee_id'] for row in rows}
+                AttendanceMonthlySummary.objects.filter(
+                    employee_id__in=[pk for pk in chunk if pk not in found],
+                    year=year,
+                    month=month
+                ).delete()
+
+
+def rebuild_summaries(employee_ids, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Reconstruit tous les résumés des employés `employee_ids`, par lots de
+    `chunk_size` employés (une requête groupée et une transaction par lot).
+    Retourne le nombre de lignes de résumé écrites.
+    """
+    written = 0
+    employee_ids = list(employee_ids)
+    archived = archived_years()
+    for i in range(0, len(employee_ids), chunk_size):
+        chunk = employee_ids[i:i + chunk_size]
+        rows = _aggregate(
+            (
+                source.filter(employee_id__in=chunk).annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+                for source in attendance_sources(archived=archived)
+            ),
+            'employee_id', 'year', 'month',
+        )
+        months = set(
+            AttendanceMonthlySummary.objects.filter(employee_id__in=chunk).values_list('year', 'month').distinct()
+        )
+        months.update((row['year'], row['month']) for row in rows)
+        invalidate(*(attendance_group(year, month) for year, month in months))
+        with transaction.atomic():
+            AttendanceMonthlySummary.objects.filter(employee_id__in=chunk).delete()
+            _upsert(rows)
+        written += len(rows)
+        if progress is not None:
+            progress(min(i + chunk_size, len(employee_ids)), len(employee_ids), written)
+    return written
@@ -1,3 +1,612 @@
-from django.test import TestCase
+import json
+import random
+import tempfile
+from datetime import date, time as clock, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from employee_attendance_system.testing import TestCase, TransactionTestCase
+from employees.models import Department, Employee
+from .archive import archive_model, archive_year, archived_years, schema_signature, sync_archive_schemas
+from .bitmaps import day_bit, day_statuses_of, status_bits
+from .leaves import find_overlaps, overlapping_leaves
+from . import bulk
+from .bulk import delete_attendances, existing_cells, insert_attendances, upsert_attendances
+from .models import Attendance, AttendanceArchive, AttendanceMonthlySummary, LeaveRequest
+from .pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_page
+from .periods import month_days, month_filter, month_range, parse_day, working_days, year_filter
+from .summaries import COUNTER_FIELDS, BITMAP_FIELDS, month_key, refresh_summaries
+
+
+STATUSES = [status for status, _ in Attendance.STATUS_CHOICES]
+
+
+def create_employee(number, department=None):
+    if department is None:
+        department, _ = Department.objects.get_or_create(name='Informatique')
+    user = User.objects.create_user(f'employe{number}', password='password123')
+    return Employee.objects.create(
+        user=user,
+        employee_id=f'EMP{number:03d}',
+        department=department,
+        base_salary=Decimal('1000.00'),
+        hire_date=date(2020, 1, 1),
+    )
+
+
+def summaries():
+    """Résumés mensuels {(employee_id, année, mois): (compteurs..., bitmaps...)}"""
+    fields = COUNTER_FIELDS + BITMAP_FIELDS
+    return {
+        (row['employee_id'], row['year'], row['month']): tuple(row[field] for field in fields)
+        for row in AttendanceMonthlySummary.objects.values('employee_id', 'year', 'month', *fields)
+    }
+
+
+class SummaryDeltaTests(TestCase):
+    """Les deltas de save() / delete() donnent les résumés que refresh_summaries recalcule"""
+
+    def test_deltas_match_refresh(self):
+        rng = random.Random(5)
+        employees = [create_employee(i) for i in range(3)]
+        days = [date(2025, 1, 27) + timedelta(days=i) for i in range(10)]
+        keys = set()
+        for _ in range(80):
+            employee = rng.choice(employees)
+            day = rng.choice(days)
+            attendance = Attendance.objects.filter(employee=employee, date=day).first()
+            keys.add(month_key(employee.id, day))
+            if attendance is None:
+                Attendance.objects.create(employee=employee, date=day, status=rng.choice(STATUSES))
+            elif rng.random() < 0.3:
+                attendance.delete()
+            elif rng.random() < 0.5:
+                # Déplacement vers un jour libre, éventuellement d'un autre mois
+                free = [d for d in days if not Attendance.objects.filter(employee=employee, date=d).exists()]
+                if free:
+                    attendance.date = rng.choice(free)
+                    keys.add(month_key(employee.id, attendance.date))
+                attendance.save()
+            else:
+                attendance.status = rng.choice(STATUSES)
+                attendance.save()
+
+        incremental = summaries()
+        refresh_summaries(keys)
+        self.assertEqual(incremental, summaries())
+
+    def test_deferred_instance_reads_stored_key(self):
+        employee = create_employee(1)
+        Attendance.objects.create(employee=employee, date=date(2025, 3, 3), status='PRESENT')
+        attendance = Attendance.objects.only('id', 'notes').get()
+        attendance.status = 'ABSENT'
+        attendance.save()
+
+        summary = AttendanceMonthlySummary.objects.get(employee=employee, year=2025, month=3)
+        self.assertEqual((summary.total, summary.present, summary.absent), (1, 0, 1))
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        employees = [create_employee(i) for i in range(3)]
+        for i in range(12):
+            for employee in employees:
+                Attendance.objects.create(employee=employee, date=date(2025, 4, 1) + timedelta(days=i), status='PRESENT')
+        cls.expected = list(Attendance.objects.order_by('-date', '-id').values_list('id', flat=True))
+
+    def test_cursor_round_trip(self):
+        values = ['2025-04-03', 17]
+        self.assertEqual(decode_cursor(encode_cursor('prev', values)), ('prev', values))
+
+    def test_pages_cover_every_row_in_both_directions(self):
+        seen, pages, cursor = [], [], None
+        while True:
+            page = keyset_page(Attendance.objects.all(), cursor, page_size=7)
+            pages.append(page)
+            seen.extend(attendance.id for attendance in page['object_list'])
+            cursor = page['next_cursor']
+            if not page['has_next']:
+                break
+        self.assertEqual(seen, self.expected)
+        self.assertFalse(pages[0]['has_previous'])
+
+        # Retour en arrière depuis la dernière page
+        for previous in reversed(pages[:-1]):
+            page = keyset_page(Attendance.objects.all(), page['previous_cursor'], page_size=7)
+            self.assertEqual(
+                [attendance.id for attendance in page['object_list']],
+                [attendance.id for attendance in previous['object_list']],
+            )
+        self.assertFalse(page['has_previous'])
+
+    def test_invalid_cursor(self):
+        for cursor in ('pas-un-curseur', encode_cursor('next', ['2025-04-03']), encode_cursor('next', ['hier', 3])):
+            with self.assertRaises(InvalidCursor):
+                keyset_page(Attendance.objects.all(), cursor)
+
+    def test_invalid_cursor_is_a_bad_request(self):
+        hr = create_employee(99)
+        hr.role = 'HR'
+        hr.save()
+        self.client.force_login(hr.user)
+        response = self.client.get(reverse('attendance:attendance_list'), {'cursor': 'pas-un-curseur'})
+        self.assertEqual(response.status_code, 400)
+
+
+class LeaveApprovalTests(TestCase):
+    """Approuver puis annuler une demande ne touche que les jours LEAVE qu'elle a créés"""
+
+    def setUp(self):
+        super().setUp()
+        self.employee = create_employee(1)
+        self.hr = create_employee(2)
+        self.hr.role = 'HR'
+        self.hr.save()
+        # Du lundi 2 au vendredi 13 juin 2025 : 10 jours ouvrés
+        self.leave = LeaveRequest.objects.create(
+            employee=self.employee, start_date=date(2025, 6, 2), end_date=date(2025, 6, 13), reason='Vacances'
+        )
+        Attendance.objects.create(employee=self.employee, date=date(2025, 6, 4), status='PRESENT')
+        self.client.force_login(self.hr.user)
+
+    def june(self):
+        return AttendanceMonthlySummary.objects.get(employee=self.employee, year=2025, month=6)
+
+    def test_approve_then_cancel(self):
+        self.client.post(reverse('attendance:approve_leave', args=[self.leave.id]))
+
+        leave_days = Attendance.objects.filter(leave_request=self.leave)
+        self.assertEqual(leave_days.count(), 9)
+        self.assertFalse(leave_days.exclude(status='LEAVE').exists())
+        hand_entered = Attendance.objects.get(employee=self.employee, date=date(2025, 6, 4))
+        self.assertEqual((hand_entered.status, hand_entered.leave_request_id), ('PRESENT', None))
+        self.assertEqual((self.june().total, self.june().leave), (10, 9))
+
+        # Jour remarqué pendant le congé : conservé à l'annulation, détaché de la demande
+        remarked = Attendance.objects.get(employee=self.employee, date=date(2025, 6, 10))
+        remarked.status = 'ABSENT'
+        remarked.save()
+
+        self.client.post(reverse('attendance:cancel_leave', args=[self.leave.id]))
+
+        self.assertEqual(
+            sorted(Attendance.objects.filter(employee=self.employee).values_list('date', 'status', 'leave_request')),
+            [(date(2025, 6, 4), 'PRESENT', None), (date(2025, 6, 10), 'ABSENT', None)],
+        )
+        self.assertEqual((self.june().total, self.june().leave, self.june().absent), (2, 0, 1))
+
+    def test_approve_and_reject_require_post(self):
+        for name in ('attendance:approve_leave', 'attendance:reject_leave'):
+            response = self.client.get(reverse(name, args=[self.leave.id]))
+            self.assertEqual(response.status_code, 405)
+        self.leave.refresh_from_db()
+        self.assertEqual(self.leave.status, 'PENDING')
+        self.assertEqual(Attendance.objects.count(), 1)
+
+    def test_only_pending_requests_are_processed(self):
+        approve = reverse('attendance:approve_leave', args=[self.leave.id])
+        self.client.post(approve)
+        approved_at = LeaveRequest.objects.get(id=self.leave.id).approved_at
+
+        # Deuxième approbation, refus d'une demande approuvée : sans effet
+        self.client.post(approve)
+        self.client.post(reverse('attendance:reject_leave', args=[self.leave.id]))
+        leave = LeaveRequest.objects.get(id=self.leave.id)
+        self.assertEqual((leave.status, leave.approved_at), ('APPROVED', approved_at))
+        self.assertEqual(Attendance.objects.filter(leave_request=self.leave).count(), 9)
+
+        cancel = reverse('attendance:cancel_leave', args=[self.leave.id])
+        self.client.post(cancel)
+        self.client.post(approve)
+        self.client.post(cancel)
+        self.assertEqual(LeaveRequest.objects.get(id=self.leave.id).status, 'CANCELLED')
+        self.assertEqual(Attendance.objects.count(), 1)
+        self.assertEqual((self.june().total, self.june().leave), (1, 0))
+
+
+class RosterTests(TestCase):
+    """Une feuille mensuelle s'enregistre en un seul POST, cellule par cellule"""
+
+    def setUp(self):
+        super().setUp()
+        self.team = [create_employee(i) for i in range(3)]
+        self.manager = self.team[0]
+        self.manager.role = 'MANAGER'
+        self.manager.save()
+        self.outsider = create_employee(9, Department.objects.create(name='Ventes'))
+        for member in self.team:
+            Attendance.objects.create(employee=member, date=date(2025, 3, 3), status='PRESENT')
+        self.client.force_login(self.manager.user)
+
+    def post(self, changes, **cells):
+        url = reverse('attendance:roster') + f'?department={self.outsider.department_id}&month=2025-03&format=json'
+        response = self.client.post(url, {'changes': ','.join(changes), **cells})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cell_outcomes(self):
+        first, second, third = (member.id for member in self.team)
+        body = self.post([
+            f'{first}:3:PRESENT',
+            f'{first}:4:ABSENT',
+            f'{second}:3:HALF_DAY',
+            f'{third}:3:',
+            f'{third}:4:VACANCES',
+            f'{third}:32:PRESENT',
+            f'{self.outsider.id}:4:PRESENT',
+        ], **{f'cell_{second}_5': 'LEAVE'})
+
+        self.assertEqual(body['results'], {
+            f'cell_{first}_3': 'unchanged',
+            f'cell_{first}_4': 'created',
+            f'cell_{second}_3': 'updated',
+            f'cell_{second}_5': 'created',
+            f'cell_{third}_3': 'deleted',
+            f'cell_{third}_4': 'invalid',
+            f'cell_{third}_32': 'invalid',
+            f'cell_{self.outsider.id}_4': 'invalid',
+        })
+        # Un manager n'écrit que dans son département
+        self.assertEqual(sorted(Attendance.objects.values_list('employee_id', 'date', 'status', 'marked_by')), [
+            (first, date(2025, 3, 3), 'PRESENT', None),
+            (first, date(2025, 3, 4), 'ABSENT', self.manager.user_id),
+            (second, date(2025, 3, 3), 'HALF_DAY', self.manager.user_id),
+            (second, date(2025, 3, 5), 'LEAVE', self.manager.user_id),
+        ])
+        self.assertEqual(summaries()[(second, 2025, 3)][:5], (2, 0, 0, 1, 1))
+        self.assertNotIn((third, 2025, 3), {key for key, values in summaries().items() if values[0]})
+
+    def test_queries_do_not_grow_with_cells(self):
+        def queries(status, days):
+            changes = [f'{member.id}:{day}:{status}' for member in self.team for day in days]
+            with CaptureQueriesContext(connection) as context:
+                self.post(changes)
+            return len(context)
+
+        few = queries('ABSENT', range(10, 12))
+        self.assertEqual(queries('ABSENT', range(12, 32)), few)
+        self.assertEqual(queries('PRESENT', range(10, 32)), few)
+
+
+class PeriodTests(SimpleTestCase):
+
+    def test_month_bounds(self):
+        self.assertEqual(month_range(2025, 12), (date(2025, 12, 1), date(2026, 1, 1)))
+        self.assertEqual(month_filter(2024, 2, 'start_date'), {
+            'start_date__gte': date(2024, 2, 1), 'start_date__lt': date(2024, 3, 1),
+        })
+        self.assertEqual(year_filter('2025'), {'date__gte': date(2025, 1, 1), 'date__lt': date(2026, 1, 1)})
+        self.assertEqual(len(month_days(2024, 2)), 29)
+        self.assertEqual(month_days(2025, 4)[-1], date(2025, 4, 30))
+        self.assertEqual(len(list(working_days(date(2025, 6, 2), date(2025, 6, 15)))), 10)
+        self.assertEqual([parse_day('2025-02-30'), parse_day(None), parse_day('2025-02-03')], [None, None, date(2025, 2, 3)])
+
+
+class MonthRangeQueryTests(TestCase):
+
+    def test_range_matches_date_parts(self):
+        employee = create_employee(1)
+        for day in (date(2024, 12, 31), date(2025, 1, 1), date(2025, 1, 31), date(2025, 2, 1), date(2025, 12, 31)):
+            Attendance.objects.create(employee=employee, date=day, status='PRESENT')
+
+        for year, month in ((2024, 12), (2025, 1), (2025, 2), (2025, 12)):
+            ranged = Attendance.objects.filter(**month_filter(year, month))
+            self.assertEqual(set(ranged), set(Attendance.objects.filter(date__year=year, date__month=month)))
+            # Comparaison directe de la colonne : pas d'extraction qui empêche l'index
+            self.assertNotIn('django_date_extract', str(ranged.query))
+
+    def test_main_queries_use_an_index(self):
+        employee = create_employee(1)
+        Attendance.objects.create(employee=employee, date=date(2025, 3, 3), status='PRESENT')
+        LeaveRequest.objects.create(employee=employee, start_date=date(2025, 3, 10), end_date=date(2025, 3, 11), reason='Congé')
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('Toutes les requêtes principales utilisent un index', out.getvalue())
+
+
+def random_intervals(rng, count, employees=4):
+    intervals = []
+    for i in range(count):
+        start = date(2025, 1, 1) + timedelta(days=rng.randrange(120))
+        intervals.append((i + 1, rng.randrange(employees), start, start + timedelta(days=rng.randrange(15))))
+    return intervals
+
+
+def brute_force_overlaps(intervals):
+    return {
+        (frozenset((a[0], b[0])), a[1], max(a[2], b[2]), min(a[3], b[3]))
+        for i, a in enumerate(intervals)
+        for b in intervals[i + 1:]
+        if a[1] == b[1] and a[2] <= b[3] and b[2] <= a[3]
+    }
+
+
+class FindOverlapsTests(SimpleTestCase):
+
+    def test_matches_brute_force(self):
+        rng = random.Random(23)
+        for _ in range(50):
+            intervals = sorted(random_intervals(rng, 40), key=lambda interval: (interval[1], interval[2]))
+            found = [
+                (frozenset((id_a, id_b)), employee_id, start, end)
+                for id_a, id_b, employee_id, start, end in find_overlaps(intervals)
+            ]
+            self.assertEqual(len(found), len(set(found)))
+            self.assertEqual(set(found), brute_force_overlaps(intervals))
+
+    def test_touching_intervals_overlap(self):
+        day = date(2025, 3, 10)
+        intervals = [(1, 7, day - timedelta(days=3), day), (2, 7, day, day + timedelta(days=2))]
+        self.assertEqual(list(find_overlaps(intervals)), [(1, 2, 7, day, day)])
+
+
+class OverlappingLeavesTests(TestCase):
+
+    def test_matches_brute_force(self):
+        rng = random.Random(230)
+        employees = [create_employee(i) for i in range(2)]
+        leaves = [
+            LeaveRequest.objects.create(
+                employee=employees[employee], start_date=start, end_date=end, reason='Congé',
+                status=rng.choice(['PENDING', 'APPROVED', 'REJECTED', 'CANCELLED']),
+            )
+            for _, employee, start, end in random_intervals(rng, 60, employees=2)
+        ]
+        for _ in range(30):
+            employee = rng.choice(employees)
+            start = date(2025, 1, 1) + timedelta(days=rng.randrange(130))
+            end = start + timedelta(days=rng.randrange(10))
+            expected = {
+                leave.id for leave in leaves
+                if leave.employee_id == employee.id and leave.status in ('PENDING', 'APPROVED')
+                and leave.start_date <= end and start <= leave.end_date
+            }
+            found = set(overlapping_leaves(employee.id, start, end).values_list('id', flat=True))
+            self.assertEqual(found, expected)
+
+
+class ExistingCellsTests(TestCase):
+
+    def test_matches_brute_force(self):
+        rng = random.Random(22)
+        employees = [create_employee(i) for i in range(3)]
+        days = [date(2025, 1, 1) + timedelta(days=i) for i in range(200)]
+        stored = set()
+        for employee in employees:
+            for day in rng.sample(days, 60):
+                Attendance.objects.create(employee=employee, date=day, status=rng.choice(STATUSES))
+                stored.add((employee.id, day))
+
+        # TERMS_PER_QUERY réduit : les intervalles sont lus en plusieurs requêtes
+        for terms in (bulk.TERMS_PER_QUERY, 3):
+            with self.subTest(terms=terms), mock.patch.object(bulk, 'TERMS_PER_QUERY', terms):
+                for _ in range(10):
+                    cells = {(rng.choice(employees).id, rng.choice(days)) for _ in range(rng.randrange(1, 40))}
+                    self.assertEqual(existing_cells(cells), cells & stored)
+
+    def test_reads_only_the_requested_ranges(self):
+        employee = create_employee(1)
+        for i in range(60):
+            Attendance.objects.create(employee=employee, date=date(2025, 1, 1) + timedelta(days=i), status='PRESENT')
+        cells = {(employee.id, date(2025, 1, 2)), (employee.id, date(2025, 3, 1))}
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(existing_cells(cells), cells)
+        self.assertEqual(len(queries), 1)
+        # Deux intervalles d'un jour, pas les deux mois qui les séparent
+        self.assertEqual(len(list(bulk._covering_rows(Attendance, cells, 'id'))), 2)
+
+
+class ImportAttendanceTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.employee = create_employee(1)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def run_import(self, name, content, *args):
+        path = self.directory / name
+        path.write_text(content, encoding='utf-8')
+        call_command('import_attendance', str(path), *args, stdout=StringIO())
+        with open(f'{path}.rejects.jsonl', encoding='utf-8') as rejects:
+            return [json.loads(line) for line in rejects]
+
+    def stored(self):
+        return list(Attendance.objects.order_by('date').values_list('date', 'status', 'check_in_time', 'notes'))
+
+    def test_rejects_report_file_lines(self):
+        rejects = self.run_import('badges.csv', (
+            'employee_id,date,status,notes\n'
+            'EMP001,2025-03-03,PRESENT,\n'
+            'EMP999,2025-03-04,PRESENT,\n'
+            '\n'
+            'EMP001,2025-03-05,PRESENT,"sur\ndeux lignes"\n'
+            'EMP001,2025-13-01,PRESENT,\n'
+        ))
+        self.assertEqual([(reject['line'], reject['error']) for reject in rejects], [
+            (3, "employé inconnu: 'EMP999'"),
+            (7, "date invalide: '2025-13-01'"),
+        ])
+
+        rejects = self.run_import('badges.jsonl', (
+            '{"employee_id": "EMP001", "date": "2025-03-06", "status": "ABSENT"}\n'
+            '\n'
+            '{"employee_id": "EMP001", "date": "2025-03-07"\n'
+            '{"employee_id": "EMP001", "date": "2025-03-08", "status": "VACANCES"}\n'
+        ))
+        self.assertEqual([(reject['line'], reject['error']) for reject in rejects], [
+            (3, 'JSON invalide'),
+            (4, "statut invalide: 'VACANCES'"),
+        ])
+        self.assertEqual([row[:2] for row in self.stored()], [
+            (date(2025, 3, 3), 'PRESENT'), (date(2025, 3, 5), 'PRESENT'), (date(2025, 3, 6), 'ABSENT'),
+        ])
+
+    def test_conflict_modes(self):
+        Attendance.objects.create(
+            employee=self.employee, date=date(2025, 3, 3), status='ABSENT', check_in_time=clock(9, 0), notes='Badge'
+        )
+        content = (
+            'employee_id,date,status,check_in_time,notes\n'
+            'EMP001,2025-03-03,present,,\n'
+            'EMP001,2025-03-04,HALF_DAY,09:30,\n'
+        )
+
+        self.run_import('skip.csv', content, '--on-conflict', 'skip')
+        self.assertEqual(self.stored(), [
+            (date(2025, 3, 3), 'ABSENT', clock(9, 0), 'Badge'),
+            (date(2025, 3, 4), 'HALF_DAY', clock(9, 30), ''),
+        ])
+
+        # Les colonnes facultatives vides n'écrasent pas les valeurs enregistrées
+        self.run_import('update.csv', content)
+        self.assertEqual(self.stored(), [
+            (date(2025, 3, 3), 'PRESENT', clock(9, 0), 'Badge'),
+            (date(2025, 3, 4), 'HALF_DAY', clock(9, 30), ''),
+        ])
+        self.assertEqual(summaries()[(self.employee.id, 2025, 3)][:3], (2, 1, 0))
+
+
+class BitmapTests(TestCase):
+
+    def test_encode_decode_round_trip(self):
+        rng = random.Random(24)
+        for year, month, days in ((2025, 1, 31), (2025, 2, 28), (2024, 2, 29), (2025, 4, 30)):
+            for _ in range(20):
+                statuses = [rng.choice(STATUSES + [None]) for _ in range(days)]
+                marked = statuses_bits = 0
+                for i, status in enumerate(statuses):
+                    if status is not None:
+                        day = date(year, month, i + 1)
+                        marked |= day_bit(day)
+                        statuses_bits |= status_bits(day, status)
+                self.assertEqual(day_statuses_of(marked, statuses_bits, year, month), statuses)
+
+    def test_summary_bitmaps_decode_to_attendances(self):
+        """Bitmaps tenus par save() / delete() puis recalculés en SQL, jusqu'au 31 en LEAVE (bits de poids fort)"""
+        rng = random.Random(240)
+        employee = create_employee(1)
+        statuses = [rng.choice(STATUSES) for _ in range(30)] + ['LEAVE']
+        for i, status in enumerate(statuses):
+            Attendance.objects.create(employee=employee, date=date(2025, 1, i + 1), status=status)
+        for i in rng.sample(range(30), 8):
+            Attendance.objects.get(employee=employee, date=date(2025, 1, i + 1)).delete()
+            statuses[i] = None
+
+        for refresh in (False, True):
+            if refresh:
+                refresh_summaries([(employee.id, 2025, 1)])
+            summary = AttendanceMonthlySummary.objects.get(employee=employee, year=2025, month=1)
+            self.assertEqual(day_statuses_of(summary.marked_days, summary.day_statuses, 2025, 1), statuses)
+
+
+class ArchivedYearWriteTests(TransactionTestCase):
+    """Un jour d'une année archivée n'a qu'une ligne, dans son archive (l'éditeur de schéma exclut TestCase)"""
+
+    def setUp(self):
+        super().setUp()
+        self.employee = create_employee(1)
+        for day in (date(2024, 3, 4), date(2024, 3, 5)):
+            Attendance.objects.create(employee=self.employee, date=day, status='PRESENT')
+        archive_year(2024)
+        self.archive = archive_model(2024)
+
+    def tearDown(self):
+        with connection.schema_editor() as editor:
+            for year in archived_years():
+                editor.delete_model(archive_model(year))
+
+    def rows(self):
+        """(table, date, statut) de toutes les lignes de l'employé"""
+        return sorted(
+            (model._meta.db_table, day, status)
+            for model in (Attendance, self.archive)
+            for day, status in model.objects.filter(employee=self.employee).values_list('date', 'status')
+        )
+
+    def march(self):
+        summary = AttendanceMonthlySummary.objects.get(employee=self.employee, year=2024, month=3)
+        return summary.total, summary.present, summary.absent
+
+    def assertSummaryIsFresh(self):
+        incremental = summaries()
+        refresh_summaries(incremental)
+        self.assertEqual(incremental, summaries())
+
+    def test_unit_save_is_refused(self):
+        with self.assertRaises(ValidationError):
+            Attendance.objects.create(employee=self.employee, date=date(2024, 3, 6), status='PRESENT')
+        with self.assertRaises(ValidationError):
+            Attendance.objects.create(employee=self.employee, date=date(2024, 3, 4), status='ABSENT')
+        self.assertEqual(Attendance.objects.count(), 0)
+        self.assertEqual(self.march(), (2, 2, 0))
+
+    def test_upsert_writes_to_the_archive(self):
+        upsert_attendances([
+            Attendance(employee=self.employee, date=date(2024, 3, 4), status='ABSENT'),
+            Attendance(employee=self.employee, date=date(2024, 3, 6), status='ABSENT'),
+        ])
+
+        table = self.archive._meta.db_table
+        self.assertEqual(self.rows(), [
+            (table, date(2024, 3, 4), 'ABSENT'),
+            (table, date(2024, 3, 5), 'PRESENT'),
+            (table, date(2024, 3, 6), 'ABSENT'),
+        ])
+        self.assertEqual(AttendanceArchive.objects.get(year=2024).rows, 3)
+        self.assertEqual(self.march(), (3, 1, 2))
+        self.assertSummaryIsFresh()
+
+        # Le jour déplacé garde un identifiant pris dans la table vive
+        new = Attendance.objects.create(employee=self.employee, date=date(2025, 3, 3), status='PRESENT')
+        self.assertEqual(len(set(self.archive.objects.values_list('id', flat=True)) | {new.id}), 4)
+
+    def test_insert_skips_archived_days(self):
+        created = insert_attendances([
+            Attendance(employee=self.employee, date=date(2024, 3, 5), status='LEAVE'),
+            Attendance(employee=self.employee, date=date(2024, 3, 7), status='LEAVE'),
+        ])
+
+        self.assertEqual(created, 1)
+        table = self.archive._meta.db_table
+        self.assertEqual(self.rows(), [
+            (table, date(2024, 3, 4), 'PRESENT'),
+            (table, date(2024, 3, 5), 'PRESENT'),
+            (table, date(2024, 3, 7), 'LEAVE'),
+        ])
+        self.assertSummaryIsFresh()
+
+    def test_delete_reaches_the_archive(self):
+        deleted = delete_attendances([(self.employee.id, date(2024, 3, 4))])
+
+        self.assertEqual(deleted, 1)
+        self.assertEqual(self.rows(), [(self.archive._meta.db_table, date(2024, 3, 5), 'PRESENT')])
+        self.assertEqual(self.march(), (1, 1, 0))
+
+    def test_stale_schema_is_rebuilt_after_migrate(self):
+        table = self.archive._meta.db_table
+        AttendanceArchive.objects.filter(year=2024).update(schema='')
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name("att2024_date_status_idx")}')
+
+        sync_archive_schemas()
+
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, table)
+        self.assertTrue({index.name for index in self.archive._meta.indexes} <= set(constraints))
+        self.assertEqual(AttendanceArchive.objects.get(year=2024).schema, schema_signature(2024))
+        self.assertEqual(self.rows(), [(table, date(2024, 3, 4), 'PRESENT'), (table, date(2024, 3, 5), 'PRESENT')])
@@ -1,32 +1,33 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from django.http import HttpResponse, JsonResponse
+from django.db import transaction
 from django.db.models import Q, Count, Avg
 from django.utils import timezone
+from django.views.decorators.http import require_POST
 from datetime import datetime, date, timedelta
-from decimal import Decimal
 import calendar
 
-from employees.models import Employee, Department, SalaryCalculation
-from .models import Attendance, LeaveRequest
+from employees.decorators import query_budget, role_required
+from employees.models import Employee, Department
+from employees.payroll import calculate_payroll
+from .models import Attendance, AttendanceMonthlySummary, LeaveRequest
+from .archive import archived_years, attendance_sources
+from .bitmaps import day_statuses_of
+from .bulk import delete_attendances, upsert_attendances
+from .leaves import (
+    MAX_LEAVE_DAYS, find_leave_conflicts, materialize_leaves, overlapping_leaves, release_leaves,
+)
+from .pagination import keyset_page, page_links, page_size_from
+from .periods import month_days, parse_day
 
 
-@login_required
+@role_required('HR', 'MANAGER')
 def attendance_list(request):
     """Liste des présences (HR/Admin et Managers)"""
-    try:
-        employee = request.user.employee_profile
-    except Employee.DoesNotExist:
-        messages.error(request, "Profil employé non trouvé.")
-        return redirect('login')
-    
-    if employee.role not in ['HR', 'MANAGER']:
-        messages.error(request, "Accès non autorisé.")
-        return redirect('employees:dashboard')
-    
-    attendances = Attendance.objects.select_related('employee__user', 'employee__department').order_by('-date')
+    employee = request.employee
     
     # Filtres
     department_filter = request.GET.get('department')
@@ -35,31 +36,41 @@ def attendance_list(request):
     date_to = request.GET.get('date_to')
     employee_filter = request.GET.get('employee')
     
+    conditions = Q()
     if employee.role == 'MANAGER':
         # Managers ne voient que leur département
-        attendances = attendances.filter(employee__department=employee.department)
+        conditions &= Q(employee__department=employee.department)
     
     if department_filter:
-        attendances = attendances.filter(employee__department_id=department_filter)
+        conditions &= Q(employee__department_id=department_filter)
     if status_filter:
-        attendances = attendances.filter(status=status_filter)
-    if date_from:
-        attendances = attendances.filter(date__gte=date_from)
-    if date_to:
-        attendances = attendances.filter(date__lte=date_to)
+        conditions &= Q(status=status_filter)
     if employee_filter:
-        attendances = attendances.filter(employee_id=employee_filter)
+        conditions &= Q(employee_id=employee_filter)
+    
+    # Table vive et archives des années de la période
+    attendances = [
+        source.select_related('employee__user', 'employee__department', 'marked_by').filter(conditions)
+        for source in attendance_sources(parse_day(date_from), parse_day(date_to))
+    ]
     
     # Départements disponibles pour les filtres
     if employee.role == 'HR':
         departments = Department.objects.all()
-        employees = Employee.objects.filter(is_active=True)
+        employees = Employee.objects.select_related('user').filter(is_active=True)
     else:
         departments = [employee.department]
-        employees = Employee.objects.filter(department=employee.department, is_active=True)
+        employees = Employee.objects.select_related('user').filter(department=employee.department, is_active=True)
+    
+    page = page_links(request, keyset_page(
+        attendances,
+        cursor=request.GET.get('cursor'),
+        page_size=page_size_from(request.GET),
+    ))
     
     context = {
-        'attendances': attendances,
+        'attendances': page['object_list'],
+        'page': page,
         'departments': departments,
         'employees': employees,
         'status_choices': Attendance.STATUS_CHOICES,
@@ -75,18 +86,10 @@ def attendance_list(request):
     return render(request, 'attendance/attendance_list.html', context)
 
 
-@login_required
+@role_required('HR', 'MANAGER')
 def mark_attendance(request):
     """Marquer la présence (HR/Admin et Managers)"""
-    try:
-        employee = request.user.employee_profile
-    except Employee.DoesNotExist:
-        messages.error(request, "Profil employé non trouvé.")
-        return redirect('login')
-    
-    if employee.role not in ['HR', 'MANAGER']:
-        messages.error(request, "Accès non autorisé.")
-        return redirect('employees:dashboard')
+    employee = request.employee
     
     if request.method == 'POST':
         employee_id = request.POST.get('employee_id')
@@ -131,14 +134,16 @@ def mark_attendance(request):
             
         except Employee.DoesNotExist:
             messages.error(request, "Employé non trouvé.")
+        except ValidationError as e:
+            messages.error(request, ' '.join(e.messages))
         except Exception as e:
             messages.error(request, f"Erreur lors de l'enregistrement: {str(e)}")
     
     # Employés disponibles pour marquer la présence
     if employee.role == 'HR':
-        available_employees = Employee.objects.filter(is_active=True).order_by('user__last_name')
+        available_employees = Employee.objects.select_related('user', 'department').filter(is_active=True).order_by('user__last_name')
     else:
-        available_employees = Employee.objects.filter(
+        available_employees = Employee.objects.select_related('user', 'department').filter(
             department=employee.department, 
             is_active=True
         ).order_by('user__last_name')
@@ -152,18 +157,10 @@ def mark_attendance(request):
     return render(request, 'attendance/mark_attendance.html', context)
 
 
-@login_required
+@role_required('HR', 'MANAGER')
 def mark_employee_attendance(request, employee_id):
     """Marquer la présence d'un employé spécifique"""
-    try:
-        current_employee = request.user.employee_profile
-    except Employee.DoesNotExist:
-        messages.error(request, "Profil employé non trouvé.")
-        return redirect('login')
-    
-    if current_employee.role not in ['HR', 'MANAGER']:
-        messages.error(request, "Accès non autorisé.")
-        return redirect('employees:dashboard')
+    current_employee = request.employee
     
     target_employee = get_object_or_404(Employee, id=employee_id)
     
@@ -204,6 +201,8 @@ def mark_employee_attendance(request, employee_id):
             messages.success(request, f"Présence {action} avec succès.")
             return redirect('attendance:attendance_list')
             
+        except ValidationError as e:
+            messages.error(request, ' '.join(e.messages))
         except Exception as e:
             messages.error(request, f"Erreur lors de l'enregistrement: {str(e)}")
     
@@ -222,48 +221,204 @@ def mark_employee_attendance(request, employee_id):
     return render(request, 'attendance/mark_employee_attendance.html', context)
 
 
-@login_required
-def my_attendance(request):
-    """Mes présences (Employés)"""
+# Libellés courts des statuts dans la feuille mensuelle
+ROSTER_LABELS = {
+    'PRESENT': 'P',
+    'ABSENT': 'A',
+    'HALF_DAY': '½',
+    'LEAVE': 'C',
+}
+
+
+# Clé de session des résultats du dernier enregistrement de la feuille
+ROSTER_RESULTS_KEY = 'roster_results'
+
+
+def roster_changes(data):
+    """
+    Cellules soumises {"cell_<employé>_<jour>": statut} : le champ compact
+    `changes` ("12:3:PRESENT,12:4:" ; statut vide = suppression), envoyé par
+    la page avec les seules cellules modifiées, et des champs cell_* isolés
+    (formulaire sans JavaScript, clients JSON).
+    """
+    cells = {name: value for name, value in data.items() if name.startswith('cell_')}
+    for entry in data.get('changes', '').split(','):
+        employee_id, _, rest = entry.partition(':')
+        day, _, status = rest.partition(':')
+        if employee_id and day:
+            cells[f"cell_{employee_id}_{day}"] = status
+    return cells
+
+
+# Nombre constant de requêtes quel que soit le nombre de cellules ; un
+# enregistrement qui crée, modifie et supprime à la fois en fait 22
+@query_budget(25)
+@role_required('HR', 'MANAGER')
+def roster(request):
+    """Feuille de présence mensuelle d'un département (HR/Admin et Managers)"""
+    employee = request.employee
+    
+    # Managers : leur département uniquement
+    if employee.role == 'HR':
+        departments = list(Department.objects.order_by('name'))
+        department_id = request.GET.get('department') or (departments[0].id if departments else None)
+        department = next((d for d in departments if str(d.id) == str(department_id)), None)
+    else:
+        departments = [employee.department]
+        department = employee.department
+    
     try:
-        employee = request.user.employee_profile
-    except Employee.DoesNotExist:
-        messages.error(request, "Profil employé non trouvé.")
-        return redirect('login')
+        period = datetime.strptime(request.GET.get('month', ''), '%Y-%m').date()
+    except ValueError:
+        period = date.today().replace(day=1)
+    days = month_days(period.year, period.month)
+    
+    team = list(
+        Employee.objects.filter(department=department, is_active=True)
+        .select_related('user')
+        .order_by('user__last_name', 'user__first_name')
+    )
+    # Un mois d'une année archivée se lit (et s'écrit) dans son archive
+    archived = archived_years()
+    existing = {
+        (employee_id, day): status
+        for source in attendance_sources(days[0], days[-1], archived)
+        for employee_id, day, status in source.filter(
+            employee__in=team,
+        ).values_list('employee_id', 'date', 'status')
+    }
+    
+    results = {}
+    if request.method == 'POST' and department is not None:
+        valid_statuses = dict(Attendance.STATUS_CHOICES)
+        submitted = roster_changes(request.POST)
+        to_upsert = []
+        to_delete = []
+        for member in team:
+            for day in days:
+                name = f"cell_{member.id}_{day.day}"
+                if name not in submitted:
+                    continue
+                status = submitted.pop(name)
+                current = existing.get((member.id, day))
+                if status == (current or ''):
+                    results[name] = 'unchanged'
+                elif status and status not in valid_statuses:
+                    results[name] = 'invalid'
+                elif status:
+                    to_upsert.append(Attendance(
+                        employee=member,
+                        date=day,
+                        status=status,
+                        marked_by=request.user,
+                    ))
+                    results[name] = 'updated' if current else 'created'
+                    existing[(member.id, day)] = status
+                else:
+                    to_delete.append((member.id, day))
+                    results[name] = 'deleted'
+                    existing.pop((member.id, day))
+        # Cellules hors de la feuille (employé d'un autre département, jour hors du mois)
+        for name in submitted:
+            results[name] = 'invalid'
+        
+        roster_url = f"{request.path}?department={department.id}&month={period:%Y-%m}"
+        try:
+            with transaction.atomic():
+                upsert_attendances(to_upsert, update_fields=['status', 'marked_by', 'updated_at'], archived=archived)
+                delete_attendances(to_delete, archived)
+        except Exception as e:
+            messages.error(request, f"Erreur lors de l'enregistrement: {str(e)}")
+            return redirect(roster_url)
+        
+        counts = {outcome: list(results.values()).count(outcome) for outcome in set(results.values())}
+        if request.GET.get('format') == 'json' or request.headers.get('Accept') == 'application/json':
+            return JsonResponse({'results': results, 'counts': counts})
+        messages.success(
+            request,
+            f"Feuille enregistrée : {counts.get('created', 0)} créée(s), "
+            f"{counts.get('updated', 0)} mise(s) à jour, {counts.get('deleted', 0)} supprimée(s)."
+        )
+        if counts.get('invalid'):
+            messages.error(request, f"{counts['invalid']} cellule(s) invalide(s) ignorée(s).")
+        # Résultats par cellule affichés une fois après la redirection
+        request.session[ROSTER_RESULTS_KEY] = {
+            name: outcome for name, outcome in results.items() if outcome != 'unchanged'
+        }
+        return redirect(roster_url)
+    
+    results = request.session.pop(ROSTER_RESULTS_KEY, {})
+    
+    rows = []
+    for member in team:
+        cells = []
+        for day in days:
+            name = f"cell_{member.id}_{day.day}"
+            cells.append({
+                'name': name,
+                'date': day,
+                'status': existing.get((member.id, day), ''),
+                'weekend': day.weekday() >= 5,
+                'result': results.get(name),
+            })
+        rows.append({'employee': member, 'cells': cells})
+    
+    context = {
+        'rows': rows,
+        'days': days,
+        'department': department,
+        'departments': departments,
+        'period': period,
+        'status_labels': [(value, ROSTER_LABELS[value], label) for value, label in Attendance.STATUS_CHOICES],
+    }
     
-    attendances = Attendance.objects.filter(employee=employee).order_by('-date')
+    return render(request, 'attendance/roster.html', context)
+
+
+@role_required()
+def my_attendance(request):
+    """Mes présences (Employés)"""
+    employee = request.employee
     
     # Filtres
     status_filter = request.GET.get('status')
     date_from = request.GET.get('date_from')
     date_to = request.GET.get('date_to')
     
+    conditions = Q(employee=employee)
     if status_filter:
-        attendances = attendances.filter(status=status_filter)
-    if date_from:
-        attendances = attendances.filter(date__gte=date_from)
-    if date_to:
-        attendances = attendances.filter(date__lte=date_to)
+        conditions &= Q(status=status_filter)
+    
+    attendances = [
+        source.filter(conditions)
+        for source in attendance_sources(parse_day(date_from), parse_day(date_to))
+    ]
     
     # Statistiques personnelles
     current_month = datetime.now().month
     current_year = datetime.now().year
     
-    monthly_attendances = attendances.filter(
-        date__year=current_year,
-        date__month=current_month
-    )
+    summary = AttendanceMonthlySummary.objects.filter(
+        employee=employee,
+        year=current_year,
+        month=current_month
+    ).first() or AttendanceMonthlySummary()
     
-    present_days = monthly_attendances.filter(status='PRESENT').count()
-    half_days = monthly_attendances.filter(status='HALF_DAY').count()
-    absent_days = monthly_attendances.filter(status='ABSENT').count()
-    leave_days = monthly_attendances.filter(status='LEAVE').count()
+    try:
+        calendar_year = int(request.GET.get('year', current_year))
+    except ValueError:
+        calendar_year = current_year
+    calendar_year = min(max(calendar_year, 1900), 9999)
     
-    total_working_days = present_days + half_days + absent_days + leave_days
-    attendance_percentage = (present_days + (half_days * 0.5)) / total_working_days * 100 if total_working_days > 0 else 0
+    page = page_links(request, keyset_page(
+        attendances,
+        cursor=request.GET.get('cursor'),
+        page_size=page_size_from(request.GET),
+    ))
     
     context = {
-        'attendances': attendances,
+        'attendances': page['object_list'],
+        'page': page,
         'status_choices': Attendance.STATUS_CHOICES,
         'filters': {
             'status': status_filter,
@@ -271,85 +426,55 @@ def my_attendance(request):
             'date_to': date_to,
         },
         'monthly_stats': {
-            'present': present_days,
-            'half_day': half_days,
-            'absent': absent_days,
-            'leave': leave_days,
-            'percentage': round(attendance_percentage, 2),
-        }
+            'present': summary.present,
+            'half_day': summary.half_day,
+            'absent': summary.absent,
+            'leave': summary.leave,
+            'percentage': summary.attendance_percentage,
+        },
+        'calendar_year': calendar_year,
+        'calendar': year_calendar(employee.id, calendar_year),
     }
     
     return render(request, 'attendance/my_attendance.html', context)
 
 
-@login_required
+def year_calendar(employee_id, year):
+    """
+    Calendrier de l'année, décodé des bitmaps des résumés mensuels (une
+    requête) : pour chaque mois, les semaines de (jour, statut), None hors du mois.
+    """
+    bitmaps = {
+        month: (marked, statuses)
+        for month, marked, statuses in AttendanceMonthlySummary.objects.filter(
+            employee_id=employee_id,
+            year=year
+        ).values_list('month', 'marked_days', 'day_statuses')
+    }
+    months = []
+    for month in range(1, 13):
+        statuses = day_statuses_of(*bitmaps.get(month, (0, 0)), year, month)
+        months.append({
+            'name': calendar.month_name[month],
+            'weeks': [
+                [(day, statuses[day - 1]) if day else None for day in week]
+                for week in calendar.monthcalendar(year, month)
+            ],
+        })
+    return months
+
+
+@role_required('HR')
 def calculate_monthly_salary(request):
     """Calculer les salaires mensuels (HR/Admin uniquement)"""
-    try:
-        employee = request.user.employee_profile
-    except Employee.DoesNotExist:
-        messages.error(request, "Profil employé non trouvé.")
-        return redirect('login')
-    
-    if employee.role != 'HR':
-        messages.error(request, "Accès non autorisé.")
-        return redirect('employees:dashboard')
-    
     if request.method == 'POST':
         month = int(request.POST.get('month'))
         year = int(request.POST.get('year'))
         
         # Calculer les salaires pour tous les employés actifs
-        employees = Employee.objects.filter(is_active=True)
-        calculated_count = 0
-        
-        for emp in employees:
-            # Calculer le pourcentage de présence
-            attendances = Attendance.objects.filter(
-                employee=emp,
-                date__year=year,
-                date__month=month
-            )
-            
-            total_days = attendances.count()
-            if total_days == 0:
-                continue
-            
-            present_days = attendances.filter(status='PRESENT').count()
-            half_days = attendances.filter(status='HALF_DAY').count()
-            
-            attendance_percentage = (present_days + (half_days * 0.5)) / total_days * 100
-            
-            # Calculer les déductions
-            deduction_amount = Decimal('0')
-            if attendance_percentage < 75:
-                deduction_amount = emp.base_salary * Decimal('0.15')
-            
-            net_salary = emp.base_salary - deduction_amount
-            
-            # Créer ou mettre à jour le calcul de salaire
-            salary_calc, created = SalaryCalculation.objects.get_or_create(
-                employee=emp,
-                month=month,
-                year=year,
-                defaults={
-                    'base_salary': emp.base_salary,
-                    'attendance_percentage': round(attendance_percentage, 2),
-                    'deduction_amount': deduction_amount,
-                    'net_salary': net_salary,
-                }
-            )
-            
-            if not created:
-                salary_calc.base_salary = emp.base_salary
-                salary_calc.attendance_percentage = round(attendance_percentage, 2)
-                salary_calc.deduction_amount = deduction_amount
-                salary_calc.net_salary = net_salary
-                salary_calc.save()
-            
-            calculated_count += 1
+        payroll = calculate_payroll(month, year)
         
-        messages.success(request, f"Salaires calculés pour {calculated_count} employés.")
+        messages.success(request, f"Salaires calculés pour {payroll['calculated']} employés.")
         return redirect('employees:salary_report')
     
     context = {
@@ -360,14 +485,10 @@ def calculate_monthly_salary(request):
     return render(request, 'attendance/calculate_salary.html', context)
 
 
-@login_required
+@role_required()
 def leave_requests(request):
     """Gestion des demandes de congé"""
-    try:
-        employee = request.user.employee_profile
-    except Employee.DoesNotExist:
-        messages.error(request, "Profil employé non trouvé.")
-        return redirect('login')
+    employee = request.employee
     
     if employee.role == 'HR':
         # HR voit toutes les demandes
@@ -383,74 +504,142 @@ def leave_requests(request):
     return render(request, 'attendance/leave_requests.html', context)
 
 
-@login_required
+# Nombre de chevauchements affichés par le rapport (tous sont comptés)
+CONFLICTS_DISPLAYED = 500
+
+
+@role_required()
 def request_leave(request):
     """Demander un congé"""
-    try:
-        employee = request.user.employee_profile
-    except Employee.DoesNotExist:
-        messages.error(request, "Profil employé non trouvé.")
-        return redirect('login')
+    employee = request.employee
     
     if request.method == 'POST':
-        start_date = request.POST.get('start_date')
-        end_date = request.POST.get('end_date')
+        start_date = parse_day(request.POST.get('start_date'))
+        end_date = parse_day(request.POST.get('end_date'))
         reason = request.POST.get('reason', '')
         
-        if start_date and end_date:
-            LeaveRequest.objects.create(
-                employee=employee,
-                start_date=start_date,
-                end_date=end_date,
-                reason=reason
+        if not start_date or not end_date or end_date < start_date:
+            messages.error(request, "Période invalide : la date de fin doit suivre la date de début.")
+        elif (end_date - start_date).days >= MAX_LEAVE_DAYS:
+            messages.error(request, f"Une demande de congé ne peut pas dépasser {MAX_LEAVE_DAYS} jours.")
+        else:
+            with transaction.atomic():
+                # Verrou sur l'employé : deux demandes simultanées ne passent pas toutes les deux le contrôle
+                Employee.objects.select_for_update().filter(pk=employee.pk).exists()
+                conflict = overlapping_leaves(employee.id, start_date, end_date).first()
+                if conflict is None:
+                    LeaveRequest.objects.create(
+                        employee=employee,
+                        start_date=start_date,
+                        end_date=end_date,
+                        reason=reason
+                    )
+            if conflict is None:
+                messages.success(request, "Demande de congé soumise avec succès.")
+                return redirect('attendance:leave_requests')
+            messages.error(
+                request,
+                f"Cette période chevauche votre demande du {conflict.start_date:%d/%m/%Y} au "
+                f"{conflict.end_date:%d/%m/%Y} ({conflict.get_status_display().lower()})."
             )
-            messages.success(request, "Demande de congé soumise avec succès.")
-            return redirect('attendance:leave_requests')
     
-    return render(request, 'attendance/request_leave.html')
+    return render(request, 'attendance/request_leave.html', {'values': request.POST})
 
 
-@login_required
-def approve_leave(request, leave_id):
-    """Approuver une demande de congé (HR/Admin uniquement)"""
-    try:
-        employee = request.user.employee_profile
-    except Employee.DoesNotExist:
-        messages.error(request, "Profil employé non trouvé.")
-        return redirect('login')
-    
-    if employee.role != 'HR':
-        messages.error(request, "Accès non autorisé.")
-        return redirect('employees:dashboard')
-    
-    leave_request = get_object_or_404(LeaveRequest, id=leave_id)
-    leave_request.status = 'APPROVED'
-    leave_request.approved_by = request.user
-    leave_request.approved_at = timezone.now()
-    leave_request.save()
+@role_required('HR')
+def leave_conflicts(request):
+    """Chevauchements entre demandes de congé actives de toute l'entreprise (HR/Admin uniquement)"""
+    pairs = []
+    total = 0
+    for pair in find_leave_conflicts():
+        total += 1
+        if len(pairs) < CONFLICTS_DISPLAYED:
+            pairs.append(pair)
+    
+    leave_ids = {leave_id for first, second, *_ in pairs for leave_id in (first, second)}
+    leaves = LeaveRequest.objects.select_related('employee__user', 'employee__department').in_bulk(leave_ids)
+    conflicts = [
+        {
+            'first': leaves[first],
+            'second': leaves[second],
+            'employee': leaves[first].employee,
+            'start': start,
+            'end': end,
+            'days': (end - start).days + 1,
+        }
+        for first, second, employee_id, start, end in pairs
+    ]
     
-    messages.success(request, "Demande de congé approuvée.")
+    context = {
+        'conflicts': conflicts,
+        'total': total,
+        'truncated': total > len(conflicts),
+    }
+    return render(request, 'attendance/leave_conflicts.html', context)
+
+
+@require_POST
+@role_required('HR')
+def approve_leave(request, leave_id):
+    """Approuver une demande de congé en attente (HR/Admin uniquement)"""
+    get_object_or_404(LeaveRequest, id=leave_id)
+    with transaction.atomic():
+        # Verrou : une double approbation, ou une annulation concurrente, ne
+        # crée ni ne retire les jours deux fois
+        leave_request = LeaveRequest.objects.select_for_update().get(id=leave_id)
+        if leave_request.status != 'PENDING':
+            messages.error(request, "Cette demande a déjà été traitée.")
+            return redirect('attendance:leave_requests')
+        leave_request.status = 'APPROVED'
+        leave_request.approved_by = request.user
+        leave_request.approved_at = timezone.now()
+        leave_request.save()
+        # Jours LEAVE des jours ouvrés, sans écraser les jours déjà marqués
+        days = materialize_leaves([leave_request])
+    
+    messages.success(request, f"Demande de congé approuvée ({days} jour(s) de congé enregistré(s)).")
     return redirect('attendance:leave_requests')
 
 
-@login_required
+@require_POST
+@role_required('HR')
 def reject_leave(request, leave_id):
-    """Rejeter une demande de congé (HR/Admin uniquement)"""
-    try:
-        employee = request.user.employee_profile
-    except Employee.DoesNotExist:
-        messages.error(request, "Profil employé non trouvé.")
-        return redirect('login')
+    """Rejeter une demande de congé en attente (HR/Admin uniquement)"""
+    get_object_or_404(LeaveRequest, id=leave_id)
+    with transaction.atomic():
+        leave_request = LeaveRequest.objects.select_for_update().get(id=leave_id)
+        if leave_request.status != 'PENDING':
+            messages.error(request, "Cette demande a déjà été traitée.")
+            return redirect('attendance:leave_requests')
+        leave_request.status = 'REJECTED'
+        leave_request.approved_by = request.user
+        leave_request.approved_at = timezone.now()
+        leave_request.save()
     
-    if employee.role != 'HR':
-        messages.error(request, "Accès non autorisé.")
-        return redirect('employees:dashboard')
+    messages.success(request, "Demande de congé rejetée.")
+    return redirect('attendance:leave_requests')
+
+
+@require_POST
+@role_required()
+def cancel_leave(request, leave_id):
+    """Annuler une demande de congé en attente ou approuvée (demandeur ou HR)"""
+    employee = request.employee
     
     leave_request = get_object_or_404(LeaveRequest, id=leave_id)
-    leave_request.status = 'REJECTED'
-    leave_request.approved_by = request.user
-    leave_request.approved_at = timezone.now()
-    leave_request.save()
+    if employee.role != 'HR' and leave_request.employee_id != employee.id:
+        messages.error(request, "Accès non autorisé.")
+        return redirect('attendance:leave_requests')
     
-    messages.success(request, "Demande de congé rejetée.")
-    return redirect('attendance:leave_requests')
\ No newline at end of file
+    with transaction.atomic():
+        leave_request = LeaveRequest.objects.select_for_update().get(id=leave_id)
+        if leave_request.status not in ('PENDING', 'APPROVED'):
+            messages.error(request, "Cette demande ne peut plus être annulée.")
+            return redirect('attendance:leave_requests')
+        was_approved = leave_request.status == 'APPROVED'
+        leave_request.status = 'CANCELLED'
+        leave_request.save()
+        released = release_leaves([leave_request]) if was_approved else 0
+    
+    messages.success(request, f"Demande de congé annulée ({released} jour(s) de congé retiré(s)).")
+    return redirect('attendance:leave_requests')
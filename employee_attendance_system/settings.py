@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'employees',
     'attendance',
+    'api',
 ]
 
 MIDDLEWARE = [
@@ -47,6 +48,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'employees.middleware.EmployeeContextMiddleware',
+    'employees.middleware.QueryBudgetMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -83,6 +86,19 @@ DATABASES = {
 }
 
 
+# Cache
+# Fichiers partagés entre les workers gunicorn : une invalidation faite par
+# un worker est vue par tous (statistiques du tableau de bord). Les tests
+# utilisent un cache en mémoire (employee_attendance_system.testing)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -131,6 +147,40 @@ LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/accounts/login/'
 
+# Nombre de présences par page (pagination par curseur)
+ATTENDANCE_PAGE_SIZE = 50
+
+# Tableau de bord asynchrone (requêtes en parallèle), activé par le profil
+# ASGI (settings_asgi) ; sous WSGI chaque requête créerait sa boucle asyncio
+ASYNC_DASHBOARD = False
+
+# Budget de requêtes SQL par vue (QueryBudgetMiddleware). Les dépassements
+# sont journalisés sur le logger 'employees.query_budget' ; les en-têtes
+# X-Query-Count et Server-Timing sont ajoutés aux réponses
+QUERY_BUDGET_ENABLED = DEBUG
+QUERY_BUDGET_DEFAULT = 20
+QUERY_BUDGET_HEADERS = True
+# Budgets par nom de vue, prioritaires sur @query_budget : {'employees:dashboard': 8}
+QUERY_BUDGETS = {}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        # Une ligne JSON par dépassement de budget
+        'employees.query_budget': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
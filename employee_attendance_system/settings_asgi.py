@@ -0,0 +1,14 @@
+"""
+Settings du déploiement ASGI (Procfile.asgi : gunicorn + workers uvicorn).
+
+Le tableau de bord asynchrone lance ses requêtes dans des threads du pool,
+chacun avec sa propre connexion : les connexions persistantes évitent
+d'en rouvrir une à chaque requête SQL.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+ASYNC_DASHBOARD = True
+
+for database in DATABASES.values():  # noqa: F405
+    database.setdefault('CONN_MAX_AGE', 60)
@@ -0,0 +1,59 @@
+"""
+Settings des tests de charge (python manage.py loadtest).
+
+Reprend les settings du projet avec DEBUG désactivé, et place la base, le
+cache et les fichiers média dans un répertoire de travail dédié : la base
+de développement n'est jamais utilisée.
+
+Variables d'environnement :
+    LOADTEST_DIR          répertoire de travail (obligatoire)
+    LOADTEST_DB_ENGINE    'sqlite' (défaut) ou 'postgresql'
+    LOADTEST_DB_NAME, LOADTEST_DB_USER, LOADTEST_DB_PASSWORD,
+    LOADTEST_DB_HOST, LOADTEST_DB_PORT   connexion PostgreSQL locale
+"""
+
+import os
+from pathlib import Path
+
+from .settings import *  # noqa: F401,F403
+
+LOADTEST_DIR = Path(os.environ['LOADTEST_DIR'])
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+if os.environ.get('LOADTEST_DB_ENGINE', 'sqlite') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('LOADTEST_DB_NAME', 'attendance_loadtest'),
+            'USER': os.environ.get('LOADTEST_DB_USER', ''),
+            'PASSWORD': os.environ.get('LOADTEST_DB_PASSWORD', ''),
+            'HOST': os.environ.get('LOADTEST_DB_HOST', ''),
+            'PORT': os.environ.get('LOADTEST_DB_PORT', ''),
+            # Connexions persistantes, comme en production
+            'CONN_MAX_AGE': 60,
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': LOADTEST_DIR / 'db.sqlite3',
+            # Plusieurs workers écrivent dans le même fichier
+            'OPTIONS': {'timeout': 20},
+        }
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': LOADTEST_DIR / 'cache',
+    }
+}
+
+MEDIA_ROOT = LOADTEST_DIR / 'media'
+
+# Le compteur de requêtes SQL fausserait les mesures
+QUERY_BUDGET_ENABLED = False
@@ -0,0 +1,36 @@
+"""
+Classes de base des tests.
+
+Le cache par défaut est un FileBasedCache partagé avec le serveur de
+développement (voir settings.CACHES) : les tests utilisent à la place un
+cache en mémoire, vidé avant chaque test. Un résultat mis en cache par
+un test n'est pas relu par le suivant, dont la base a été réinitialisée.
+"""
+
+from django import test
+from django.core.cache import cache
+from django.test import override_settings
+
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests',
+    }
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TestCase(test.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TransactionTestCase(test.TransactionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
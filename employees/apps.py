@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class EmployeesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'employees'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        if getattr(settings, 'QUERY_BUDGET_ENABLED', False):
+            from django.db.backends.signals import connection_created
+            from .middleware import install_query_counting
+
+            # Toute connexion, dans tout thread, compte pour la requête HTTP en cours
+            connection_created.connect(install_query_counting, dispatch_uid='employees.query_budget')
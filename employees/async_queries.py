@@ -0,0 +1,39 @@
+"""
+Requêtes ORM lancées en parallèle depuis une vue asynchrone.
+
+Les méthodes async de l'ORM (acount, aaggregate, aget...) passent toutes
+par sync_to_async(thread_sensitive=True) : les requêtes d'une même vue
+partagent un seul thread et s'exécutent l'une après l'autre, même sous
+asyncio.gather. `run_query` exécute au contraire chaque requête dans un
+thread du pool, avec la connexion propre à ce thread : des requêtes
+indépendantes avancent en même temps et la vue attend la plus lente.
+
+Les requêtes lancées ainsi ne doivent pas dépendre d'une transaction de
+la vue : elles ne la voient pas.
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def _with_connection(func):
+    @wraps(func)
+    def run(*args, **kwargs):
+        # Même cycle de vie que pour une requête HTTP : connexion trop
+        # ancienne ou inutilisable fermée avant, et après si CONN_MAX_AGE = 0
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return run
+
+
+def run_query(func, *args, **kwargs):
+    """
+    Awaitable exécutant `func(*args, **kwargs)` dans un thread du pool :
+    await asyncio.gather(run_query(qs.count), run_query(list, qs[:10])).
+    """
+    return sync_to_async(_with_connection(func), thread_sensitive=False)(*args, **kwargs)
@@ -0,0 +1,71 @@
+"""
+Requêtes conditionnelles (ETag / Last-Modified) des pages de paie.
+
+Les bulletins et le rapport de salaires d'un mois clos ne changent
+presque plus : leurs validateurs sont calculés par un agrégat sur les
+lignes SalaryCalculation concernées (nombre et dernière modification),
+et une requête If-None-Match / If-Modified-Since qui correspond reçoit un
+304 sans que la page soit recalculée ni rendue.
+
+Les pages sont propres à l'utilisateur : Cache-Control: private, et
+revalidation à chaque affichage (no-cache) puisqu'un mois peut toujours
+être recalculé. Tant que des messages flash attendent d'être affichés, la
+page est rendue (et les consomme) sans validateurs : un 304 les laisserait
+en attente, et une page qui les contient ne doit pas être revalidée.
+"""
+
+import hashlib
+import json
+
+from django.contrib import messages
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def salary_rows_state(calculations):
+    """Nombre de lignes et dernières modifications (lignes et employés) en une requête"""
+    return calculations.aggregate(
+        count=Count('id'),
+        updated_at=Max('updated_at'),
+        employees_updated_at=Max('employee__updated_at'),
+    )
+
+
+def page_validators(request, state, *parts):
+    """
+    (ETag faible, Last-Modified) d'une page HTML rendue à partir des lignes
+    décrites par `state` (salary_rows_state), d'autres valeurs `parts` et
+    de l'employé connecté (son nom figure dans la barre de navigation).
+    """
+    employee = request.employee
+    values = [employee.pk, employee.updated_at, state, *parts]
+    digest = hashlib.sha256(json.dumps(values, default=str, sort_keys=True).encode()).hexdigest()
+    last_modified = max(
+        (value for value in (employee.updated_at, state['updated_at'], state['employees_updated_at']) if value),
+        default=None,
+    )
+    return 'W/' + quote_etag(digest[:32]), last_modified
+
+
+def conditional_response(request, etag, last_modified, render):
+    """
+    304 si les validateurs envoyés par le client correspondent toujours,
+    sinon la réponse produite par `render()`, avec ses validateurs.
+    """
+    # len() charge les messages sans les marquer comme lus
+    if len(messages.get_messages(request)):
+        response = render()
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    
+    response = get_conditional_response(request, etag=etag, last_modified=(
+        int(last_modified.timestamp()) if last_modified else None
+    ))
+    if response is None:
+        response = render()
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
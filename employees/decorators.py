@@ -0,0 +1,63 @@
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import redirect
+
+from .middleware import get_employee_context
+
+
+def query_budget(queries):
+    """Budget de requêtes SQL de la vue, contrôlé par QueryBudgetMiddleware"""
+    def decorator(view_func):
+        view_func.query_budget = queries
+        return view_func
+    return decorator
+
+
+def _access_denied(request, roles):
+    """Réponse de refus (connexion, profil, rôle), ou None si l'accès est autorisé"""
+    if not request.user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+
+    context = get_employee_context(request)
+    if context is None:
+        messages.error(request, "Profil employé non trouvé. Contactez l'administrateur.")
+        return redirect('login')
+
+    if roles and context.role not in roles:
+        messages.error(request, "Accès non autorisé.")
+        return redirect('employees:dashboard')
+    return None
+
+
+def role_required(*roles):
+    """
+    Réserve la vue aux utilisateurs connectés ayant un profil employé et,
+    si `roles` est donné, l'un de ces rôles : @role_required('HR', 'MANAGER').
+
+    Le contrôle lit le rôle de l'employé chargé pour la requête
+    (EmployeeContextMiddleware), que la vue retrouve dans
+    `request.employee`. Sur une vue async, il est donc chargé avant
+    l'appel de la vue.
+    """
+    def decorator(view_func):
+        if asyncio.iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                denied = await sync_to_async(_access_denied)(request, roles)
+                if denied is not None:
+                    return denied
+                return await view_func(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            denied = _access_denied(request, roles)
+            if denied is not None:
+                return denied
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
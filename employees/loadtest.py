@@ -0,0 +1,346 @@
+"""
+Client HTTP asyncio et générateur de charge (python manage.py loadtest).
+
+Chaque utilisateur virtuel ouvre une session par rôle (HR, manager,
+employé) en passant par la page de connexion, puis enchaîne sans pause des
+requêtes tirées au hasard selon un mélange pondéré de scénarios. Les
+latences sont mesurées de l'envoi de la requête à la lecture complète de
+la réponse, reconnexion comprise.
+
+Le module n'importe aucun modèle : il ne parle au serveur qu'en HTTP.
+"""
+
+import asyncio
+import random
+import re
+import time
+from datetime import date, timedelta
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+
+# Poids par défaut des scénarios
+DEFAULT_MIX = {
+    'dashboard_hr': 10,
+    'dashboard_manager': 15,
+    'dashboard_employee': 25,
+    'attendance_list': 20,
+    'mark_attendance': 15,
+    'payslip': 15,
+}
+
+# Rôle de la session utilisée par chaque scénario
+SCENARIO_ROLES = {
+    'dashboard_hr': 'HR',
+    'dashboard_manager': 'MANAGER',
+    'dashboard_employee': 'EMPLOYEE',
+    'attendance_list': 'MANAGER',
+    'mark_attendance': 'MANAGER',
+    'payslip': 'EMPLOYEE',
+}
+
+STATUSES = ['PRESENT', 'PRESENT', 'PRESENT', 'HALF_DAY', 'ABSENT']
+
+CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+EMPLOYEE_OPTION = re.compile(r'<option value="(\d+)">')
+
+
+class LoadTestError(Exception):
+    """Réponse inattendue pendant la préparation (connexion, page de saisie)"""
+
+
+def parse_mix(value):
+    """Mélange 'dashboard_hr=10,payslip=5' ; les scénarios absents ont un poids nul"""
+    if not value:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.strip().partition('=')
+        if name not in SCENARIO_ROLES:
+            raise ValueError(f"Scénario inconnu: {name} (disponibles: {', '.join(SCENARIO_ROLES)})")
+        mix[name] = float(weight or 1)
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError("Le mélange doit contenir au moins un scénario de poids positif")
+    return mix
+
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def text(self):
+        return self.body.decode('utf-8', errors='replace')
+
+
+class HttpClient:
+    """
+    Client HTTP/1.1 minimal sur une connexion keep-alive, avec ses cookies
+    (une session Django par client). La connexion est rouverte quand le
+    serveur la ferme (workers gunicorn sync).
+    """
+
+    def __init__(self, host, port, timeout=30):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.cookies = {}
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method, path, data=None):
+        return await asyncio.wait_for(self._request(method, path, data), self.timeout)
+
+    async def _request(self, method, path, data):
+        body = urlencode(data).encode() if data is not None else b''
+        lines = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            'Connection: keep-alive',
+            'Accept: text/html,application/pdf',
+        ]
+        if self.cookies:
+            lines.append('Cookie: ' + '; '.join(f'{k}={v}' for k, v in self.cookies.items()))
+        if data is not None:
+            lines.append('Content-Type: application/x-www-form-urlencoded')
+            lines.append(f'Content-Length: {len(body)}')
+        payload = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+        # Une connexion keep-alive fermée par le serveur entre deux requêtes
+        # n'est détectée qu'à la lecture : une seule nouvelle tentative
+        for attempt in range(2):
+            reused = self.writer is not None
+            if not reused:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                self.writer.write(payload)
+                await self.writer.drain()
+                response = await self._read_response()
+                break
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if not reused or attempt:
+                    raise
+
+        for header in response.headers.get('set-cookie', []):
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        if response.headers.get('connection', [''])[0].lower() == 'close':
+            await self.close()
+        return response
+
+    async def _read_response(self):
+        status_line = await self.reader.readuntil(b'\r\n')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers.setdefault(name.strip().lower(), []).append(value.strip())
+
+        if headers.get('transfer-encoding', [''])[0].lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                if size == 0:
+                    await self.reader.readuntil(b'\r\n')
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length'][0]))
+        else:
+            # Ni longueur ni chunks : la fin de la réponse est la fermeture
+            body = await self.reader.read()
+            headers['connection'] = ['close']
+        return Response(status, headers, body)
+
+    async def login(self, username, password):
+        """Connexion par le formulaire (jeton CSRF de la page de connexion)"""
+        page = await self.request('GET', '/accounts/login/')
+        match = CSRF_INPUT.search(page.text)
+        if page.status != 200 or match is None:
+            raise LoadTestError(f'Page de connexion inattendue (HTTP {page.status})')
+        response = await self.request('POST', '/accounts/login/', {
+            'csrfmiddlewaretoken': match.group(1),
+            'username': username,
+            'password': password,
+        })
+        if response.status != 302 or 'sessionid' not in self.cookies:
+            raise LoadTestError(f'Échec de connexion de {username} (HTTP {response.status})')
+
+
+class VirtualUser:
+    """Un utilisateur virtuel : une session par rôle et un générateur aléatoire propre"""
+
+    def __init__(self, index, host, port, accounts, password, mix, seed, payslip_period):
+        self.index = index
+        self.host = host
+        self.port = port
+        self.accounts = accounts
+        self.password = password
+        self.names = [name for name, weight in mix.items() if weight > 0]
+        self.weights = [mix[name] for name in self.names]
+        self.random = random.Random(seed * 1000003 + index)
+        self.payslip_period = payslip_period
+        self.clients = {}
+        self.csrf_token = None
+        self.employee_ids = []
+
+    async def setup(self):
+        for role in sorted({SCENARIO_ROLES[name] for name in self.names}):
+            usernames = self.accounts[role]
+            client = HttpClient(self.host, self.port)
+            await client.login(usernames[self.index % len(usernames)], self.password)
+            self.clients[role] = client
+
+        if 'mark_attendance' in self.names:
+            page = await self.clients['MANAGER'].request('GET', '/attendance/mark/')
+            match = CSRF_INPUT.search(page.text)
+            self.employee_ids = EMPLOYEE_OPTION.findall(page.text)
+            if page.status != 200 or match is None or not self.employee_ids:
+                raise LoadTestError(f'Page de saisie des présences inattendue (HTTP {page.status})')
+            self.csrf_token = match.group(1)
+
+    async def close(self):
+        for client in self.clients.values():
+            await client.close()
+
+    def next_request(self):
+        """(scénario, rôle, méthode, chemin, données, statuts attendus)"""
+        name = self.random.choices(self.names, self.weights)[0]
+        role = SCENARIO_ROLES[name]
+        if name == 'attendance_list':
+            return name, role, 'GET', '/attendance/', None, (200,)
+        if name == 'mark_attendance':
+            # Un jour ouvré des quatre dernières semaines : création ou mise à jour
+            day = date.today() - timedelta(days=self.random.randrange(28))
+            while day.weekday() >= 5:
+                day -= timedelta(days=1)
+            data = {
+                'csrfmiddlewaretoken': self.csrf_token,
+                'employee_id': self.random.choice(self.employee_ids),
+                'date': day.isoformat(),
+                'status': self.random.choice(STATUSES),
+                'check_in_time': '',
+                'check_out_time': '',
+                'notes': 'Test de charge',
+            }
+            # Succès : redirection vers la liste des présences
+            return name, role, 'POST', '/attendance/mark/', data, (302,)
+        if name == 'payslip':
+            year, month = self.payslip_period
+            return name, role, 'GET', f'/payslips/{year}/{month}/', None, (200,)
+        return name, role, 'GET', '/', None, (200,)
+
+
+class Recorder:
+    """Latences et résultats par scénario (la phase de chauffe n'est pas enregistrée)"""
+
+    def __init__(self):
+        self.active = False
+        self.latencies = {}
+        self.statuses = {}
+        self.errors = {}
+
+    def record(self, name, latency, status, ok):
+        if not self.active:
+            return
+        self.latencies.setdefault(name, []).append(latency)
+        statuses = self.statuses.setdefault(name, {})
+        statuses[status] = statuses.get(status, 0) + 1
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+
+async def drive(user, recorder, deadline):
+    while time.perf_counter() < deadline:
+        name, role, method, path, data, expected = user.next_request()
+        started = time.perf_counter()
+        try:
+            response = await user.clients[role].request(method, path, data)
+            status = response.status
+            ok = status in expected
+            if ok and name == 'mark_attendance':
+                ok = response.headers.get('location', [''])[0].rstrip('/').endswith('/attendance')
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+            await user.clients[role].close()
+            status = type(e).__name__
+            ok = False
+        recorder.record(name, time.perf_counter() - started, status, ok)
+
+
+async def run_load(host, port, accounts, password, mix, concurrency, duration, warmup,
+                   payslip_period, seed=42):
+    """
+    Lance `concurrency` utilisateurs virtuels pendant `warmup` + `duration`
+    secondes et retourne le Recorder et la durée mesurée.
+    """
+    users = [
+        VirtualUser(i, host, port, accounts, password, mix, seed, payslip_period)
+        for i in range(concurrency)
+    ]
+    await asyncio.gather(*(user.setup() for user in users))
+
+    recorder = Recorder()
+    try:
+        start = time.perf_counter()
+        tasks = [
+            asyncio.create_task(drive(user, recorder, start + warmup + duration))
+            for user in users
+        ]
+        await asyncio.sleep(warmup)
+        recorder.active = True
+        measured_from = time.perf_counter()
+        await asyncio.gather(*tasks)
+        return recorder, time.perf_counter() - measured_from
+    finally:
+        for user in users:
+            await user.close()
+
+
+def summarize(recorder, elapsed, percentile):
+    """Débit, percentiles de latence (ms) et taux d'erreur, global et par scénario"""
+    def stats(latencies, errors, statuses):
+        latencies_ms = [latency * 1000 for latency in latencies]
+        return {
+            'requests': len(latencies),
+            'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed > 0 else 0,
+            'p50_ms': round(percentile(latencies_ms, 0.50), 2),
+            'p95_ms': round(percentile(latencies_ms, 0.95), 2),
+            'p99_ms': round(percentile(latencies_ms, 0.99), 2),
+            'max_ms': round(max(latencies_ms), 2),
+            'errors': errors,
+            'error_rate': round(errors / len(latencies), 4),
+            'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        }
+
+    scenarios = {
+        name: stats(latencies, recorder.errors.get(name, 0), recorder.statuses[name])
+        for name, latencies in sorted(recorder.latencies.items())
+    }
+    all_latencies = [latency for latencies in recorder.latencies.values() for latency in latencies]
+    if not all_latencies:
+        return {'requests': 0, 'scenarios': {}}
+
+    statuses = {}
+    for counts in recorder.statuses.values():
+        for status, count in counts.items():
+            statuses[status] = statuses.get(status, 0) + count
+    overall = stats(all_latencies, sum(recorder.errors.values()), statuses)
+    overall['scenarios'] = scenarios
+    return overall
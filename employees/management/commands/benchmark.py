@@ -0,0 +1,196 @@
+"""
+Commande Django de benchmark des vues principales et du calcul de la paie
+Usage: python manage.py benchmark [--employees N] [--departments N] [--months N]
+       [--iterations N] [--seed N] [--output FILE]
+
+Le benchmark s'exécute sur une base de test créée pour l'occasion (comme
+`manage.py test`), avec un cache et des fichiers temporaires : la base et
+le cache de développement ne sont jamais modifiés.
+"""
+
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+from io import StringIO
+
+import django
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from employees.synthetic import build_dataset
+
+
+def percentile(values, fraction):
+    """Percentile par interpolation linéaire"""
+    values = sorted(values)
+    position = (len(values) - 1) * fraction
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Mesure la latence, le nombre de requêtes SQL et la mémoire des vues principales et de la paie'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=200, help='Nombre d\'employés (défaut: 200)')
+        parser.add_argument('--departments', type=int, default=10, help='Nombre de départements (défaut: 10)')
+        parser.add_argument('--months', type=int, default=3, help='Mois de présences avant le mois courant (défaut: 3)')
+        parser.add_argument('--iterations', type=int, default=20, help='Mesures par scénario (défaut: 20)')
+        parser.add_argument('--warmup', type=int, default=2, help='Exécutions ignorées avant les mesures (défaut: 2)')
+        parser.add_argument('--seed', type=int, default=42, help='Graine du jeu de données (défaut: 42)')
+        parser.add_argument('--output', help='Fichier JSON de résultats (défaut: sortie standard)')
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            # Fichiers et cache dans des dossiers temporaires : le cache du
+            # projet (tableau de bord, statistiques) n'est ni vidé ni rempli
+            with tempfile.TemporaryDirectory() as media_root, tempfile.TemporaryDirectory() as cache_dir:
+                caches = {'default': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': cache_dir,
+                }}
+                with override_settings(MEDIA_ROOT=media_root, CACHES=caches):
+                    report = self.run_benchmark(options, verbosity)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f'✅ Résultats écrits dans {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+    def run_benchmark(self, options, verbosity):
+        started = time.perf_counter()
+        dataset = build_dataset(
+            employees=options['employees'],
+            departments=options['departments'],
+            months=options['months'],
+            seed=options['seed'],
+        )
+        if verbosity:
+            self.stderr.write(
+                f'📦 {dataset["employees"]} employés, {dataset["attendances"]} présences '
+                f'créés en {time.perf_counter() - started:.1f}s'
+            )
+
+        # Paie du dernier mois complet
+        previous = timezone.now().date().replace(day=1) - timedelta(days=1)
+        month, year = previous.month, previous.year
+        clients = {}
+        for role, username in dataset['usernames'].items():
+            clients[role] = Client()
+            clients[role].force_login(User.objects.get(username=username))
+
+        def view(role, name, *args, query=''):
+            url = reverse(name, args=args) + query
+            def run():
+                response = clients[role].get(url)
+                # Les réponses en flux sont consommées pour mesurer tout le rendu
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+                assert response.status_code == 200, f'{url}: HTTP {response.status_code}'
+            return run
+
+        def payroll():
+            call_command('calculate_monthly_salaries', month=month, year=year, force=True, stdout=StringIO())
+
+        scenarios = [
+            ('dashboard_hr', view('HR', 'employees:dashboard')),
+            ('dashboard_manager', view('MANAGER', 'employees:dashboard')),
+            ('dashboard_employee', view('EMPLOYEE', 'employees:dashboard')),
+            ('attendance_list', view('HR', 'attendance:attendance_list')),
+            ('attendance_report', view('HR', 'employees:attendance_report')),
+            ('salary_report', view('HR', 'employees:salary_report', query=f'?month={month}&year={year}')),
+            ('my_attendance', view('EMPLOYEE', 'attendance:my_attendance')),
+            ('payroll', payroll),
+            ('payslip_download', view('EMPLOYEE', 'employees:download_payslip', year, month)),
+        ]
+
+        results = {}
+        for name, run in scenarios:
+            results[name] = self.measure(run, options['iterations'], options['warmup'])
+            if verbosity:
+                r = results[name]
+                self.stderr.write(
+                    f'   {name:<20} p50 {r["p50_ms"]:>8.1f} ms   p95 {r["p95_ms"]:>8.1f} ms   '
+                    f'{r["queries"]:>4} requêtes   {r["peak_memory_kb"]:>8.0f} Ko'
+                )
+
+        return {
+            'meta': {
+                'revision': git_revision(),
+                'timestamp': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'dataset': {key: value for key, value in dataset.items() if key != 'usernames'},
+                'seed': options['seed'],
+                'iterations': options['iterations'],
+                'payroll_period': f'{year}-{month:02d}',
+            },
+            'results': results,
+        }
+
+    def measure(self, run, iterations, warmup):
+        """Latences sur `iterations` exécutions, puis une exécution sous tracemalloc pour la mémoire"""
+        for _ in range(warmup):
+            run()
+
+        timings = []
+        queries = []
+        for _ in range(max(iterations, 1)):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+
+        # tracemalloc ralentit l'exécution : la mémoire est mesurée à part
+        tracemalloc.start()
+        try:
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'min_ms': round(min(timings), 3),
+            'queries': max(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
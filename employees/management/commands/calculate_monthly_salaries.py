@@ -1,14 +1,16 @@
 """
 Commande Django pour calculer automatiquement les salaires mensuels
-Usage: python manage.py calculate_monthly_salaries [--month MONTH] [--year YEAR]
+Usage: python manage.py calculate_monthly_salaries [--month MONTH] [--year YEAR] [--force | --incremental]
+       [--workers N] [--shard-by department|id-range] [--shard KEY ...]
 """
 
 from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
-from datetime import datetime, date
-from decimal import Decimal
-from employees.models import Employee, SalaryCalculation
-from attendance.models import Attendance
+from employees.models import SalaryCalculation
+from employees.payroll import (
+    ATTENDANCE_THRESHOLD, BATCH_SIZE, SHARD_STRATEGIES,
+    build_shards, calculate_payroll, dirty_employees, payroll_totals, run_sharded_payroll, shard_queryset,
+)
 
 
 class Command(BaseCommand):
@@ -30,6 +32,43 @@ class Command(BaseCommand):
             action='store_true',
             help='Recalculer même si déjà calculé',
         )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Recalculer uniquement les employés dont les présences ou le salaire '
+                 'ont changé depuis le dernier calcul',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Nombre de lignes écrites par requête (défaut: {BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Nombre de processus de calcul en parallèle (défaut: 1)',
+        )
+        parser.add_argument(
+            '--shard-by',
+            choices=SHARD_STRATEGIES,
+            default='id-range',
+            help='Découpage des employés entre les processus (défaut: id-range)',
+        )
+        parser.add_argument(
+            '--shard',
+            action='append',
+            dest='shards',
+            metavar='KEY',
+            help="Ne calculer que ce shard (ex: department:3, id:1-500). Répétable",
+        )
+        parser.add_argument(
+            '--retries',
+            type=int,
+            default=1,
+            help='Nombre de relances d\'un shard en échec (défaut: 1)',
+        )
 
     def handle(self, *args, **options):
         # Déterminer le mois et l'année à calculer
@@ -56,8 +95,11 @@ class Command(BaseCommand):
             self.style.SUCCESS(f'🔄 Calcul des salaires pour {month}/{year}...')
         )
 
-        # Vérifier si déjà calculé
-        if not options['force']:
+        if options['incremental'] and (options['shards'] or options['workers'] > 1):
+            raise CommandError("--incremental ne se combine pas avec --workers ou --shard")
+
+        # Vérifier si déjà calculé (sauf relance ciblée de shards)
+        if not options['force'] and not options['shards'] and not options['incremental']:
             existing_calculations = SalaryCalculation.objects.filter(
                 month=month, year=year
             ).count()
@@ -71,116 +113,88 @@ class Command(BaseCommand):
                 return
 
         # Calculer les salaires pour tous les employés actifs
-        employees = Employee.objects.filter(is_active=True)
-        calculated_count = 0
-        error_count = 0
-
-        for emp in employees:
+        workers = max(options['workers'], 1)
+        failed = {}
+        if options['incremental']:
+            employees = dirty_employees(month, year)
             try:
-                # Calculer le pourcentage de présence
-                attendances = Attendance.objects.filter(
-                    employee=emp,
-                    date__year=year,
-                    date__month=month
-                )
-                
-                total_days = attendances.count()
-                if total_days == 0:
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f'⚠️  Aucune présence trouvée pour {emp.user.get_full_name()} en {month}/{year}'
-                        )
-                    )
-                    continue
-                
-                present_days = attendances.filter(status='PRESENT').count()
-                half_days = attendances.filter(status='HALF_DAY').count()
-                
-                attendance_percentage = (present_days + (half_days * 0.5)) / total_days * 100
-                
-                # Calculer les déductions (15% si < 75% de présence)
-                deduction_amount = Decimal('0')
-                if attendance_percentage < 75:
-                    deduction_amount = emp.base_salary * Decimal('0.15')
-                
-                net_salary = emp.base_salary - deduction_amount
-                
-                # Créer ou mettre à jour le calcul de salaire
-                salary_calc, created = SalaryCalculation.objects.get_or_create(
-                    employee=emp,
-                    month=month,
-                    year=year,
-                    defaults={
-                        'base_salary': emp.base_salary,
-                        'attendance_percentage': round(attendance_percentage, 2),
-                        'deduction_amount': deduction_amount,
-                        'net_salary': net_salary,
-                    }
-                )
-                
-                if not created and options['force']:
-                    # Mettre à jour si recalcul forcé
-                    salary_calc.base_salary = emp.base_salary
-                    salary_calc.attendance_percentage = round(attendance_percentage, 2)
-                    salary_calc.deduction_amount = deduction_amount
-                    salary_calc.net_salary = net_salary
-                    salary_calc.save()
-                
-                calculated_count += 1
-                
-                # Afficher le statut
-                status_icon = "✅" if attendance_percentage >= 75 else "⚠️"
-                self.stdout.write(
-                    f'{status_icon} {emp.user.get_full_name()}: '
-                    f'{attendance_percentage:.1f}% présence, '
-                    f'Salaire net: {net_salary:,.2f}€'
-                )
-                
+                payroll = calculate_payroll(month, year, employees, batch_size=options['batch_size'])
             except Exception as e:
-                error_count += 1
-                self.stdout.write(
-                    self.style.ERROR(
-                        f'❌ Erreur pour {emp.user.get_full_name()}: {str(e)}'
-                    )
+                raise CommandError(f'❌ Erreur lors du calcul des salaires: {str(e)}')
+            self.stdout.write(f'♻️  Mode incrémental : {payroll["calculated"]} employés à recalculer')
+        elif workers == 1 and not options['shards']:
+            try:
+                payroll = calculate_payroll(month, year, batch_size=options['batch_size'])
+            except Exception as e:
+                raise CommandError(f'❌ Erreur lors du calcul des salaires: {str(e)}')
+        else:
+            keys = options['shards'] or build_shards(options['shard_by'], workers)
+            for key in keys:
+                try:
+                    shard_queryset(key)
+                except ValueError as e:
+                    raise CommandError(str(e))
+            self.stdout.write(f'🧩 {len(keys)} shards répartis sur {workers} processus')
+            payroll, failed = run_sharded_payroll(
+                month, year, keys, workers,
+                batch_size=options['batch_size'],
+                retries=max(options['retries'], 0),
+                on_failure=self.report_shard_failure,
+            )
+
+        for full_name in payroll['skipped']:
+            self.stdout.write(
+                self.style.WARNING(
+                    f'⚠️  Aucune présence trouvée pour {full_name} en {month}/{year}'
                 )
+            )
+
+        for row in payroll['results']:
+            status_icon = "✅" if row['attendance_percentage'] >= ATTENDANCE_THRESHOLD else "⚠️"
+            self.stdout.write(
+                f'{status_icon} {row["name"]}: '
+                f'{row["attendance_percentage"]:.1f}% présence, '
+                f'Salaire net: {row["net_salary"]:,.2f}€'
+            )
 
         # Résumé final
         self.stdout.write('\n' + '='*50)
-        if calculated_count > 0:
+        if payroll['calculated'] > 0:
             self.stdout.write(
                 self.style.SUCCESS(
-                    f'✅ Salaires calculés avec succès pour {calculated_count} employés'
+                    f'✅ Salaires calculés avec succès pour {payroll["calculated"]} employés '
+                    f'({payroll["created"]} créés, {payroll["updated"]} mis à jour)'
                 )
             )
-        
-        if error_count > 0:
+        if payroll['deleted']:
             self.stdout.write(
-                self.style.ERROR(f'❌ {error_count} erreurs rencontrées')
-            )
-        
-        # Statistiques globales
-        total_base = sum(
-            sc.base_salary for sc in SalaryCalculation.objects.filter(
-                month=month, year=year
+                f'🗑️  {payroll["deleted"]} calculs supprimés (plus aucune présence dans le mois)'
             )
+        self.stdout.write(
+            f'⏱️  {payroll["elapsed"]:.2f}s ({payroll["rows_per_second"]:,.0f} lignes/s)'
         )
-        total_deductions = sum(
-            sc.deduction_amount for sc in SalaryCalculation.objects.filter(
-                month=month, year=year
+        if failed:
+            self.stdout.write(
+                self.style.ERROR(f'❌ {len(failed)} shards en échec. Pour les relancer seuls :')
             )
-        )
-        total_net = sum(
-            sc.net_salary for sc in SalaryCalculation.objects.filter(
-                month=month, year=year
+            shard_args = ' '.join(f'--shard {key}' for key in failed)
+            self.stdout.write(
+                f'   python manage.py calculate_monthly_salaries --month {month} --year {year} {shard_args}'
             )
-        )
-        
-        self.stdout.write(f'💰 Salaire de base total: {total_base:,.2f}€')
-        self.stdout.write(f'💸 Déductions totales: {total_deductions:,.2f}€')
-        self.stdout.write(f'💵 Salaire net total: {total_net:,.2f}€')
+
+        # Statistiques globales
+        totals = payroll_totals(month, year)
+        self.stdout.write(f'💰 Salaire de base total: {totals["base_salary"]:,.2f}€')
+        self.stdout.write(f'💸 Déductions totales: {totals["deductions"]:,.2f}€')
+        self.stdout.write(f'💵 Salaire net total: {totals["net_salary"]:,.2f}€')
         
         self.stdout.write(
             self.style.SUCCESS(
                 f'\n🎉 Calcul terminé pour {month}/{year}!'
             )
         )
+
+    def report_shard_failure(self, key, error, attempt):
+        self.stdout.write(
+            self.style.ERROR(f'❌ Shard {key} en échec (tentative {attempt + 1}): {error}')
+        )
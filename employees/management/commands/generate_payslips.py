@@ -0,0 +1,107 @@
+"""
+Commande Django pour générer tous les bulletins de paie d'un mois dans une archive ZIP
+Usage: python manage.py generate_payslips [--month MONTH] [--year YEAR] [--workers N] [--output FILE] [--if-stale]
+"""
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from employees.payslip_archive import archive_path, current_archive, generate_payslip_archive, write_status
+
+
+class Command(BaseCommand):
+    help = 'Génère les bulletins de paie PDF d\'un mois dans une archive ZIP'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--month',
+            type=int,
+            help='Mois des bulletins (1-12). Par défaut: mois précédent',
+        )
+        parser.add_argument(
+            '--year',
+            type=int,
+            help='Année des bulletins. Par défaut: année du mois précédent',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Nombre de processus de rendu PDF (défaut: nombre de processeurs)',
+        )
+        parser.add_argument(
+            '--output',
+            help='Fichier ZIP à écrire. Par défaut: MEDIA_ROOT/payslips/bulletins_AAAA_MM.zip',
+        )
+        parser.add_argument(
+            '--if-stale',
+            action='store_true',
+            help='Ne régénérer que si les salaires du mois ont changé depuis la dernière archive (tâche planifiée)',
+        )
+
+    def handle(self, *args, **options):
+        # Par défaut, le mois précédent
+        now = timezone.now()
+        month = options['month'] or (12 if now.month == 1 else now.month - 1)
+        year = options['year'] or (now.year - 1 if now.month == 1 and month == 12 else now.year)
+        if not 1 <= month <= 12:
+            raise CommandError(f'Mois invalide: {month}')
+
+        path = options['output'] or archive_path(month, year)
+        # L'archive du mois (sans --output) est suivie par la page de l'archive
+        self.status = (month, year) if not options['output'] else None
+        self.track('running')
+        if options['if_stale'] and self.is_current(month, year, path):
+            self.track('done')
+            self.stdout.write(self.style.SUCCESS(f'✅ Archive {path} déjà à jour'))
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(f'🔄 Génération des bulletins {month}/{year} avec {options["workers"]} processus...')
+        )
+
+        try:
+            result = generate_payslip_archive(
+                month, year,
+                path=path,
+                workers=max(options['workers'], 1),
+                progress=self.report_progress,
+            )
+        except Exception as e:
+            self.track('failed', error=str(e))
+            raise
+        self.track('done', result['payslips'], result['payslips'])
+
+        if not result['payslips']:
+            self.stdout.write(
+                self.style.WARNING(f'⚠️  Aucun salaire calculé pour {month}/{year}')
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ {result["payslips"]} bulletins ({result["pages"]} pages) écrits dans {result["path"]} '
+                f'({result["size"] / 1024:.0f} Ko)'
+            )
+        )
+        self.stdout.write(
+            f'⏱️  {result["elapsed"]:.2f}s, {result["pages_per_second"]:.1f} pages/s'
+        )
+
+    def is_current(self, month, year, path):
+        file = current_archive(month, year, path)
+        if file is None:
+            return False
+        file.close()
+        return True
+
+    def track(self, state, done=0, total=0, error=''):
+        if self.status is not None:
+            write_status(*self.status, state, done, total, error)
+
+    def report_progress(self, done, total):
+        # Environ 20 lignes de progression, quelle que soit la taille du mois
+        step = max(total // 20, 1)
+        if done % step == 0 or done == total:
+            self.stdout.write(f'   {done}/{total} bulletins')
+            self.track('running', done, total)
@@ -0,0 +1,239 @@
+"""
+Commande Django de test de charge local contre une instance gunicorn
+Usage: python manage.py loadtest [--database sqlite|postgresql] [--employees N] [--months N]
+       [--workers 1,2,4] [--worker-class sync,gthread] [--threads N]
+       [--concurrency N] [--duration S] [--warmup S] [--mix scenario=poids,...]
+       [--output FILE] [--keep]
+
+Le jeu de données synthétique est créé dans un répertoire de travail
+temporaire (SQLite) ou dans une base PostgreSQL locale dédiée, avec les
+settings employee_attendance_system.settings_loadtest. Gunicorn est
+ensuite démarré pour chaque combinaison nombre de workers x classe de
+worker, et chargé par des utilisateurs virtuels asyncio.
+"""
+
+import asyncio
+import json
+import os
+import platform
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from employees.loadtest import LoadTestError, parse_mix, run_load, summarize
+from employees.synthetic import role_usernames
+from .benchmark import git_revision, percentile
+
+
+LOADTEST_SETTINGS = 'employee_attendance_system.settings_loadtest'
+USERNAME_PREFIX = 'loadtest'
+PASSWORD = 'loadtest-password'
+HOST = '127.0.0.1'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(process, port, timeout):
+    """Attend que gunicorn accepte les connexions (ou qu'il s'arrête)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection((HOST, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+class Command(BaseCommand):
+    help = 'Test de charge local : débit, percentiles de latence et erreurs selon les workers gunicorn'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            choices=['sqlite', 'postgresql'],
+            default='sqlite',
+            help='Base du test (PostgreSQL : variables LOADTEST_DB_NAME, LOADTEST_DB_USER...) (défaut: sqlite)',
+        )
+        parser.add_argument('--employees', type=int, default=200, help='Nombre d\'employés (défaut: 200)')
+        parser.add_argument('--departments', type=int, default=10, help='Nombre de départements (défaut: 10)')
+        parser.add_argument('--months', type=int, default=3, help='Mois de présences avant le mois courant (défaut: 3)')
+        parser.add_argument('--seed', type=int, default=42, help='Graine des données et des tirages (défaut: 42)')
+        parser.add_argument('--workers', default='1,2,4', help='Nombres de workers gunicorn à tester (défaut: 1,2,4)')
+        parser.add_argument(
+            '--worker-class',
+            default='sync,gthread',
+            help='Classes de worker gunicorn à tester (défaut: sync,gthread)',
+        )
+        parser.add_argument('--threads', type=int, default=4, help='Threads par worker gthread (défaut: 4)')
+        parser.add_argument('--concurrency', type=int, default=16, help='Utilisateurs virtuels (défaut: 16)')
+        parser.add_argument('--duration', type=float, default=20, help='Durée mesurée par configuration, en secondes (défaut: 20)')
+        parser.add_argument('--warmup', type=float, default=3, help='Chauffe non mesurée, en secondes (défaut: 3)')
+        parser.add_argument('--mix', help='Poids des scénarios, ex. dashboard_hr=10,payslip=5 (défaut: mélange standard)')
+        parser.add_argument('--output', help='Fichier JSON de résultats (défaut: sortie standard)')
+        parser.add_argument('--keep', action='store_true', help='Conserver le répertoire de travail (base, cache, logs)')
+
+    def handle(self, *args, **options):
+        if not self.gunicorn_importable():
+            raise CommandError('gunicorn n\'est pas installé (pip install -r requirements.txt)')
+        try:
+            mix = parse_mix(options['mix'])
+            workers = [int(value) for value in options['workers'].split(',') if value.strip()]
+        except ValueError as e:
+            raise CommandError(str(e))
+        worker_classes = [value.strip() for value in options['worker_class'].split(',') if value.strip()]
+
+        workdir = tempfile.mkdtemp(prefix='loadtest-')
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE=LOADTEST_SETTINGS,
+            LOADTEST_DIR=workdir,
+            LOADTEST_DB_ENGINE=options['database'],
+            PYTHONUNBUFFERED='1',
+        )
+        try:
+            self.seed(env, options)
+            results = []
+            for worker_class in worker_classes:
+                for count in workers:
+                    results.append(self.run_configuration(env, workdir, worker_class, count, mix, options))
+        finally:
+            if options['keep']:
+                self.stderr.write(f'📁 Répertoire de travail conservé: {workdir}')
+            else:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        report = {
+            'meta': {
+                'revision': git_revision(),
+                'timestamp': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': options['database'],
+                'cpus': os.cpu_count(),
+                'employees': options['employees'],
+                'departments': options['departments'],
+                'months': options['months'],
+                'seed': options['seed'],
+                'concurrency': options['concurrency'],
+                'duration': options['duration'],
+                'mix': mix,
+            },
+            'results': results,
+        }
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f'✅ Résultats écrits dans {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+    def gunicorn_importable(self):
+        try:
+            import gunicorn  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def manage(self, env, *args):
+        """Exécute une commande manage.py avec les settings du test de charge"""
+        result = subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), *args],
+            env=env, cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f'manage.py {args[0]} a échoué:\n{result.stderr or result.stdout}')
+        return result.stdout
+
+    def seed(self, env, options):
+        started = time.perf_counter()
+        self.stderr.write(f'📦 Préparation de la base de test ({options["database"]})...')
+        self.manage(env, 'migrate', '--noinput')
+        self.manage(
+            env, 'seed_synthetic',
+            '--employees', str(options['employees']),
+            '--departments', str(options['departments']),
+            '--months', str(options['months']),
+            '--seed', str(options['seed']),
+            '--prefix', USERNAME_PREFIX,
+            '--password', PASSWORD,
+            '--flush',
+        )
+        self.stderr.write(f'   terminée en {time.perf_counter() - started:.1f}s')
+
+    def run_configuration(self, env, workdir, worker_class, workers, mix, options):
+        port = free_port()
+        command = [
+            sys.executable, '-m', 'gunicorn', 'employee_attendance_system.wsgi',
+            '--bind', f'{HOST}:{port}',
+            '--workers', str(workers),
+            '--worker-class', worker_class,
+            '--log-level', 'warning',
+        ]
+        if worker_class == 'gthread':
+            command += ['--threads', str(options['threads'])]
+
+        label = f'{worker_class} x{workers}' + (f' ({options["threads"]} threads)' if worker_class == 'gthread' else '')
+        self.stderr.write(f'🚀 gunicorn {label}...')
+        log_path = os.path.join(workdir, f'gunicorn-{worker_class}-{workers}.log')
+        with open(log_path, 'w') as log:
+            process = subprocess.Popen(command, env=env, cwd=settings.BASE_DIR, stdout=log, stderr=subprocess.STDOUT)
+            try:
+                if not wait_for_port(process, port, timeout=30):
+                    raise CommandError(f'gunicorn n\'a pas démarré (voir {log_path} avec --keep)')
+                recorder, elapsed = asyncio.run(run_load(
+                    HOST, port,
+                    accounts=role_usernames(options['employees'], options['departments'], USERNAME_PREFIX),
+                    password=PASSWORD,
+                    mix=mix,
+                    concurrency=max(options['concurrency'], 1),
+                    duration=options['duration'],
+                    warmup=options['warmup'],
+                    payslip_period=self.payslip_period(),
+                    seed=options['seed'],
+                ))
+            except LoadTestError as e:
+                raise CommandError(str(e))
+            finally:
+                process.send_signal(signal.SIGTERM)
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+
+        summary = summarize(recorder, elapsed, percentile)
+        if summary['requests']:
+            self.stderr.write(
+                f'   {summary["throughput_rps"]:>8.1f} req/s   p50 {summary["p50_ms"]:>7.1f} ms   '
+                f'p95 {summary["p95_ms"]:>7.1f} ms   p99 {summary["p99_ms"]:>7.1f} ms   '
+                f'erreurs {summary["error_rate"]:.2%}'
+            )
+        return {
+            'worker_class': worker_class,
+            'workers': workers,
+            'threads': options['threads'] if worker_class == 'gthread' else 1,
+            **summary,
+        }
+
+    def payslip_period(self):
+        """Dernier mois complet : ses salaires sont calculés par seed_synthetic"""
+        previous = date.today().replace(day=1) - timedelta(days=1)
+        return previous.year, previous.month
@@ -0,0 +1,84 @@
+"""
+Commande Django pour générer un jeu de données synthétique à grande échelle
+Usage: python manage.py seed_synthetic [--departments N] [--employees N] [--years N | --months N]
+       [--seed N] [--batch-size N] [--no-salaries] [--flush] [--prefix PREFIX] [--password PASSWORD]
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from employees.synthetic import BATCH_SIZE, USERNAME_PREFIX, build_dataset, delete_dataset
+
+
+class Command(BaseCommand):
+    help = 'Crée des départements, employés, présences, congés et salaires synthétiques (déterministes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=20, help='Nombre de départements (défaut: 20)')
+        parser.add_argument('--employees', type=int, default=1000, help='Nombre d\'employés (défaut: 1000)')
+        parser.add_argument('--years', type=int, default=2, help='Années de présences (défaut: 2)')
+        parser.add_argument('--months', type=int, help='Mois de présences (prioritaire sur --years)')
+        parser.add_argument('--seed', type=int, default=42, help='Graine du générateur (défaut: 42)')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Lignes de présence insérées par requête (défaut: {BATCH_SIZE})',
+        )
+        parser.add_argument('--no-salaries', action='store_true', help='Ne pas calculer les salaires des mois complets')
+        parser.add_argument('--prefix', default=USERNAME_PREFIX, help=f'Préfixe des noms d\'utilisateur (défaut: {USERNAME_PREFIX})')
+        parser.add_argument('--password', help='Mot de passe de tous les comptes (défaut: inutilisable)')
+        parser.add_argument('--flush', action='store_true', help='Supprimer d\'abord le jeu de données existant de ce préfixe')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        months = options['months'] if options['months'] is not None else options['years'] * 12
+
+        if User.objects.filter(username__startswith=prefix).exists():
+            if not options['flush']:
+                raise CommandError(
+                    f'Des utilisateurs "{prefix}..." existent déjà. Utilisez --flush pour les remplacer.'
+                )
+            self.stdout.write(f'🗑️  Suppression du jeu de données "{prefix}"...')
+            delete_dataset(prefix)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'🔄 Génération: {options["departments"]} départements, {options["employees"]} employés, '
+                f'{months} mois (seed {options["seed"]})...'
+            )
+        )
+        self.last_reported = {}
+        result = build_dataset(
+            employees=options['employees'],
+            departments=options['departments'],
+            months=months,
+            seed=options['seed'],
+            prefix=prefix,
+            salaries=not options['no_salaries'],
+            batch_size=max(options['batch_size'], 1),
+            progress=self.report_progress,
+            password=options['password'],
+        )
+
+        elapsed = result['elapsed']
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {result["departments"]} départements, {result["employees"]} employés, '
+            f'{result["attendances"]} présences, {result["leave_requests"]} demandes de congé, '
+            f'{result["salary_calculations"]} salaires'
+        ))
+        self.stdout.write(
+            f'⏱️  {elapsed:.1f}s ({result["attendances"] / elapsed if elapsed > 0 else 0:,.0f} présences/s)'
+        )
+        password = 'mot de passe fourni' if options['password'] else 'mot de passe à définir'
+        self.stdout.write(
+            f'👤 Comptes ({password}): HR {result["usernames"]["HR"]}, '
+            f'Manager {result["usernames"]["MANAGER"]}, Employé {result["usernames"]["EMPLOYEE"]}'
+        )
+
+    def report_progress(self, step, done, total):
+        # Une ligne par tranche de 10%
+        tenth = done * 10 // max(total, 1)
+        if tenth > self.last_reported.get(step, -1) or done == total:
+            self.last_reported[step] = tenth
+            self.stdout.write(f'   {step}: {done:,}/{total:,}')
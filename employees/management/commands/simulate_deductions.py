@@ -0,0 +1,75 @@
+"""
+Commande Django pour simuler d'autres règles de déduction salariale
+Usage: python manage.py simulate_deductions [--start AAAA-MM] [--end AAAA-MM]
+       [--thresholds 60,70,75] [--rates 10,15] [--json]
+"""
+
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from attendance.periods import month_start, next_month
+from employees.simulation import DEFAULT_RATES, DEFAULT_THRESHOLDS, parse_values, simulate_deductions
+
+
+class Command(BaseCommand):
+    help = "Simule le coût de la paie pour une grille de seuils de présence et de taux de déduction"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            help='Premier mois simulé (AAAA-MM). Par défaut: il y a 36 mois',
+        )
+        parser.add_argument(
+            '--end',
+            help='Dernier mois simulé (AAAA-MM). Par défaut: mois précédent',
+        )
+        parser.add_argument(
+            '--thresholds',
+            help=f"Seuils de présence en % séparés par des virgules (défaut: {','.join(map(str, DEFAULT_THRESHOLDS))})",
+        )
+        parser.add_argument(
+            '--rates',
+            help=f"Taux de déduction en % séparés par des virgules (défaut: {','.join(map(str, DEFAULT_RATES))})",
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Afficher le résultat complet en JSON',
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.now().date().replace(day=1)
+        try:
+            end = next_month(month_start(options['end'])) if options['end'] else today
+            start = month_start(options['start']) if options['start'] else end.replace(year=end.year - 3)
+            thresholds = parse_values(options['thresholds'], DEFAULT_THRESHOLDS)
+            rates = parse_values(options['rates'], DEFAULT_RATES)
+        except ValueError as e:
+            raise CommandError(f'Paramètre invalide: {e}')
+
+        started = time.perf_counter()
+        simulation = simulate_deductions(start, end, thresholds, rates)
+        elapsed = time.perf_counter() - started
+
+        if options['json']:
+            self.stdout.write(json.dumps(simulation, indent=2, ensure_ascii=False))
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"🔮 Simulation du {simulation['start']} au {simulation['end']} : "
+                f"{simulation['employees']} employés, {simulation['employee_months']} mois-employés"
+            )
+        )
+        self.stdout.write(f"{'Seuil':>7} {'Taux':>6} {'Coût total':>16} {'Déductions':>14} {'Employés':>9}")
+        for policy in simulation['policies']:
+            marker = ' ← règle actuelle' if policy['is_current'] else ''
+            self.stdout.write(
+                f"{policy['threshold']:>6g}% {policy['rate']:>5g}% "
+                f"{policy['total_cost']:>15,.2f}€ {policy['total_deductions']:>13,.2f}€ "
+                f"{policy['affected_employees']:>9}{marker}"
+            )
+        self.stdout.write(f'⏱️  {len(simulation["policies"])} politiques évaluées en {elapsed:.3f}s')
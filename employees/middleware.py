@@ -0,0 +1,211 @@
+"""
+Résolution de l'employé connecté, une fois par requête.
+
+`request.employee` : l'Employee complet avec son département, chargé en
+une requête au premier accès seulement. Il est aussi rattaché à
+`request.user.employee_profile`, que les templates utilisent.
+
+`request.employee_context` : tuple (id, rôle, département) tiré de ce même
+Employee. Les contrôles d'accès le lisent sur le profil chargé pour la
+requête, jamais sur une copie en session : un changement de rôle prend
+effet dès la requête suivante.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import Counter, namedtuple
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+
+from .models import Employee
+
+
+logger = logging.getLogger('employees.query_budget')
+
+EmployeeContext = namedtuple('EmployeeContext', ['id', 'role', 'department_id'])
+
+
+def get_employee(request):
+    """Employee de l'utilisateur connecté (ou None), chargé une seule fois"""
+    if not hasattr(request, '_cached_employee'):
+        request._cached_employee = _load_employee(request)
+    return request._cached_employee
+
+
+def get_employee_context(request):
+    """EmployeeContext de l'employé chargé pour cette requête (ou None)"""
+    employee = get_employee(request)
+    if employee is None:
+        return None
+    return EmployeeContext(employee.id, employee.role, employee.department_id)
+
+
+def _load_employee(request):
+    if not request.user.is_authenticated:
+        return None
+    
+    employee = Employee.objects.select_related('department').filter(user_id=request.user.pk).first()
+    if employee is not None:
+        # Évite une requête pour user.employee_profile dans les vues et templates
+        request.user.employee_profile = employee
+    return employee
+
+
+class EmployeeContextMiddleware:
+    """À placer après AuthenticationMiddleware"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        # Retourne la coroutine de la suite de la chaîne si elle est async
+        request.employee = SimpleLazyObject(lambda: get_employee(request))
+        request.employee_context = SimpleLazyObject(lambda: get_employee_context(request))
+        return self.get_response(request)
+
+
+# Compteur de la requête HTTP en cours. Une variable de contexte, et non un
+# execute_wrapper posé sur les connexions du thread de la vue : elle suit la
+# requête dans les threads de sync_to_async (run_query), qui ont chacun
+# leur propre connexion
+_query_counter = ContextVar('query_counter', default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _query_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+def install_query_counting(connection, **kwargs):
+    """Récepteur de connection_created (EmployeesConfig.ready) : compte les requêtes de `connection`"""
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+class QueryBudgetMiddleware:
+    """
+    Compte les requêtes SQL et leur durée par vue et les compare au budget
+    de la vue : QUERY_BUDGETS['app:nom'], sinon @query_budget(n), sinon
+    QUERY_BUDGET_DEFAULT. Les dépassements sont journalisés en JSON sur le
+    logger 'employees.query_budget'.
+
+    Les requêtes sont comptées sur toutes les connexions, y compris celles
+    des threads où une vue async lance ses requêtes (run_query).
+
+    Désactivé (QUERY_BUDGET_ENABLED = False), il est retiré de la chaîne au
+    démarrage et ne coûte rien.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.default = getattr(settings, 'QUERY_BUDGET_DEFAULT', 20)
+        self.budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        self.headers = getattr(settings, 'QUERY_BUDGET_HEADERS', True)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _query_counter.reset(token)
+        return self.finish(request, response, counter, started)
+
+    async def __acall__(self, request):
+        counter, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _query_counter.reset(token)
+        return self.finish(request, response, counter, started)
+
+    def start(self):
+        # Les connexions ouvertes dans les autres threads le sont par
+        # connection_created ; celles de ce thread peuvent lui être antérieures
+        for connection in connections.all():
+            install_query_counting(connection)
+        counter = QueryCounter()
+        return counter, _query_counter.set(counter), time.perf_counter()
+
+    def finish(self, request, response, counter, started):
+        elapsed = (time.perf_counter() - started) * 1000
+
+        match = request.resolver_match
+        if match is None:
+            return response
+
+        view_name = match.view_name
+        budget = self.budgets.get(view_name, getattr(match.func, 'query_budget', self.default))
+        if counter.count > budget:
+            logger.warning(json.dumps({
+                'event': 'query_budget_exceeded',
+                'view': view_name,
+                'path': request.path,
+                'method': request.method,
+                'status': response.status_code,
+                'queries': counter.count,
+                'budget': budget,
+                'db_ms': round(counter.duration, 2),
+                'total_ms': round(elapsed, 2),
+                # Requêtes les plus répétées : le plus souvent un N+1
+                'repeated': counter.most_repeated(),
+            }, ensure_ascii=False))
+
+        if self.headers:
+            response['X-Query-Count'] = str(counter.count)
+            response['Server-Timing'] = (
+                f'db;dur={counter.duration:.1f};desc="{counter.count} queries", '
+                f'app;dur={elapsed:.1f}'
+            )
+        return response
+
+
+class QueryCounter:
+    """execute_wrapper comptant les requêtes, leur durée et leurs formes SQL"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        # Les requêtes d'une vue async arrivent de plusieurs threads à la fois
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            with self.lock:
+                self.duration += (time.perf_counter() - started) * 1000
+                self.count += 1
+                self.statements[sql] += 1
+
+    def most_repeated(self, limit=3):
+        return [
+            {'sql': sql[:200], 'count': count}
+            for sql, count in self.statements.most_common(limit)
+            if count > 1
+        ]
+
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.21 on 2026-10-18 12:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salarycalculation',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.21 on 2026-10-18 12:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0002_salarycalculation_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='salarycalculation',
+            index=models.Index(fields=['year', 'month'], name='salary_year_month_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.21 on 2026-10-18 13:18
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_updated_at(apps, schema_editor):
+    """Calculs existants : faute de mieux, lus au moment de leur écriture"""
+    SalaryCalculation = apps.get_model('employees', 'SalaryCalculation')
+    SalaryCalculation.objects.update(attendance_as_of=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0003_salary_year_month_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salarycalculation',
+            name='attendance_as_of',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(copy_updated_at, migrations.RunPython.noop),
+    ]
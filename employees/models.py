@@ -60,7 +60,11 @@ class SalaryCalculation(models.Model):
     deduction_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     net_salary = models.DecimalField(max_digits=10, decimal_places=2)
     is_paid = models.BooleanField(default=False)
+    # Instant pris avant la lecture des présences du calcul : toute écriture
+    # postérieure rend le calcul à refaire (voir payroll.dirty_employees)
+    attendance_as_of = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.employee} - {self.month}/{self.year}"
@@ -69,4 +73,8 @@ class SalaryCalculation(models.Model):
         verbose_name = "Calcul de Salaire"
         verbose_name_plural = "Calculs de Salaires"
         unique_together = ['employee', 'month', 'year']
-        ordering = ['-year', '-month']
\ No newline at end of file
+        ordering = ['-year', '-month']
+        indexes = [
+            # Rapports et totaux de paie d'un mois
+            models.Index(fields=['year', 'month'], name='salary_year_month_idx'),
+        ]
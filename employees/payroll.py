@@ -0,0 +1,299 @@
+"""
+Moteur de calcul de la paie mensuelle.
+
+Les compteurs de présence de tous les employés sont lus en une seule
+requête dans la table des résumés mensuels, les déductions sont calculées en mémoire et les lignes
+SalaryCalculation sont écrites par lots (bulk_create / bulk_update)
+dans une seule transaction.
+
+Pour les gros volumes, `run_sharded_payroll` découpe les employés actifs
+en shards (par département ou par plage d'identifiants) calculés en
+parallèle dans un pool de processus, chacun avec sa propre connexion.
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from decimal import Decimal
+import multiprocessing
+
+from django.db import connections, transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from attendance.models import AttendanceMonthlySummary
+from .models import Employee, SalaryCalculation
+from .payroll_workers import init_worker, run_shard
+
+
+# Règle métier : déduction de 15% si la présence est inférieure à 75%
+ATTENDANCE_THRESHOLD = 75
+DEDUCTION_RATE = Decimal('0.15')
+
+# Nombre de lignes SalaryCalculation écrites par requête
+BATCH_SIZE = 500
+
+# bulk_update ne renseigne pas les champs auto_now : updated_at est fixé à la main
+SALARY_FIELDS = [
+    'base_salary', 'attendance_percentage', 'deduction_amount', 'net_salary', 'attendance_as_of', 'updated_at',
+]
+
+
+def aggregate_attendance(month, year, employees):
+    """Compte total / présent / demi-journée par employé en une seule requête"""
+    rows = AttendanceMonthlySummary.objects.filter(
+        employee__in=employees.values('pk'),
+        year=year,
+        month=month,
+        total__gt=0
+    ).values('employee_id', 'total', 'present', 'half_day')
+    return {row['employee_id']: row for row in rows}
+
+
+def compute_salary(base_salary, total_days, present_days, half_days):
+    """Retourne (pourcentage de présence, déduction, salaire net)"""
+    attendance_percentage = (present_days + (half_days * 0.5)) / total_days * 100
+
+    deduction_amount = Decimal('0')
+    if attendance_percentage < ATTENDANCE_THRESHOLD:
+        deduction_amount = base_salary * DEDUCTION_RATE
+
+    return round(attendance_percentage, 2), deduction_amount, base_salary - deduction_amount
+
+
+def calculate_payroll(month, year, employees=None, batch_size=BATCH_SIZE):
+    """
+    Calcule et enregistre les salaires de `employees` (par défaut tous les
+    employés actifs) pour le mois donné.
+
+    Les calculs existants sont mis à jour, les autres sont créés. Les
+    employés sans aucune présence dans le mois sont ignorés et leur calcul
+    éventuel (présences supprimées depuis) est supprimé.
+    """
+    started = time.perf_counter()
+
+    if employees is None:
+        employees = Employee.objects.filter(is_active=True)
+
+    # Pris avant la lecture : une présence écrite pendant le calcul est
+    # postérieure au calcul et le rend à refaire
+    as_of = timezone.now()
+    counts = aggregate_attendance(month, year, employees)
+    existing = dict(
+        SalaryCalculation.objects.filter(
+            employee__in=employees.values('pk'),
+            month=month,
+            year=year
+        ).values_list('employee_id', 'id')
+    )
+
+    now = timezone.now()
+    to_create = []
+    to_update = []
+    to_delete = []
+    results = []
+    skipped = []
+
+    staff = employees.order_by('user__last_name', 'user__first_name').values_list(
+        'id', 'base_salary', 'user__first_name', 'user__last_name'
+    )
+    for employee_id, base_salary, first_name, last_name in staff:
+        full_name = f"{first_name} {last_name}".strip()
+        row = counts.get(employee_id)
+        if row is None:
+            skipped.append(full_name)
+            if employee_id in existing:
+                to_delete.append(existing[employee_id])
+            continue
+
+        attendance_percentage, deduction_amount, net_salary = compute_salary(
+            base_salary, row['total'], row['present'], row['half_day']
+        )
+        salary_calc = SalaryCalculation(
+            id=existing.get(employee_id),
+            employee_id=employee_id,
+            month=month,
+            year=year,
+            base_salary=base_salary,
+            attendance_percentage=attendance_percentage,
+            deduction_amount=deduction_amount,
+            net_salary=net_salary,
+            attendance_as_of=as_of,
+            updated_at=now,
+        )
+        if salary_calc.id is None:
+            to_create.append(salary_calc)
+        else:
+            to_update.append(salary_calc)
+
+        results.append({
+            'employee_id': employee_id,
+            'name': full_name,
+            'attendance_percentage': attendance_percentage,
+            'deduction_amount': deduction_amount,
+            'net_salary': net_salary,
+        })
+
+    with transaction.atomic():
+        SalaryCalculation.objects.bulk_create(to_create, batch_size=batch_size)
+        SalaryCalculation.objects.bulk_update(to_update, SALARY_FIELDS, batch_size=batch_size)
+        for i in range(0, len(to_delete), batch_size):
+            SalaryCalculation.objects.filter(id__in=to_delete[i:i + batch_size]).delete()
+
+    elapsed = time.perf_counter() - started
+    return {
+        'month': month,
+        'year': year,
+        'results': results,
+        'skipped': skipped,
+        'created': len(to_create),
+        'updated': len(to_update),
+        'deleted': len(to_delete),
+        'calculated': len(results),
+        'elapsed': elapsed,
+        'rows_per_second': len(results) / elapsed if elapsed > 0 else 0,
+    }
+
+
+def dirty_employees(month, year, employees=None):
+    """
+    Employés dont le salaire du mois doit être recalculé : aucun calcul
+    alors qu'il existe des présences, ou bien des présences du mois
+    (ajout, correction, suppression) ou la fiche employé (salaire de base)
+    modifiées depuis l'instant où le dernier calcul a lu les présences.
+    Un employé dont toutes les présences ont été supprimées en fait partie
+    tant que son calcul existe : calculate_payroll le supprime.
+    """
+    if employees is None:
+        employees = Employee.objects.filter(is_active=True)
+
+    # Le résumé mensuel est mis à jour à chaque écriture ou suppression de présence
+    month_summary = AttendanceMonthlySummary.objects.filter(
+        employee=OuterRef('pk'),
+        year=year,
+        month=month
+    )
+    computed_at = SalaryCalculation.objects.filter(
+        employee=OuterRef('pk'),
+        month=month,
+        year=year
+    ).values('attendance_as_of')[:1]
+
+    return employees.annotate(computed_at=Subquery(computed_at)).filter(
+        (Q(computed_at__isnull=True) & Exists(month_summary.filter(total__gt=0)))
+        | Q(updated_at__gt=F('computed_at'))
+        | Exists(month_summary.filter(updated_at__gt=OuterRef('computed_at')))
+    )
+
+
+def payroll_totals(month, year):
+    """Totaux (base, déductions, net) des salaires du mois en une requête"""
+    totals = SalaryCalculation.objects.filter(month=month, year=year).aggregate(
+        base_salary=Sum('base_salary'),
+        deductions=Sum('deduction_amount'),
+        net_salary=Sum('net_salary'),
+    )
+    return {key: value or Decimal('0') for key, value in totals.items()}
+
+
+SHARD_STRATEGIES = ['department', 'id-range']
+
+# Nombre de shards par processus : des shards plus petits équilibrent la
+# charge et rendent une relance moins coûteuse
+SHARDS_PER_WORKER = 4
+
+
+def build_shards(shard_by, workers):
+    """Découpe les employés actifs en shards identifiés par une clé"""
+    active = Employee.objects.filter(is_active=True).order_by()
+
+    if shard_by == 'department':
+        department_ids = active.values_list('department_id', flat=True).distinct().order_by('department_id')
+        return [f'department:{pk}' for pk in department_ids]
+
+    ids = list(active.order_by('id').values_list('id', flat=True))
+    if not ids:
+        return []
+    shard_count = min(len(ids), max(workers, 1) * SHARDS_PER_WORKER)
+    size = -(-len(ids) // shard_count)
+    return [
+        f'id:{chunk[0]}-{chunk[-1]}'
+        for chunk in (ids[i:i + size] for i in range(0, len(ids), size))
+    ]
+
+
+def shard_queryset(key):
+    """Employés actifs correspondant à une clé de shard ('department:3', 'id:1-500')"""
+    kind, _, value = key.partition(':')
+    employees = Employee.objects.filter(is_active=True)
+    try:
+        if kind == 'department':
+            return employees.filter(department_id=int(value))
+        if kind == 'id':
+            low, high = value.split('-')
+            return employees.filter(id__range=(int(low), int(high)))
+    except ValueError:
+        pass
+    raise ValueError(f"Clé de shard invalide: {key}")
+
+
+def merge_payrolls(month, year, payrolls, elapsed):
+    """Fusionne les résultats de plusieurs shards en un seul résumé"""
+    results = []
+    skipped = []
+    for payroll in payrolls:
+        results.extend(payroll['results'])
+        skipped.extend(payroll['skipped'])
+    results.sort(key=lambda row: row['name'])
+    skipped.sort()
+
+    return {
+        'month': month,
+        'year': year,
+        'results': results,
+        'skipped': skipped,
+        'created': sum(payroll['created'] for payroll in payrolls),
+        'updated': sum(payroll['updated'] for payroll in payrolls),
+        'deleted': sum(payroll['deleted'] for payroll in payrolls),
+        'calculated': len(results),
+        'elapsed': elapsed,
+        'rows_per_second': len(results) / elapsed if elapsed > 0 else 0,
+    }
+
+
+def run_sharded_payroll(month, year, keys, workers, batch_size=BATCH_SIZE, retries=0, on_failure=None):
+    """
+    Calcule les shards `keys` dans un pool de `workers` processus.
+
+    Chaque shard est écrit dans sa propre transaction : un shard en échec
+    est relancé seul (jusqu'à `retries` fois) sans recalculer les autres.
+    Retourne (résumé fusionné, {clé: erreur} des shards toujours en échec).
+    """
+    started = time.perf_counter()
+    payrolls = []
+    pending = list(keys)
+    failed = {}
+
+    # Les connexions ne doivent pas être partagées avec les processus fils
+    connections.close_all()
+    context = multiprocessing.get_context('spawn')
+    for attempt in range(retries + 1):
+        failed = {}
+        # Un pool neuf à chaque tentative : un processus mort rend le pool inutilisable
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker) as pool:
+            futures = {
+                pool.submit(run_shard, key, month, year, batch_size): key
+                for key in pending
+            }
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    payrolls.append(future.result())
+                except Exception as e:
+                    failed[key] = e
+                    if on_failure is not None:
+                        on_failure(key, e, attempt)
+        if not failed:
+            break
+        pending = list(failed)
+
+    return merge_payrolls(month, year, payrolls, time.perf_counter() - started), failed
@@ -0,0 +1,24 @@
+"""
+Points d'entrée du pool de processus de la paie.
+
+Ce module n'importe aucun modèle au chargement : il doit pouvoir être
+importé par un processus fils avant l'appel à django.setup().
+"""
+
+import django
+from django.db import connections
+
+
+def init_worker():
+    """Initialise Django dans un processus du pool"""
+    django.setup()
+
+
+def run_shard(key, month, year, batch_size):
+    """Calcule la paie d'un shard ; exécuté dans un processus du pool"""
+    from .payroll import calculate_payroll, shard_queryset
+
+    try:
+        return calculate_payroll(month, year, shard_queryset(key), batch_size)
+    finally:
+        connections.close_all()
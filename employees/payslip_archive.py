@@ -0,0 +1,219 @@
+"""
+Génération en lot des bulletins de paie d'un mois dans une archive ZIP.
+
+Les lignes SalaryCalculation sont lues en une requête, les PDF sont rendus
+dans un pool de processus et écrits au fil de l'eau dans le ZIP, sans
+garder tous les bulletins en mémoire.
+
+L'archive est générée hors des requêtes web, par la commande
+generate_payslips : planifiée, ou lancée depuis la page de l'archive dans
+un processus détaché (`start_generation`). La commande tient un fichier
+d'état (bulletins_AAAA_MM.json) que la page relit pour suivre la
+génération. Le commentaire ZIP porte l'empreinte des bulletins rendus (valeurs
+imprimées), que la vue de téléchargement compare avant de servir
+l'archive.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+
+from .models import SalaryCalculation
+from .payslip_cache import payslip_digest
+from .payslip_pdf import PAYSLIP_FIELDS, render_payslip
+
+
+# Bulletins envoyés à un processus par aller-retour
+RENDER_CHUNK_SIZE = 16
+
+# Secondes sans mise à jour de l'état après lesquelles une génération est
+# considérée comme interrompue (processus tué, serveur redémarré)
+STALE_AFTER = 300
+
+
+def archive_path(month, year):
+    """Emplacement de l'archive d'un mois sous MEDIA_ROOT"""
+    return Path(settings.MEDIA_ROOT) / 'payslips' / f'bulletins_{year}_{month:02d}.zip'
+
+
+def _month_payslips(month, year):
+    """Lignes PAYSLIP_FIELDS des bulletins du mois, dans l'ordre de l'archive"""
+    return (
+        SalaryCalculation.objects.filter(month=month, year=year)
+        .order_by('employee__employee_id')
+        .values(*PAYSLIP_FIELDS)
+    )
+
+
+def _fingerprint(payslips):
+    """Hash des empreintes (payslip_digest) des bulletins `payslips`, dans l'ordre"""
+    digest = hashlib.sha256()
+    for payslip in payslips:
+        digest.update(payslip_digest(payslip).encode())
+    return digest.hexdigest().encode()
+
+
+def archive_fingerprint(month, year):
+    """
+    Empreinte des bulletins du mois, calculée comme les clés du cache des
+    bulletins sur les valeurs imprimées : un salaire recalculé, un nom, un
+    matricule ou un département renommé, un bulletin ajouté ou supprimé la
+    changent.
+    """
+    return _fingerprint(_month_payslips(month, year).iterator(chunk_size=2000))
+
+
+def archive_is_current(month, year, file):
+    """True si l'archive ouverte `file` porte l'empreinte actuelle du mois"""
+    try:
+        with zipfile.ZipFile(file) as archive:
+            fingerprint = archive.comment
+    except zipfile.BadZipFile:
+        return False
+    finally:
+        file.seek(0)
+    return fingerprint == archive_fingerprint(month, year)
+
+
+def current_archive(month, year, path=None):
+    """Archive du mois ouverte en lecture si elle est à jour, sinon None"""
+    try:
+        file = open(path or archive_path(month, year), 'rb')
+    except FileNotFoundError:
+        return None
+    if not archive_is_current(month, year, file):
+        file.close()
+        return None
+    return file
+
+
+def status_path(month, year):
+    """Fichier d'état de la génération de l'archive d'un mois"""
+    return archive_path(month, year).with_suffix('.json')
+
+
+def read_status(month, year):
+    """
+    État de la dernière génération du mois, None si aucune : dict state
+    ('queued', 'running', 'done', 'failed'), done, total, error, updated
+    """
+    try:
+        with open(status_path(month, year), encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_status(month, year, state, done=0, total=0, error=''):
+    """Remplace atomiquement le fichier d'état du mois"""
+    path = status_path(month, year)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    status = {'state': state, 'done': done, 'total': total, 'error': error, 'updated': time.time()}
+    with tempfile.NamedTemporaryFile(
+        'w', encoding='utf-8', dir=path.parent, prefix=path.name, suffix='.part', delete=False
+    ) as file:
+        json.dump(status, file)
+    os.replace(file.name, path)
+
+
+def is_running(status):
+    """True si `status` décrit une génération en attente ou en cours, mise à jour récemment"""
+    return (
+        status is not None
+        and status['state'] in ('queued', 'running')
+        and time.time() - status['updated'] < STALE_AFTER
+    )
+
+
+def start_generation(month, year):
+    """
+    Lance `generate_payslips --if-stale` pour le mois dans un processus
+    détaché du serveur. Retourne False, sans rien lancer, si une
+    génération du mois est déjà en cours.
+    """
+    if is_running(read_status(month, year)):
+        return False
+    write_status(month, year, 'queued')
+    subprocess.Popen(
+        [
+            sys.executable, str(Path(settings.BASE_DIR) / 'manage.py'), 'generate_payslips',
+            '--month', str(month), '--year', str(year), '--if-stale',
+        ],
+        cwd=settings.BASE_DIR,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    return True
+
+
+def generate_payslip_archive(month, year, path=None, workers=None, progress=None):
+    """
+    Rend tous les bulletins du mois dans `path` (par défaut archive_path).
+
+    `workers` processus de rendu (1 : rendu dans le processus courant).
+    `progress(fait, total)` est appelé après chaque bulletin écrit.
+    Retourne un dict : path, payslips, pages, size, elapsed, pages_per_second.
+    """
+    started = time.perf_counter()
+    path = Path(path or archive_path(month, year))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    
+    # Empreinte des lignes rendues : une modification concurrente laisse une
+    # archive périmée, jamais une archive crue à jour
+    rows = list(_month_payslips(month, year))
+    fingerprint = _fingerprint(rows)
+    total = len(rows)
+    pages = 0
+    
+    # Écriture dans un fichier temporaire propre à cette génération :
+    # l'archive précédente reste disponible jusqu'au remplacement atomique
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=path.name, suffix='.part', delete=False) as file:
+        partial = Path(file.name)
+    try:
+        with zipfile.ZipFile(partial, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.comment = fingerprint
+            # En dessous d'un lot, le démarrage du pool coûte plus que le rendu
+            if workers > 1 and total > RENDER_CHUNK_SIZE:
+                context = multiprocessing.get_context('spawn')
+                with ProcessPoolExecutor(max_workers=min(workers, total), mp_context=context) as pool:
+                    rendered = pool.map(render_payslip, rows, chunksize=RENDER_CHUNK_SIZE)
+                    pages = _write_all(archive, rendered, total, progress)
+            else:
+                pages = _write_all(archive, map(render_payslip, rows), total, progress)
+        os.replace(partial, path)
+    finally:
+        if partial.exists():
+            partial.unlink()
+    
+    elapsed = time.perf_counter() - started
+    return {
+        'path': path,
+        'payslips': total,
+        'pages': pages,
+        'size': path.stat().st_size,
+        'elapsed': elapsed,
+        'pages_per_second': pages / elapsed if elapsed > 0 else 0,
+    }
+
+
+def _write_all(archive, rendered, total, progress):
+    pages = 0
+    for done, (filename, content, page_count) in enumerate(rendered, start=1):
+        archive.writestr(filename, content)
+        pages += page_count
+        if progress is not None:
+            progress(done, total)
+    return pages
@@ -0,0 +1,116 @@
+"""
+Cache disque des bulletins de paie PDF.
+
+Chaque PDF est rangé sous MEDIA_ROOT/payslips/cache/ à un nom dérivé d'un
+hash des valeurs imprimées sur le bulletin. Un recalcul qui modifie la
+ligne SalaryCalculation (ou le nom, le matricule, le département) change
+le hash : l'ancien fichier n'est plus jamais servi et finit évincé par la
+limite de taille, les fichiers les moins récemment servis partant d'abord.
+
+Le parcours du répertoire pour l'éviction n'a lieu qu'après qu'un
+processus a écrit EVICT_EVERY_BYTES de nouveaux PDF, pas à chaque rendu :
+avec N processus, le cache dépasse au plus la limite de N fois ce pas.
+Les PDF sont ouverts avant toute éviction ; un fichier évincé par un autre
+processus entre-temps est traité comme absent et rendu à nouveau.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+from .payslip_pdf import LAYOUT_VERSION, PAYSLIP_FIELDS, render_payslip
+
+
+# Taille maximale du cache ; l'éviction redescend à 90% de la limite
+MAX_CACHE_BYTES = getattr(settings, 'PAYSLIP_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+# Octets écrits par un processus entre deux passes d'éviction
+EVICT_EVERY_BYTES = MAX_CACHE_BYTES // 10
+
+# Octets écrits par ce processus depuis sa dernière éviction
+_written = 0
+
+
+def cache_dir():
+    return Path(settings.MEDIA_ROOT) / 'payslips' / 'cache'
+
+
+def payslip_digest(payslip):
+    """Hash des valeurs imprimées sur le bulletin (ligne PAYSLIP_FIELDS)"""
+    values = [LAYOUT_VERSION] + [str(payslip[field]) for field in PAYSLIP_FIELDS]
+    return hashlib.sha256(json.dumps(values).encode()).hexdigest()
+
+
+def cached_payslip(payslip):
+    """PDF du bulletin ouvert en lecture binaire, rendu et mis en cache au premier accès"""
+    global _written
+    digest = payslip_digest(payslip)
+    path = cache_dir() / digest[:2] / f'{digest}.pdf'
+    
+    try:
+        file = open(path, 'rb')
+    except FileNotFoundError:
+        file = None
+    if file is not None:
+        try:
+            # La date de modification sert d'horodatage d'accès pour l'éviction
+            os.utime(path)
+        except FileNotFoundError:
+            # Évincé depuis l'ouverture : le fichier ouvert reste lisible
+            pass
+        return file
+    
+    _, content, _ = render_payslip(payslip)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Écriture dans un fichier temporaire propre à ce rendu (deux threads
+    # peuvent rendre le même bulletin) puis renommage : un accès concurrent
+    # ne lit jamais un PDF partiel. Ouvert avant le renommage, il reste
+    # lisible même s'il est évincé aussitôt.
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=path.name, suffix='.part', delete=False) as partial:
+        partial.write(content)
+    file = open(partial.name, 'rb')
+    try:
+        os.replace(partial.name, path)
+    except OSError:
+        file.close()
+        os.unlink(partial.name)
+        raise
+    
+    _written += len(content)
+    if _written >= EVICT_EVERY_BYTES:
+        _written = 0
+        evict(MAX_CACHE_BYTES)
+    return file
+
+
+def evict(max_bytes=MAX_CACHE_BYTES):
+    """Supprime les PDF les moins récemment servis au-delà de `max_bytes`"""
+    entries = []
+    total = 0
+    for path in cache_dir().glob('*/*.pdf'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+    
+    if total <= max_bytes:
+        return 0
+    
+    removed = 0
+    target = max_bytes * 0.9
+    for _, size, path in sorted(entries):
+        if total <= target:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            # Déjà évincé, ou encore ouvert sous Windows
+            pass
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,106 @@
+"""
+Rendu PDF des bulletins de paie avec ReportLab.
+
+Le rendu ne dépend que d'un dictionnaire de valeurs : ce module n'importe
+aucun modèle et peut être exécuté par un processus fils sans django.setup().
+"""
+
+import calendar
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+
+# À incrémenter à chaque changement de mise en page : les PDF déjà mis en
+# cache (payslip_cache) cessent alors d'être servis
+LAYOUT_VERSION = 1
+
+# Champs de SalaryCalculation nécessaires au rendu (QuerySet.values)
+PAYSLIP_FIELDS = [
+    'employee__employee_id', 'employee__user__first_name', 'employee__user__last_name',
+    'employee__department__name', 'month', 'year', 'base_salary',
+    'attendance_percentage', 'deduction_amount', 'net_salary',
+]
+
+
+def payslip_filename(employee_id, year, month):
+    return f"payslip_{employee_id}_{year}_{month:02d}.pdf"
+
+
+def render_payslip(payslip):
+    """
+    Génère le PDF d'un bulletin à partir d'une ligne PAYSLIP_FIELDS.
+    Retourne (nom de fichier, contenu PDF, nombre de pages).
+    """
+    year = payslip['year']
+    month = payslip['month']
+    
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    styles = getSampleStyleSheet()
+    
+    # Contenu du PDF
+    story = []
+    
+    # En-tête
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        spaceAfter=30,
+        alignment=1,  # Centré
+    )
+    
+    story.append(Paragraph("BULLETIN DE PAIE", title_style))
+    story.append(Spacer(1, 20))
+    
+    # Informations employé
+    employee_info = [
+        ['Nom:', f"{payslip['employee__user__first_name']} {payslip['employee__user__last_name']}"],
+        ['ID Employé:', payslip['employee__employee_id']],
+        ['Département:', payslip['employee__department__name']],
+        ['Période:', f"{calendar.month_name[month]} {year}"],
+    ]
+    
+    employee_table = Table(employee_info, colWidths=[2*inch, 3*inch])
+    employee_table.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ]))
+    
+    story.append(employee_table)
+    story.append(Spacer(1, 20))
+    
+    # Détails du salaire
+    salary_data = [
+        ['Description', 'Montant'],
+        ['Salaire de base', f"${payslip['base_salary']:,.2f}"],
+        ['Pourcentage de présence', f"{payslip['attendance_percentage']}%"],
+        ['Déduction (si < 75%)', f"${payslip['deduction_amount']:,.2f}"],
+        ['', ''],
+        ['SALAIRE NET', f"${payslip['net_salary']:,.2f}"],
+    ]
+    
+    salary_table = Table(salary_data, colWidths=[3*inch, 2*inch])
+    salary_table.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('LINEBELOW', (0, -2), (-1, -2), 1, colors.black),
+        ('LINEBELOW', (0, -1), (-1, -1), 2, colors.black),
+    ]))
+    
+    story.append(salary_table)
+    
+    doc.build(story)
+    
+    return payslip_filename(payslip['employee__employee_id'], year, month), buffer.getvalue(), doc.page
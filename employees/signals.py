@@ -0,0 +1,29 @@
+"""
+Invalidation du cache du tableau de bord lors des écritures.
+
+Les présences sont invalidées par les mises à jour du résumé mensuel
+(AttendanceMonthlySummary.apply_delta et attendance.summaries), qui
+couvrent aussi les écritures en masse.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from attendance.models import LeaveRequest
+from .models import Department, Employee
+from .stats_cache import invalidate
+
+
+@receiver([post_save, post_delete], sender=Employee)
+def invalidate_employee_stats(sender, **kwargs):
+    invalidate('employees')
+
+
+@receiver([post_save, post_delete], sender=Department)
+def invalidate_department_stats(sender, **kwargs):
+    invalidate('departments')
+
+
+@receiver([post_save, post_delete], sender=LeaveRequest)
+def invalidate_leave_stats(sender, **kwargs):
+    invalidate('leaves')
@@ -0,0 +1,147 @@
+"""
+Simulateur « what-if » des règles de déduction salariale.
+
+Les ratios de présence mensuels de chaque employé sont chargés une seule
+fois dans des tableaux NumPy, puis toute une grille de politiques
+(seuil de présence x taux de déduction) est évaluée de façon vectorisée,
+sans relancer la paie.
+"""
+
+import numpy as np
+from django.db.models import F
+
+from attendance.models import AttendanceMonthlySummary
+from .models import Department
+from .payroll import ATTENDANCE_THRESHOLD, DEDUCTION_RATE
+
+
+DEFAULT_THRESHOLDS = [50, 55, 60, 65, 70, 75, 80, 85, 90]
+DEFAULT_RATES = [5, 10, 15, 20, 25]
+
+
+def parse_values(value, default):
+    """Liste de nombres séparés par des virgules ('60,70,75')"""
+    if not value:
+        return list(default)
+    return [float(item) for item in value.split(',') if item.strip()]
+
+
+def load_attendance_matrix(start, end):
+    """
+    Charge en une requête les résumés mensuels de présence de [start, end[ :
+    une entrée par (employé, mois) avec ratio de présence, salaire de
+    base et département.
+    """
+    first = start.year * 12 + start.month
+    last = end.year * 12 + end.month
+    rows = AttendanceMonthlySummary.objects.annotate(
+        period=F('year') * 12 + F('month')
+    ).filter(
+        period__gte=first,
+        period__lt=last,
+        total__gt=0
+    ).order_by().values_list(
+        'employee_id', 'employee__base_salary', 'employee__department_id',
+        'total', 'present', 'half_day'
+    )
+
+    data = np.array(list(rows), dtype=np.float64).reshape(-1, 6)
+    employee_ids, employee_index = np.unique(data[:, 0].astype(np.int64), return_inverse=True)
+    department_ids, department_index = np.unique(data[:, 2].astype(np.int64), return_inverse=True)
+    total = data[:, 3]
+
+    return {
+        'ratio': (data[:, 4] + data[:, 5] * 0.5) / np.where(total > 0, total, 1) * 100,
+        'salary': data[:, 1],
+        'employee_index': employee_index,
+        'employee_count': len(employee_ids),
+        'department_index': department_index,
+        'department_ids': department_ids,
+    }
+
+
+def evaluate_policies(matrix, thresholds, rates):
+    """
+    Évalue toutes les combinaisons seuil x taux (en pourcentage).
+
+    Retourne un tableau par politique : coût total, déductions, nombre
+    d'employés et de mois concernés, déductions par département.
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    rates = np.asarray(rates, dtype=np.float64) / 100
+    salary = matrix['salary']
+    n_thresholds = len(thresholds)
+    n_employees = matrix['employee_count']
+    n_departments = len(matrix['department_ids'])
+
+    # affected[t, i] : le mois i passe sous le seuil t
+    affected = matrix['ratio'][None, :] < thresholds[:, None]
+    rows, cols = np.nonzero(affected)
+
+    affected_salary = affected @ salary
+    affected_months = affected.sum(axis=1)
+    affected_employees = (
+        np.bincount(
+            rows * n_employees + matrix['employee_index'][cols],
+            minlength=n_thresholds * n_employees
+        ).reshape(n_thresholds, n_employees) > 0
+    ).sum(axis=1)
+    department_salary = np.bincount(
+        rows * n_departments + matrix['department_index'][cols],
+        weights=salary[cols],
+        minlength=n_thresholds * n_departments
+    ).reshape(n_thresholds, n_departments)
+
+    return {
+        'thresholds': thresholds,
+        'rates': rates,
+        'total_base': salary.sum(),
+        # (seuils x taux) et (seuils x taux x départements)
+        'deductions': affected_salary[:, None] * rates[None, :],
+        'department_deductions': department_salary[:, None, :] * rates[None, :, None],
+        'affected_employees': affected_employees,
+        'affected_months': affected_months,
+    }
+
+
+def simulate_deductions(start, end, thresholds=None, rates=None):
+    """
+    Simule la grille de politiques sur les mois [start, end[ et retourne
+    une ligne par politique, prête pour l'affichage ou la sortie JSON.
+    """
+    thresholds = thresholds or DEFAULT_THRESHOLDS
+    rates = rates or DEFAULT_RATES
+
+    matrix = load_attendance_matrix(start, end)
+    grid = evaluate_policies(matrix, thresholds, rates)
+    department_names = dict(
+        Department.objects.filter(pk__in=matrix['department_ids'].tolist()).values_list('id', 'name')
+    )
+    current_rate = float(DEDUCTION_RATE) * 100
+
+    policies = []
+    for t, threshold in enumerate(grid['thresholds']):
+        for r, rate in enumerate(grid['rates']):
+            deductions = grid['deductions'][t, r]
+            policies.append({
+                'threshold': float(threshold),
+                'rate': round(float(rate) * 100, 4),
+                'is_current': bool(np.isclose(threshold, ATTENDANCE_THRESHOLD) and np.isclose(rate * 100, current_rate)),
+                'total_cost': round(float(grid['total_base'] - deductions), 2),
+                'total_deductions': round(float(deductions), 2),
+                'affected_employees': int(grid['affected_employees'][t]),
+                'affected_months': int(grid['affected_months'][t]),
+                'departments': {
+                    department_names.get(int(pk), str(pk)): round(float(amount), 2)
+                    for pk, amount in zip(matrix['department_ids'], grid['department_deductions'][t, r])
+                },
+            })
+
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'employee_months': len(matrix['ratio']),
+        'employees': matrix['employee_count'],
+        'total_base': round(float(grid['total_base']), 2),
+        'policies': policies,
+    }
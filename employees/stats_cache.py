@@ -0,0 +1,100 @@
+"""
+Cache des statistiques du tableau de bord.
+
+Chaque groupe de statistiques (présences d'un mois, effectif, départements,
+congés en attente) est stocké avec le jeton de version de son groupe. Une
+écriture remplace le jeton des seuls groupes touchés par un jeton neuf
+(un simple set : incr n'est pas atomique entre processus avec le cache
+fichier, deux écritures concurrentes pourraient produire le même
+numéro) ; la lecture récupère versions et valeurs en un seul get_many et
+ne recalcule que les groupes périmés.
+
+Ce module n'importe aucun modèle : attendance.models peut l'utiliser.
+"""
+
+import asyncio
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+# Les valeurs sont de toute façon invalidées par version ; l'expiration
+# borne seulement la durée de vie d'une entrée oubliée
+STATS_TIMEOUT = 24 * 60 * 60
+
+VERSION_KEY = 'dashboard:version:{}'
+VALUE_KEY = 'dashboard:stats:{}'
+
+
+def attendance_group(year, month):
+    """Nom du groupe des statistiques de présence d'un mois"""
+    return f'attendance:{year}-{month:02d}'
+
+
+def _new_version():
+    # Jamais réutilisé, même entre processus ou si la clé a été évincée
+    return uuid.uuid4().hex
+
+
+def _bump(names):
+    cache.set_many({VERSION_KEY.format(name): _new_version() for name in names}, None)
+
+
+def invalidate(*names):
+    """Périme les groupes `names` une fois la transaction en cours validée"""
+    names = set(names)
+    if names:
+        transaction.on_commit(lambda: _bump(names))
+
+
+def cached_stats(groups):
+    """
+    `groups` associe un nom de groupe à la fonction qui le recalcule.
+    Retourne {nom: valeur}, en une lecture de cache si rien n'est périmé.
+    """
+    stats, stale = _read(groups)
+    for name, version in stale.items():
+        # La version est lue avant le calcul : une écriture concurrente la
+        # fait avancer et la valeur stockée sera recalculée à la lecture suivante
+        stats[name] = groups[name]()
+        cache.set(VALUE_KEY.format(name), (version, stats[name]), STATS_TIMEOUT)
+    return stats
+
+
+async def acached_stats(groups):
+    """
+    Version asynchrone de cached_stats : `groups` associe un nom de groupe à
+    une fonction retournant un awaitable, et les groupes périmés sont
+    recalculés en parallèle.
+    """
+    stats, stale = await asyncio.to_thread(_read, groups)
+    values = await asyncio.gather(*(groups[name]() for name in stale))
+    stats.update(zip(stale, values))
+    if stale:
+        await asyncio.to_thread(cache.set_many, {
+            VALUE_KEY.format(name): (version, stats[name]) for name, version in stale.items()
+        }, STATS_TIMEOUT)
+    return stats
+
+
+def _read(groups):
+    """Retourne ({nom: valeur} des groupes à jour, {nom: version} des groupes périmés)"""
+    keys = [VERSION_KEY.format(name) for name in groups] + [VALUE_KEY.format(name) for name in groups]
+    found = cache.get_many(keys)
+
+    stats = {}
+    stale = {}
+    for name in groups:
+        version_key = VERSION_KEY.format(name)
+        version = found.get(version_key)
+        if version is None:
+            cache.add(version_key, _new_version(), None)
+            version = cache.get(version_key)
+
+        cached = found.get(VALUE_KEY.format(name))
+        if cached is not None and cached[0] == version:
+            stats[name] = cached[1]
+        else:
+            stale[name] = version
+    return stats, stale
@@ -0,0 +1,350 @@
+"""
+Jeu de données synthétique à grande échelle (benchmarks, tests de charge).
+
+Crée des départements, des employés avec leur User (un HR, un manager par
+département), leurs présences jour ouvré par jour ouvré, des demandes de
+congé et les calculs de salaire des mois complets.
+
+Tout est déterministe : le même `seed` produit exactement les mêmes
+données. Les matricules sont pré-attribués (SYNTHETIC-000001...) au lieu du
+tirage aléatoire d'Employee.save(), et les présences sont insérées par
+executemany en gros lots, sans instancier de modèles ; leurs résumés
+mensuels sont comptés pendant la génération.
+"""
+
+import time as clock
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from attendance.bitmaps import DAY_BITS, STATUS_CODES
+from attendance.models import Attendance, AttendanceMonthlySummary, LeaveRequest
+from attendance.periods import next_month, working_days
+from .models import Department, Employee
+from .payroll import calculate_payroll
+from .stats_cache import attendance_group, invalidate
+
+
+USERNAME_PREFIX = 'synthetic'
+
+# Nombre de lignes de présence par executemany (une transaction par lot)
+BATCH_SIZE = 50000
+
+# Codes de statut utilisés dans les tableaux NumPy
+STATUSES = ['PRESENT', 'ABSENT', 'HALF_DAY', 'LEAVE']
+PRESENT, ABSENT, HALF_DAY, LEAVE = range(4)
+
+# Absences et demi-journées : taux moyens ~5% et ~4%, variables selon l'employé
+ABSENCE_BETA = (2, 38)
+HALF_DAY_BETA = (2, 48)
+
+# Congés : blocs de jours ouvrés par an et par employé
+LEAVE_BLOCKS_PER_YEAR = 3
+LEAVE_BLOCK_DAYS = (2, 11)
+LEAVE_REJECTION_RATE = 0.1
+PENDING_LEAVE_RATE = 0.05
+
+
+def first_month(months, today=None):
+    """Premier jour du mois situé `months` mois avant le mois courant"""
+    start = (today or date.today()).replace(day=1)
+    for _ in range(months):
+        start = (start - timedelta(days=1)).replace(day=1)
+    return start
+
+
+def delete_dataset(prefix=USERNAME_PREFIX):
+    """Supprime un jeu de données créé avec ce préfixe (présences comprises, par cascade)"""
+    with transaction.atomic():
+        deleted, _ = User.objects.filter(username__startswith=prefix).delete()
+        Department.objects.filter(name__startswith=f'{prefix.title()} ').delete()
+    invalidate('employees', 'departments', 'leaves')
+    return deleted
+
+
+def role_for(index, departments):
+    """Rôle du `index`-ième employé généré : un HR, puis un manager par département"""
+    if index == 0:
+        return 'HR'
+    if index < departments:
+        return 'MANAGER'
+    return 'EMPLOYEE'
+
+
+def role_usernames(employees, departments, prefix=USERNAME_PREFIX):
+    """
+    Noms d'utilisateur générés, par rôle, pour ces paramètres (sans
+    requête : l'attribution des rôles ne dépend que de l'indice).
+    """
+    departments = max(1, min(departments, employees))
+    usernames = {'HR': [], 'MANAGER': [], 'EMPLOYEE': []}
+    for i in range(employees):
+        usernames[role_for(i, departments)].append(f'{prefix}{i:06d}')
+    return usernames
+
+
+def build_dataset(employees=200, departments=10, months=3, seed=42, today=None,
+                  prefix=USERNAME_PREFIX, salaries=False, batch_size=BATCH_SIZE, progress=None,
+                  password=None):
+    """
+    Crée le jeu de données : `months` mois de présences avant le mois
+    courant, plus le mois courant jusqu'à `today`.
+
+    `progress(étape, fait, total)` est appelé pendant l'insertion des
+    présences et des salaires. Retourne un dict : comptes créés, durées,
+    et nom d'utilisateur d'un employé de chaque rôle. Sans `password`, le
+    mot de passe est inutilisable (se connecter avec Client.force_login).
+    """
+    started = clock.perf_counter()
+    rng = np.random.default_rng(seed)
+    today = today or date.today()
+    start = first_month(months, today)
+    departments = max(1, min(departments, employees))
+
+    department_objs, staff = _create_staff(rng, employees, departments, start, today, prefix, password)
+    hr_user_id = staff[0].user_id
+
+    days = list(working_days(start, today))
+    leave_days, leaves = _plan_leaves(rng, staff, days, today, hr_user_id)
+    attendances, months = _insert_attendances(rng, staff, days, leave_days, batch_size, progress)
+    LeaveRequest.objects.bulk_create(leaves, batch_size=batch_size)
+
+    # Les insertions en masse ne déclenchent pas les signaux d'invalidation
+    invalidate('employees', 'departments', 'leaves', *(attendance_group(y, m) for y, m in months))
+
+    salary_rows = 0
+    if salaries:
+        complete = list(_months(start, today.replace(day=1)))
+        synthetic = Employee.objects.filter(user__username__startswith=prefix)
+        for done, period in enumerate(complete, start=1):
+            salary_rows += calculate_payroll(period.month, period.year, synthetic, batch_size=5000)['calculated']
+            if progress is not None:
+                progress('salaires', done, len(complete))
+
+    managers = [e for e in staff if e.role == 'MANAGER']
+    regulars = [e for e in staff if e.role == 'EMPLOYEE']
+    return {
+        'departments': len(department_objs),
+        'employees': len(staff),
+        'attendances': attendances,
+        'leave_requests': len(leaves),
+        'salary_calculations': salary_rows,
+        'elapsed': clock.perf_counter() - started,
+        'usernames': {
+            'HR': staff[0].user.username,
+            'MANAGER': (managers or staff)[0].user.username,
+            'EMPLOYEE': (regulars or staff)[-1].user.username,
+        },
+    }
+
+
+def _months(start, end):
+    """Premiers jours des mois de [start, end["""
+    while start < end:
+        yield start
+        start = next_month(start)
+
+
+def _create_staff(rng, employees, departments, start, today, prefix, password):
+    # Un seul hachage pour tous les comptes
+    password = make_password(password)
+    salaries = rng.integers(40, 160, size=employees) * 50
+    # Embauches étalées : 80% avant la période, les autres pendant
+    hired_before = rng.random(employees) < 0.8
+    span = max((today - start).days, 1)
+    offsets = rng.integers(0, span, size=employees)
+
+    with transaction.atomic():
+        department_objs = Department.objects.bulk_create([
+            Department(name=f'{prefix.title()} {i:03d}', description='Données synthétiques')
+            for i in range(departments)
+        ])
+        users = User.objects.bulk_create([
+            User(
+                username=f'{prefix}{i:06d}',
+                first_name=f'Prénom{i}',
+                last_name=f'Nom{i:06d}',
+                email=f'{prefix}{i:06d}@example.com',
+                password=password,
+            )
+            for i in range(employees)
+        ], batch_size=BATCH_SIZE)
+
+        staff = []
+        for i, user in enumerate(users):
+            # Les managers sont les premiers employés de leur département
+            role = role_for(i, departments)
+            staff.append(Employee(
+                user=user,
+                # Matricule pré-attribué : Employee.save() n'est pas appelé
+                employee_id=f'{prefix[:12].upper()}-{i:06d}',
+                department=department_objs[i % departments],
+                role=role,
+                base_salary=Decimal(int(salaries[i])),
+                hire_date=start - timedelta(days=365) if i < departments or hired_before[i]
+                else start + timedelta(days=int(offsets[i])),
+            ))
+        staff = Employee.objects.bulk_create(staff, batch_size=BATCH_SIZE)
+    return department_objs, staff
+
+
+def _plan_leaves(rng, staff, days, today, hr_user_id):
+    """
+    Blocs de congé de chaque employé : les blocs approuvés deviennent des
+    jours LEAVE. Retourne ({employee_id: indices des jours}, demandes).
+    """
+    years = max(len(days) / 261, 1 / 12)
+    approved_at = timezone.make_aware(datetime.combine(days[0] if days else today, time(9)))
+    leave_days = {}
+    leaves = []
+    for employee in staff:
+        indices = []
+        for _ in range(rng.poisson(LEAVE_BLOCKS_PER_YEAR * years)):
+            length = int(rng.integers(*LEAVE_BLOCK_DAYS))
+            first = int(rng.integers(0, max(len(days) - length, 1)))
+            block = range(first, min(first + length, len(days)))
+            if not block:
+                continue
+            rejected = rng.random() < LEAVE_REJECTION_RATE
+            leaves.append(LeaveRequest(
+                employee_id=employee.id,
+                start_date=days[block[0]],
+                end_date=days[block[-1]],
+                reason='Congés annuels',
+                status='REJECTED' if rejected else 'APPROVED',
+                approved_by_id=hr_user_id,
+                approved_at=approved_at,
+            ))
+            if not rejected:
+                indices.extend(block)
+        if indices:
+            leave_days[employee.id] = np.unique(indices)
+
+        if rng.random() < PENDING_LEAVE_RATE:
+            begin = next_month(today) + timedelta(days=int(rng.integers(0, 20)))
+            leaves.append(LeaveRequest(
+                employee_id=employee.id,
+                start_date=begin,
+                end_date=begin + timedelta(days=int(rng.integers(1, 10))),
+                reason='Congés annuels',
+            ))
+    return leave_days, leaves
+
+
+def _insert_sql(model, columns):
+    qn = connection.ops.quote_name
+    return 'INSERT INTO {} ({}) VALUES ({})'.format(
+        qn(model._meta.db_table),
+        ', '.join(qn(column) for column in columns),
+        ', '.join(['%s'] * len(columns)),
+    )
+
+
+def _insert_attendances(rng, staff, days, leave_days, batch_size, progress):
+    """
+    Insère les présences par executemany, ainsi que leurs résumés mensuels
+    comptés au passage (pas de reconstruction à partir de la table).
+    Retourne (nombre de présences, mois couverts).
+    """
+    ops = connection.ops
+    sql = _insert_sql(Attendance, [
+        'employee_id', 'date', 'status', 'check_in_time', 'check_out_time',
+        'notes', 'marked_by_id', 'created_at', 'updated_at',
+    ])
+    summary_sql = _insert_sql(AttendanceMonthlySummary, [
+        'employee_id', 'year', 'month', 'total', 'present', 'absent', 'half_day', 'leave',
+        'marked_days', 'day_statuses', 'updated_at',
+    ])
+    
+    # Mois de chaque jour, en index depuis le premier mois
+    periods = np.array([day.year * 12 + day.month - 1 for day in days], dtype=np.int64)
+    base = int(periods[0]) if len(days) else 0
+    month_index = periods - base
+    n_months = int(month_index[-1]) + 1 if len(days) else 0
+    # Position de chaque jour dans les bitmaps du mois, code de chaque statut
+    day_offsets = np.array([day.day - 1 for day in days], dtype=np.int64)
+    bitmap_codes = np.array([STATUS_CODES[status] for status in STATUSES], dtype=np.int64)
+
+    # Valeurs adaptées une seule fois pour la base courante
+    now = ops.adapt_datetimefield_value(timezone.now())
+    day_values = [ops.adapt_datefield_value(day) for day in days]
+    check_in = [ops.adapt_timefield_value(time(8, m)) for m in range(60)]
+    check_out = {
+        PRESENT: [ops.adapt_timefield_value(time(17, m)) for m in range(60)],
+        HALF_DAY: [ops.adapt_timefield_value(time(12, m)) for m in range(60)],
+    }
+
+    total = sum(len(days) - bisect_left(days, employee.hire_date) for employee in staff)
+    inserted = 0
+    rows = []
+    summaries = []
+    for employee in staff:
+        first = bisect_left(days, employee.hire_date)
+        count = len(days) - first
+        if count <= 0:
+            continue
+
+        absence = rng.beta(*ABSENCE_BETA)
+        half_day = rng.beta(*HALF_DAY_BETA)
+        codes = rng.choice(3, size=count, p=[1 - absence - half_day, absence, half_day])
+        if employee.id in leave_days:
+            on_leave = leave_days[employee.id]
+            codes[on_leave[on_leave >= first] - first] = LEAVE
+        # Compteurs (mois x statut) du résumé mensuel
+        counts = np.bincount(
+            month_index[first:] * len(STATUSES) + codes,
+            minlength=n_months * len(STATUSES),
+        ).reshape(n_months, len(STATUSES))
+        # Bitmaps du mois : un employé n'a qu'une présence par jour, la somme vaut le OU
+        marked_days = np.zeros(n_months, dtype=np.int64)
+        day_statuses = np.zeros(n_months, dtype=np.int64)
+        np.add.at(marked_days, month_index[first:], 1 << day_offsets[first:])
+        np.add.at(day_statuses, month_index[first:], bitmap_codes[codes] << (DAY_BITS * day_offsets[first:]))
+        for index, (row, marked, statuses) in enumerate(zip(counts.tolist(), marked_days.tolist(), day_statuses.tolist())):
+            if any(row):
+                year, month = divmod(base + index, 12)
+                summaries.append((employee.id, year, month + 1, sum(row), *row, marked, statuses, now))
+        
+        minutes_in = rng.integers(0, 60, size=count).tolist()
+        minutes_out = rng.integers(0, 60, size=count).tolist()
+
+        for offset, code in enumerate(codes.tolist()):
+            worked = code in check_out
+            rows.append((
+                employee.id,
+                day_values[first + offset],
+                STATUSES[code],
+                check_in[minutes_in[offset]] if worked else None,
+                check_out[code][minutes_out[offset]] if worked else None,
+                '',
+                None,
+                now,
+                now,
+            ))
+
+        if len(rows) >= batch_size:
+            inserted += _flush(sql, rows)
+            rows = []
+            if progress is not None:
+                progress('présences', inserted, total)
+
+    inserted += _flush(sql, rows)
+    _flush(summary_sql, summaries)
+    if progress is not None:
+        progress('présences', inserted, total)
+    months = {(year, month) for _, year, month, *_ in summaries}
+    return inserted, months
+
+
+def _flush(sql, rows):
+    if not rows:
+        return 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+    return len(rows)
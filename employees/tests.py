@@ -1,3 +1,973 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, LiveServerTestCase, RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from attendance.bulk import upsert_attendances
+from attendance.models import Attendance, AttendanceMonthlySummary, LeaveRequest
+from attendance.summaries import BITMAP_FIELDS, COUNTER_FIELDS, rebuild_summaries
+from employee_attendance_system.testing import TEST_CACHES, TestCase, TransactionTestCase
+from . import payroll as payroll_module
+from .models import Department, Employee, SalaryCalculation
+from . import payslip_archive, payslip_cache, views
+from .async_queries import run_query
+from .payroll import build_shards, calculate_payroll, dirty_employees, payroll_totals, run_sharded_payroll, shard_queryset
+from .loadtest import DEFAULT_MIX, SCENARIO_ROLES, Recorder, parse_mix, run_load, summarize
+from .management.commands import benchmark
+from .middleware import QueryBudgetMiddleware, QueryCounter, get_employee, get_employee_context
+from .simulation import simulate_deductions
+from .synthetic import build_dataset, delete_dataset, role_usernames
+from .stats_cache import acached_stats, attendance_group, cached_stats, invalidate
+
+
+def create_employee(number, department=None, base_salary=Decimal('1000.00')):
+    if department is None:
+        department, _ = Department.objects.get_or_create(name='Informatique')
+    # Sans mot de passe (inutilisable) : pas de hachage coûteux
+    user = User.objects.create_user(f'employe{number}', first_name='Employé', last_name=f'{number:03d}')
+    return Employee.objects.create(
+        user=user,
+        employee_id=f'EMP{number:03d}',
+        department=department,
+        base_salary=base_salary,
+        hire_date=date(2020, 1, 1),
+    )
+
+
+STATUSES = [status for status, _ in Attendance.STATUS_CHOICES]
+
+
+def create_attendances(rng, employees, start, days, density=0.8):
+    for employee in employees:
+        for i in range(days):
+            if rng.random() < density:
+                Attendance.objects.create(employee=employee, date=start + timedelta(days=i), status=rng.choice(STATUSES))
+
+
+def reference_salary(employee, month, year):
+    """Calcul employé par employé tel qu'il était fait avant le moteur ensembliste"""
+    attendances = Attendance.objects.filter(employee=employee, date__year=year, date__month=month)
+    total_days = attendances.count()
+    if total_days == 0:
+        return None
+    present_days = attendances.filter(status='PRESENT').count()
+    half_days = attendances.filter(status='HALF_DAY').count()
+    attendance_percentage = (present_days + (half_days * 0.5)) / total_days * 100
+    deduction_amount = Decimal('0')
+    if attendance_percentage < 75:
+        deduction_amount = employee.base_salary * Decimal('0.15')
+    return (
+        employee.base_salary, Decimal(str(round(attendance_percentage, 2))),
+        deduction_amount, employee.base_salary - deduction_amount,
+    )
+
+
+def stored_salaries(month, year):
+    return {
+        employee_id: values
+        for employee_id, *values in SalaryCalculation.objects.filter(month=month, year=year).values_list(
+            'employee_id', 'base_salary', 'attendance_percentage', 'deduction_amount', 'net_salary'
+        )
+    }
+
+
+class PayrollEngineTests(TestCase):
+    """Le moteur ensembliste donne les salaires du calcul employé par employé"""
+
+    def expected_salaries(self, month, year):
+        expected = {}
+        for employee in Employee.objects.filter(is_active=True):
+            salary = reference_salary(employee, month, year)
+            if salary is not None:
+                expected[employee.id] = list(salary)
+        return expected
+
+    def test_matches_per_employee_calculation(self):
+        rng = random.Random(1)
+        employees = [create_employee(i, base_salary=Decimal(1000 + 137 * i)) for i in range(12)]
+        employees[0].is_active = False
+        employees[0].save()
+        # Janvier, février et les jours en bord de mois ; un employé sans présence
+        for employee in employees[:-1]:
+            create_attendances(rng, [employee], date(2025, 1, 1), 59, density=rng.random())
+
+        payroll = calculate_payroll(1, 2025)
+        self.assertEqual(stored_salaries(1, 2025), self.expected_salaries(1, 2025))
+        self.assertEqual((payroll['created'], payroll['updated']), (10, 0))
+        self.assertEqual(payroll['skipped'], [employees[-1].user.get_full_name()])
+
+        # Recalcul après corrections : les lignes existantes sont mises à jour
+        for attendance in Attendance.objects.filter(date__month=1).order_by('id')[::3]:
+            attendance.status = rng.choice(STATUSES)
+            attendance.save()
+        Employee.objects.filter(id=employees[1].id).update(base_salary=Decimal('2500.00'))
+        payroll = calculate_payroll(1, 2025)
+        self.assertEqual(stored_salaries(1, 2025), self.expected_salaries(1, 2025))
+        self.assertEqual((payroll['created'], payroll['updated']), (0, 10))
+
+        calculate_payroll(2, 2025)
+        self.assertEqual(stored_salaries(2, 2025), self.expected_salaries(2, 2025))
+
+    def test_query_count_does_not_grow_with_employees(self):
+        rng = random.Random(2)
+
+        def queries():
+            with CaptureQueriesContext(connection) as context:
+                calculate_payroll(3, 2025)
+            return len(context)
+
+        create_attendances(rng, [create_employee(i) for i in range(3)], date(2025, 3, 1), 31)
+        few = queries()
+        create_attendances(rng, [create_employee(i) for i in range(3, 15)], date(2025, 3, 1), 31)
+        SalaryCalculation.objects.all().delete()
+        self.assertEqual(queries(), few)
+
+
+class DirtyEmployeesTests(TestCase):
+
+    def dirty(self):
+        return set(dirty_employees(3, 2025).values_list('employee_id', flat=True))
+
+    def test_changes_since_last_calculation(self):
+        employees = [create_employee(i) for i in range(4)]
+        for employee in employees[:3]:
+            Attendance.objects.create(employee=employee, date=date(2025, 3, 3), status='PRESENT')
+        # Jamais calculés, avec des présences ; le dernier n'en a aucune
+        self.assertEqual(self.dirty(), {'EMP000', 'EMP001', 'EMP002'})
+
+        calculate_payroll(3, 2025)
+        self.assertEqual(self.dirty(), set())
+
+        # Correction d'une présence, nouveau salaire de base, présence d'un autre mois
+        attendance = Attendance.objects.get(employee=employees[0])
+        attendance.status = 'ABSENT'
+        attendance.save()
+        employees[1].base_salary = Decimal('1200.00')
+        employees[1].save()
+        Attendance.objects.create(employee=employees[2], date=date(2025, 4, 1), status='PRESENT')
+        self.assertEqual(self.dirty(), {'EMP000', 'EMP001'})
+
+        payroll = calculate_payroll(3, 2025, dirty_employees(3, 2025))
+        self.assertEqual((payroll['created'], payroll['updated']), (0, 2))
+        self.assertEqual(self.dirty(), set())
+        self.assertEqual(stored_salaries(3, 2025)[employees[0].id][3], Decimal('850.00'))
+
+    def test_incremental_command(self):
+        employee = create_employee(1)
+        Attendance.objects.create(employee=employee, date=date(2025, 3, 3), status='PRESENT')
+        call_command('calculate_monthly_salaries', month=3, year=2025, stdout=StringIO())
+        Attendance.objects.create(employee=employee, date=date(2025, 3, 4), status='ABSENT')
+
+        out = StringIO()
+        call_command('calculate_monthly_salaries', month=3, year=2025, incremental=True, stdout=out)
+        self.assertIn('Mode incrémental : 1 employés à recalculer', out.getvalue())
+        self.assertEqual(SalaryCalculation.objects.get().attendance_percentage, Decimal('50.00'))
+
+    def test_calculation_removed_when_attendance_is_deleted(self):
+        employee = create_employee(1)
+        attendance = Attendance.objects.create(employee=employee, date=date(2025, 3, 3), status='PRESENT')
+        calculate_payroll(3, 2025)
+        self.assertFalse(dirty_employees(3, 2025).exists())
+
+        attendance.delete()
+        self.assertEqual(list(dirty_employees(3, 2025)), [employee])
+
+        payroll = calculate_payroll(3, 2025, dirty_employees(3, 2025))
+        self.assertEqual(payroll['deleted'], 1)
+        self.assertFalse(SalaryCalculation.objects.filter(employee=employee, month=3, year=2025).exists())
+        self.assertFalse(dirty_employees(3, 2025).exists())
+
+
+class SimulationTests(TestCase):
+    """La grille vectorisée donne les déductions d'une boucle sur les mois"""
+
+    def setUp(self):
+        super().setUp()
+        rng = random.Random(4)
+        departments = [Department.objects.create(name=name) for name in ('RH', 'Ventes')]
+        self.employees = [create_employee(i, departments[i % 2], Decimal(900 + 111 * i)) for i in range(8)]
+        for employee in self.employees:
+            create_attendances(rng, [employee], date(2025, 1, 1), 90, density=rng.random())
+
+    def test_matches_month_by_month_loop(self):
+        thresholds, rates = [40, 62.5, 75, 90], [5, 15]
+        simulation = simulate_deductions(date(2025, 1, 1), date(2025, 3, 1), thresholds, rates)
+
+        months = []
+        for employee in self.employees:
+            for month in (1, 2):
+                salary = reference_salary(employee, month, 2025)
+                if salary is not None:
+                    months.append((employee, salary[1]))
+        self.assertEqual(simulation['employee_months'], len(months))
+        self.assertAlmostEqual(simulation['total_base'], float(sum(employee.base_salary for employee, _ in months)))
+
+        policies = {(policy['threshold'], policy['rate']): policy for policy in simulation['policies']}
+        self.assertEqual(len(policies), len(thresholds) * len(rates))
+        for threshold in thresholds:
+            affected = [employee for employee, percentage in months if percentage < threshold]
+            for rate in rates:
+                policy = policies[(threshold, rate)]
+                expected = sum(float(employee.base_salary) for employee in affected) * rate / 100
+                self.assertAlmostEqual(policy['total_deductions'], round(expected, 2), places=2)
+                self.assertEqual(policy['affected_months'], len(affected))
+                self.assertEqual(policy['affected_employees'], len(set(affected)))
+                self.assertAlmostEqual(sum(policy['departments'].values()), policy['total_deductions'], places=1)
+
+    def test_current_policy_matches_payroll(self):
+        simulation = simulate_deductions(date(2025, 2, 1), date(2025, 3, 1), [75], [15])
+        calculate_payroll(2, 2025)
+
+        policy, = simulation['policies']
+        self.assertTrue(policy['is_current'])
+        totals = payroll_totals(2, 2025)
+        self.assertAlmostEqual(policy['total_deductions'], float(totals['deductions']), places=2)
+        self.assertAlmostEqual(policy['total_cost'], float(totals['net_salary']), places=2)
+
+
+def create_hr(number=99):
+    hr = create_employee(number)
+    hr.role = 'HR'
+    hr.save()
+    return hr
+
+
+class CsvExportTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.sales = Department.objects.create(name='Ventes')
+        self.employees = [create_employee(1), create_employee(2, self.sales)]
+        for i, status in enumerate(['PRESENT', 'ABSENT', 'HALF_DAY', 'PRESENT']):
+            for employee in self.employees:
+                Attendance.objects.create(
+                    employee=employee, date=date(2025, 3, 3 + i), status=status, notes='Note, "citée"',
+                )
+        self.client.force_login(create_hr().user)
+
+    def export(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(content.startswith('\ufeff'))
+        return list(csv.reader(content[1:].splitlines()))
+
+    def test_attendance_export_applies_report_filters(self):
+        header, *rows = self.export(
+            'employees:export_attendance_report', department=self.sales.id, date_from='2025-03-04', date_to='2025-03-06'
+        )
+        self.assertEqual(header[:6], ['ID Employé', 'Prénom', 'Nom', 'Département', 'Date', 'Statut'])
+        self.assertEqual([row[:6] for row in rows], [
+            ['EMP002', 'Employé', '002', 'Ventes', '2025-03-06', 'Présent'],
+            ['EMP002', 'Employé', '002', 'Ventes', '2025-03-05', 'Demi-journée'],
+            ['EMP002', 'Employé', '002', 'Ventes', '2025-03-04', 'Absent'],
+        ])
+        self.assertEqual(rows[0][8], 'Note, "citée"')
+
+        header, *rows = self.export('employees:export_attendance_report', status='PRESENT')
+        self.assertEqual(sorted((row[0], row[4]) for row in rows), [
+            ('EMP001', '2025-03-03'), ('EMP001', '2025-03-06'), ('EMP002', '2025-03-03'), ('EMP002', '2025-03-06'),
+        ])
+
+    def test_salary_export_matches_payroll(self):
+        calculate_payroll(3, 2025)
+        SalaryCalculation.objects.filter(employee=self.employees[0]).update(is_paid=True)
+
+        header, *rows = self.export('employees:export_salary_report', month=3, year=2025)
+        self.assertEqual(len(header), 9)
+        self.assertEqual(rows, [
+            ['EMP001', 'Employé', '001', 'Informatique', '1000.00', '62.50', '150.00', '850.00', 'Payé'],
+            ['EMP002', 'Employé', '002', 'Ventes', '1000.00', '62.50', '150.00', '850.00', 'En attente'],
+        ])
+        self.assertEqual(self.export('employees:export_salary_report', month=4, year=2025), [header])
+
+    def test_reserved_to_hr(self):
+        self.client.force_login(self.employees[0].user)
+        for name in ('employees:export_attendance_report', 'employees:export_salary_report'):
+            response = self.client.get(reverse(name))
+            self.assertFalse(response.streaming)
+            self.assertEqual(response.status_code, 302)
+
+
+class StatsCacheTests(TestCase):
+    """Les statistiques du tableau de bord ne sont recalculées qu'après une écriture de leur groupe"""
+
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+
+    def compute(self, name):
+        def compute():
+            self.calls.append(name)
+            return len(self.calls)
+        return compute
+
+    def read(self, *names):
+        return cached_stats({name: self.compute(name) for name in names})
+
+    def test_only_invalidated_groups_are_recomputed(self):
+        self.assertEqual(self.read('a', 'b'), {'a': 1, 'b': 2})
+        self.assertEqual(self.read('a', 'b'), {'a': 1, 'b': 2})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate('a')
+            # Périmé seulement une fois la transaction validée
+            self.assertEqual(self.read('a', 'b'), {'a': 1, 'b': 2})
+        self.assertEqual(self.read('a', 'b'), {'a': 3, 'b': 2})
+        self.assertEqual(self.calls, ['a', 'b', 'a'])
+
+    def test_writes_invalidate_their_groups(self):
+        march, april = attendance_group(2025, 3), attendance_group(2025, 4)
+        groups = ['employees', 'departments', 'leaves', march, april]
+        self.read(*groups)
+
+        def recomputed(write):
+            self.calls.clear()
+            with self.captureOnCommitCallbacks(execute=True):
+                write()
+            self.read(*groups)
+            return set(self.calls)
+
+        employee = create_employee(1)
+        self.assertEqual(recomputed(lambda: Employee.objects.get(id=employee.id).save()), {'employees'})
+        self.assertEqual(recomputed(lambda: Department.objects.create(name='Ventes')), {'departments'})
+        self.assertEqual(recomputed(lambda: Attendance.objects.create(
+            employee=employee, date=date(2025, 3, 3), status='PRESENT',
+        )), {march})
+        self.assertEqual(recomputed(lambda: upsert_attendances([
+            Attendance(employee=employee, date=date(2025, 4, 1), status='ABSENT'),
+        ])), {april})
+        self.assertEqual(recomputed(lambda: employee.leave_requests.create(
+            start_date=date(2025, 5, 5), end_date=date(2025, 5, 6), reason='Congé',
+        )), {'leaves'})
+
+    def test_dashboard_reads_cached_stats(self):
+        hr = create_hr()
+        today = date.today()
+        self.client.force_login(hr.user)
+        self.client.get(reverse('employees:dashboard'))
+        with CaptureQueriesContext(connection) as cached:
+            self.client.get(reverse('employees:dashboard'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.create(employee=hr, date=today, status='PRESENT')
+        with CaptureQueriesContext(connection) as refreshed:
+            response = self.client.get(reverse('employees:dashboard'))
+        self.assertEqual(response.context['monthly_attendance_stats']['present'], 1)
+        # Seul le groupe du mois est relu
+        self.assertEqual(len(refreshed), len(cached) + 1)
+
+
+class MediaRootMixin:
+    """MEDIA_ROOT dans un répertoire temporaire propre au test"""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media = self.settings(MEDIA_ROOT=directory.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+
+class PayslipArchiveTests(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.employees = [create_employee(i) for i in range(3)]
+        for employee in self.employees:
+            Attendance.objects.create(employee=employee, date=date(2025, 3, 3), status='PRESENT')
+        calculate_payroll(3, 2025)
+        self.client.force_login(create_hr().user)
+
+    def generate(self, *args):
+        out = StringIO()
+        call_command('generate_payslips', '--month', '3', '--year', '2025', '--workers', '1', *args, stdout=out)
+        return out.getvalue()
+
+    def test_archive_follows_the_printed_values(self):
+        self.assertIsNone(payslip_archive.current_archive(3, 2025))
+        self.generate()
+
+        with zipfile.ZipFile(payslip_archive.archive_path(3, 2025)) as archive:
+            self.assertEqual(archive.namelist(), [f'payslip_EMP00{i}_2025_03.pdf' for i in range(3)])
+            self.assertTrue(all(archive.read(name).startswith(b'%PDF') for name in archive.namelist()))
+        status = payslip_archive.read_status(3, 2025)
+        self.assertEqual((status['state'], status['done'], status['total']), ('done', 3, 3))
+        payslip_archive.current_archive(3, 2025).close()
+        self.assertIn('déjà à jour', self.generate('--if-stale'))
+
+        # Un nom imprimé sur un bulletin change : l'archive est périmée
+        User.objects.filter(id=self.employees[1].user_id).update(last_name='Martin')
+        self.assertIsNone(payslip_archive.current_archive(3, 2025))
+        self.assertNotIn('déjà à jour', self.generate('--if-stale'))
+        payslip_archive.current_archive(3, 2025).close()
+
+        SalaryCalculation.objects.filter(employee=self.employees[2]).delete()
+        self.assertIsNone(payslip_archive.current_archive(3, 2025))
+
+    def test_download_serves_only_a_current_archive(self):
+        download = reverse('employees:download_payslip_archive') + '?month=3&year=2025'
+        page = reverse('employees:payslip_archive') + '?month=3&year=2025'
+        self.assertRedirects(self.client.get(download), page)
+        self.assertFalse(self.client.get(page).context['current'])
+
+        self.generate()
+        response = self.client.get(download)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="bulletins_2025_03.zip"')
+        self.assertEqual(len(zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))).namelist()), 3)
+        self.assertTrue(self.client.get(page).context['current'])
+
+    @mock.patch.object(payslip_archive.subprocess, 'Popen')
+    def test_generation_starts_once_in_the_background(self, popen):
+        page = reverse('employees:payslip_archive') + '?month=3&year=2025'
+        self.assertRedirects(self.client.post(page), page)
+        self.assertRedirects(self.client.post(page), page)
+
+        popen.assert_called_once()
+        command = popen.call_args.args[0]
+        self.assertEqual(command[2:], ['generate_payslips', '--month', '3', '--year', '2025', '--if-stale'])
+        self.assertTrue(popen.call_args.kwargs['start_new_session'])
+        response = self.client.get(page)
+        self.assertTrue(response.context['running'])
+        self.assertEqual(response.context['status']['state'], 'queued')
+
+        # Génération interrompue : l'état périmé n'empêche pas de relancer
+        with mock.patch.object(payslip_archive.time, 'time', return_value=time.time() + payslip_archive.STALE_AFTER):
+            self.assertTrue(payslip_archive.start_generation(3, 2025))
+        self.assertEqual(popen.call_count, 2)
+
+
+class PayslipCacheTests(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.employee = create_employee(1)
+        Attendance.objects.create(employee=self.employee, date=date(2025, 3, 3), status='PRESENT')
+        calculate_payroll(3, 2025)
+        self.client.force_login(self.employee.user)
+        render = mock.patch.object(payslip_cache, 'render_payslip', wraps=payslip_cache.render_payslip)
+        self.render = render.start()
+        self.addCleanup(render.stop)
+
+    def download(self):
+        response = self.client.get(reverse('employees:download_payslip', args=[2025, 3]))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        return b''.join(response.streaming_content)
+
+    def cached_files(self):
+        return sorted(path.name for path in payslip_cache.cache_dir().glob('*/*'))
+
+    def test_rendered_once_until_printed_values_change(self):
+        first = self.download()
+        self.assertEqual(self.download(), first)
+        self.assertEqual(self.render.call_count, 1)
+        self.assertEqual(len(self.cached_files()), 1)
+
+        SalaryCalculation.objects.update(net_salary=Decimal('999.00'))
+        self.assertNotEqual(self.download(), first)
+        self.assertEqual(self.render.call_count, 2)
+        # L'ancien PDF reste en cache jusqu'à son éviction, sans être servi
+        self.assertEqual(len(self.cached_files()), 2)
+
+        # Le salaire d'origine retrouve le PDF déjà rendu
+        SalaryCalculation.objects.update(net_salary=Decimal('1000.00'))
+        self.assertEqual(self.download(), first)
+        self.assertEqual(self.render.call_count, 2)
+
+    def test_evicts_least_recently_served(self):
+        directory = payslip_cache.cache_dir() / 'ab'
+        directory.mkdir(parents=True)
+        for i in range(10):
+            path = directory / f'{i}.pdf'
+            path.write_bytes(b'x' * 100)
+            os.utime(path, (1000 + i, 1000 + i))
+
+        self.assertEqual(payslip_cache.evict(1000), 0)
+        self.assertEqual(payslip_cache.evict(500), 6)
+        self.assertEqual(self.cached_files(), ['6.pdf', '7.pdf', '8.pdf', '9.pdf'])
+
+
+class EmployeeContextTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.employee = create_employee(1)
+
+    def test_loaded_once_per_request(self):
+        request = RequestFactory().get('/')
+        request.user = User.objects.get(id=self.employee.user_id)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_employee(request), self.employee)
+            self.assertEqual(get_employee_context(request), (self.employee.id, 'EMPLOYEE', self.employee.department_id))
+            self.assertEqual(request.user.employee_profile.department.name, 'Informatique')
+            get_employee(request)
+
+    def test_role_change_applies_to_the_next_request(self):
+        self.client.force_login(self.employee.user)
+        report = reverse('employees:salary_report')
+        self.assertRedirects(self.client.get(report), reverse('employees:dashboard'), fetch_redirect_response=False)
+
+        Employee.objects.filter(id=self.employee.id).update(role='HR')
+        self.assertEqual(self.client.get(report).status_code, 200)
+
+        Employee.objects.filter(id=self.employee.id).update(role='MANAGER')
+        self.assertEqual(self.client.get(report).status_code, 302)
+
+    def test_user_without_profile(self):
+        report = reverse('employees:payslips')
+        self.assertRedirects(self.client.get(report), f'/accounts/login/?next={report}', fetch_redirect_response=False)
+
+        self.client.force_login(User.objects.create_user('sans_profil'))
+        response = self.client.get(report)
+        self.assertRedirects(response, '/accounts/login/', fetch_redirect_response=False)
+        self.assertEqual(
+            [str(message) for message in response.wsgi_request._messages],
+            ["Profil employé non trouvé. Contactez l'administrateur."],
+        )
+
+
+@override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_HEADERS=True, QUERY_BUDGETS={})
+class QueryBudgetTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.employee = create_employee(1)
+        self.client.force_login(self.employee.user)
+
+    def get(self, name):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_headers_report_the_view_queries(self):
+        response, count = self.get('employees:payslips')
+        self.assertEqual(response['X-Query-Count'], str(count))
+        self.assertRegex(response['Server-Timing'], rf'^db;dur=[\d.]+;desc="{count} queries", app;dur=[\d.]+$')
+
+    def test_exceeded_budget_is_logged(self):
+        # Budget de la vue par @query_budget(8) : respecté
+        with self.assertNoLogs('employees.query_budget'):
+            self.get('employees:dashboard')
+
+        # Budgets lus au chargement du middleware : nouveau client
+        with self.settings(QUERY_BUDGETS={'employees:dashboard': 1}):
+            self.client = self.client_class()
+            self.client.force_login(self.employee.user)
+            with self.assertLogs('employees.query_budget', 'WARNING') as logs:
+                _, count = self.get('employees:dashboard')
+        report = json.loads(logs.records[0].getMessage())
+        self.assertEqual(
+            {key: report[key] for key in ('event', 'view', 'method', 'status', 'queries', 'budget')},
+            {'event': 'query_budget_exceeded', 'view': 'employees:dashboard', 'method': 'GET',
+             'status': 200, 'queries': count, 'budget': 1},
+        )
+
+    def test_repeated_queries_are_reported(self):
+        counter = QueryCounter()
+        for _ in range(3):
+            counter(lambda *args: None, 'SELECT 1', (), False, {})
+        counter(lambda *args: None, 'SELECT 2', (), False, {})
+        self.assertEqual((counter.count, counter.most_repeated()), (4, [{'sql': 'SELECT 1', 'count': 3}]))
+
+    @override_settings(QUERY_BUDGET_ENABLED=False)
+    def test_disabled(self):
+        response, _ = self.get('employees:payslips')
+        self.assertFalse(response.has_header('X-Query-Count'))
+
+
+class BenchmarkTests(MediaRootMixin, TestCase):
+
+    def test_percentile(self):
+        self.assertEqual(benchmark.percentile([4, 1, 3, 2], 0.5), 2.5)
+        self.assertEqual(benchmark.percentile([5], 0.95), 5)
+        self.assertAlmostEqual(benchmark.percentile(range(1, 101), 0.95), 95.05)
+
+    def test_runs_every_scenario(self):
+        options = {'employees': 6, 'departments': 2, 'months': 1, 'iterations': 2, 'warmup': 0, 'seed': 1}
+        report = benchmark.Command(stdout=StringIO(), stderr=StringIO()).run_benchmark(options, verbosity=0)
+
+        self.assertEqual(report['meta']['dataset']['employees'], 6)
+        self.assertEqual(set(report['results']), {
+            'dashboard_hr', 'dashboard_manager', 'dashboard_employee', 'attendance_list', 'attendance_report',
+            'salary_report', 'my_attendance', 'payroll', 'payslip_download',
+        })
+        for name, result in report['results'].items():
+            self.assertGreater(result['queries'], 0, name)
+            self.assertLessEqual(result['min_ms'], result['p50_ms'], name)
+
+    def test_project_cache_and_media_are_left_alone(self):
+        cache.set('projet', 'conservé')
+        seen = {}
+
+        def run_benchmark(command, options, verbosity):
+            seen['media'] = settings.MEDIA_ROOT
+            seen['cache'] = settings.CACHES['default']['LOCATION']
+            cache.clear()
+            return {'results': {}}
+
+        # La base de test est déjà en place
+        test_environment = mock.patch.multiple(
+            benchmark, setup_test_environment=mock.DEFAULT, teardown_test_environment=mock.DEFAULT,
+            setup_databases=mock.DEFAULT, teardown_databases=mock.DEFAULT,
+        )
+        with test_environment, mock.patch.object(benchmark.Command, 'run_benchmark', run_benchmark):
+            call_command('benchmark', stdout=StringIO())
+
+        self.assertNotEqual(seen['media'], settings.MEDIA_ROOT)
+        self.assertNotEqual(seen['cache'], settings.CACHES['default']['LOCATION'])
+        self.assertEqual(cache.get('projet'), 'conservé')
+
+
+class SyntheticDatasetTests(TestCase):
+
+    def build(self, seed=7):
+        return build_dataset(employees=12, departments=3, months=2, seed=seed, today=date(2025, 3, 12), salaries=True)
+
+    def snapshot(self):
+        return {
+            'employees': list(Employee.objects.order_by('employee_id').values_list(
+                'employee_id', 'user__username', 'role', 'department__name', 'base_salary', 'hire_date',
+            )),
+            'attendances': list(Attendance.objects.order_by('employee__employee_id', 'date').values_list(
+                'employee__employee_id', 'date', 'status', 'check_in_time', 'check_out_time',
+            )),
+            'leaves': sorted(LeaveRequest.objects.values_list(
+                'employee__employee_id', 'start_date', 'end_date', 'status',
+            )),
+            'salaries': sorted(SalaryCalculation.objects.values_list(
+                'employee__employee_id', 'month', 'year', 'net_salary',
+            )),
+        }
+
+    def test_same_seed_same_data(self):
+        dataset = self.build()
+        first = self.snapshot()
+        self.assertEqual(len(first['attendances']), dataset['attendances'])
+        self.assertEqual(len(first['salaries']), dataset['salary_calculations'])
+        # Janvier et février complets
+        self.assertEqual({(month, year) for _, month, year, _ in first['salaries']}, {(1, 2025), (2, 2025)})
+
+        self.assertGreater(delete_dataset(), 0)
+        self.assertFalse(Employee.objects.exists() or Attendance.objects.exists() or Department.objects.exists())
+
+        self.build()
+        self.assertEqual(self.snapshot(), first)
+        delete_dataset()
+        self.build(seed=8)
+        self.assertNotEqual(self.snapshot()['attendances'], first['attendances'])
+
+    def test_counted_summaries_match_rebuild(self):
+        dataset = self.build()
+        fields = ['employee_id', 'year', 'month', *COUNTER_FIELDS, *BITMAP_FIELDS]
+        counted = sorted(AttendanceMonthlySummary.objects.values_list(*fields))
+        rebuild_summaries(Employee.objects.values_list('id', flat=True))
+        self.assertEqual(sorted(AttendanceMonthlySummary.objects.values_list(*fields)), counted)
+
+        roles = role_usernames(12, 3)
+        self.assertEqual((len(roles['HR']), len(roles['MANAGER'])), (1, 2))
+        for role, username in dataset['usernames'].items():
+            self.assertEqual(Employee.objects.get(user__username=username).role, role)
+
+
+class LoadTestMixTests(SimpleTestCase):
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix(''), DEFAULT_MIX)
+        self.assertEqual(parse_mix('payslip=5, dashboard_hr'), {'payslip': 5.0, 'dashboard_hr': 1.0})
+        with self.assertRaisesMessage(ValueError, 'Scénario inconnu: export'):
+            parse_mix('export=1')
+        with self.assertRaises(ValueError):
+            parse_mix('payslip=0')
+
+    def test_summarize(self):
+        recorder = Recorder()
+        recorder.record('payslip', 1.0, 200, True)
+        recorder.active = True
+        for latency, status, ok in ((0.010, 200, True), (0.030, 200, True), (0.020, 500, False)):
+            recorder.record('payslip', latency, status, ok)
+
+        summary = summarize(recorder, 2.0, benchmark.percentile)
+        self.assertEqual(
+            {key: summary[key] for key in ('requests', 'throughput_rps', 'p50_ms', 'max_ms', 'errors', 'statuses')},
+            {'requests': 3, 'throughput_rps': 1.5, 'p50_ms': 20.0, 'max_ms': 30.0, 'errors': 1,
+             'statuses': {'200': 2, '500': 1}},
+        )
+        self.assertEqual(list(summary['scenarios']), ['payslip'])
+        self.assertEqual(summarize(Recorder(), 1.0, benchmark.percentile), {'requests': 0, 'scenarios': {}})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class LoadTestLiveServerTests(LiveServerTestCase):
+    """Le client HTTP du test de charge joue chaque scénario contre un vrai serveur"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        build_dataset(employees=6, departments=2, months=1, seed=3, password='charge123', salaries=True)
+
+    def test_every_scenario_succeeds(self):
+        previous = date.today().replace(day=1) - timedelta(days=1)
+        recorder, elapsed = asyncio.run(run_load(
+            self.server_thread.host, self.server_thread.port,
+            accounts=role_usernames(6, 2), password='charge123', mix=DEFAULT_MIX,
+            # Une requête à la fois : SQLite en mémoire verrouille les écritures concurrentes
+            concurrency=1, duration=1.5, warmup=0.2, payslip_period=(previous.year, previous.month),
+        ))
+        summary = summarize(recorder, elapsed, benchmark.percentile)
+
+        self.assertEqual(set(summary['scenarios']), set(SCENARIO_ROLES))
+        self.assertEqual(summary['errors'], 0, summary['statuses'])
+        self.assertTrue(Attendance.objects.filter(notes='Test de charge').exists())
+
+
+class ConditionalGetTests(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.employee = create_employee(1)
+        Attendance.objects.create(employee=self.employee, date=date(2025, 3, 3), status='PRESENT')
+        calculate_payroll(3, 2025)
+        self.hr = create_hr()
+        self.report = reverse('employees:salary_report') + '?month=3&year=2025'
+
+    def test_salary_report_revalidation(self):
+        self.client.force_login(self.hr.user)
+        first = self.client.get(self.report)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first['ETag'].startswith('W/"'))
+        self.assertIn('Last-Modified', first)
+        self.assertEqual(set(first['Cache-Control'].split(', ')), {'private', 'no-cache'})
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(self.report, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual((cached.status_code, cached.content), (304, b''))
+        # Validateurs seulement : ni les lignes du rapport ni leurs employés
+        self.assertFalse(any('"employees_salarycalculation"."net_salary"' in query['sql'] for query in queries))
+        self.assertEqual(self.client.get(self.report, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+
+        # Un nom affiché, puis un salaire recalculé, changent la page
+        # Comme edit_employee : l'utilisateur et la fiche employé sont enregistrés
+        self.employee.user.last_name = 'Martin'
+        self.employee.user.save()
+        Employee.objects.get(id=self.employee.id).save()
+        renamed = self.client.get(self.report, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(renamed.status_code, 200)
+        self.assertContains(renamed, 'Martin')
+
+        Attendance.objects.create(employee=self.employee, date=date(2025, 3, 4), status='ABSENT')
+        calculate_payroll(3, 2025)
+        recalculated = self.client.get(self.report, HTTP_IF_NONE_MATCH=renamed['ETag'])
+        self.assertEqual(recalculated.status_code, 200)
+        self.assertNotEqual(recalculated['ETag'], renamed['ETag'])
+
+    def test_pending_messages_are_rendered(self):
+        self.client.force_login(self.hr.user)
+        etag = self.client.get(self.report)['ETag']
+        # Le calcul des salaires laisse un message flash avant la redirection
+        self.client.post(reverse('attendance:calculate_monthly_salary'), {'month': 3, 'year': 2025})
+
+        response = self.client.get(self.report, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Salaires calculés pour 1 employés.')
+        self.assertFalse(response.has_header('ETag'))
+        # Messages affichés : la page suivante porte de nouveau ses validateurs
+        etag = self.client.get(self.report)['ETag']
+        self.assertEqual(self.client.get(self.report, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_payslip_strong_etag(self):
+        self.client.force_login(self.employee.user)
+        url = reverse('employees:download_payslip', args=[2025, 3])
+        first = self.client.get(url)
+        self.assertFalse(first['ETag'].startswith('W/'))
+        b''.join(first.streaming_content)
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        SalaryCalculation.objects.update(net_salary=Decimal('900.00'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+
+class AsyncDashboardTests(TransactionTestCase):
+    """
+    Le tableau de bord asynchrone construit le même contexte que la vue
+    synchrone. TransactionTestCase : les requêtes de run_query passent par
+    les connexions d'autres threads, qui ne voient pas une transaction de test.
+    """
+
+    def setUp(self):
+        super().setUp()
+        rng = random.Random(21)
+        it = Department.objects.create(name='Informatique')
+        sales = Department.objects.create(name='Ventes')
+        self.hr = create_hr()
+        self.manager = create_employee(1, sales)
+        Employee.objects.filter(id=self.manager.id).update(role='MANAGER')
+        self.manager.refresh_from_db()
+        self.employee = create_employee(2, sales)
+        employees = [self.hr, self.manager, self.employee, create_employee(3, it)]
+        today = date.today()
+        # Jours du mois courant jusqu'à aujourd'hui, et quelques jours du mois précédent
+        create_attendances(rng, employees, today.replace(day=1), today.day)
+        create_attendances(rng, employees, today.replace(day=1) - timedelta(days=5), 5)
+        self.employee.leave_requests.create(start_date=today, end_date=today, reason='Congé')
+        SalaryCalculation.objects.create(
+            employee=self.employee, month=today.month, year=today.year, base_salary=Decimal('1000.00'),
+            attendance_percentage=Decimal('80.00'), net_salary=Decimal('1000.00'),
+        )
+
+    def context(self, view, employee, factory):
+        """Contexte passé au template par `view`, les querysets évalués"""
+        request = factory.get('/')
+        request.user = employee.user
+        request.employee = get_employee(request)
+        with mock.patch('employees.views.render', return_value=HttpResponse()) as render:
+            if asyncio.iscoroutinefunction(view):
+                async_to_sync(view)(request)
+            else:
+                view(request)
+        (_, template, context), _ = render.call_args
+        return template, {
+            key: list(value) if isinstance(value, QuerySet) else value for key, value in context.items()
+        }
+
+    def test_same_context_as_the_sync_dashboard(self):
+        for employee in (self.hr, self.manager, self.employee):
+            with self.subTest(role=employee.role):
+                cache.clear()
+                expected = self.context(views.dashboard, employee, RequestFactory())
+                cache.clear()
+                self.assertEqual(self.context(views.adashboard, employee, AsyncRequestFactory()), expected)
+
+    def test_stale_groups_are_recomputed_concurrently(self):
+        running = []
+        peak = []
+
+        def compute(value):
+            async def compute():
+                running.append(value)
+                peak.append(len(running))
+                await asyncio.sleep(0.01)
+                running.remove(value)
+                return value
+            return compute
+
+        groups = {'a': compute(1), 'b': compute(2), 'c': compute(3)}
+        self.assertEqual(async_to_sync(acached_stats)(groups), {'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(max(peak), 3)
+
+        peak.clear()
+        invalidate('b')
+        self.assertEqual(async_to_sync(acached_stats)({**groups, 'b': compute(4)}), {'a': 1, 'b': 4, 'c': 3})
+        self.assertEqual(peak, [1])
+        # Même cache que la version synchrone
+        self.assertEqual(cached_stats({name: None for name in groups}), {'a': 1, 'b': 4, 'c': 3})
+
+    @override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_HEADERS=True, QUERY_BUDGETS={})
+    def test_query_budget_counts_run_query_threads(self):
+        threads = set()
+
+        def query(queryset):
+            threads.add(threading.get_ident())
+            return list(queryset)
+
+        async def view(request):
+            await asyncio.gather(
+                run_query(query, Employee.objects.all()),
+                run_query(query, Department.objects.all()),
+                run_query(query, Attendance.objects.all()[:5]),
+            )
+            return HttpResponse()
+
+        request = AsyncRequestFactory().get('/')
+        request.resolver_match = resolve(reverse('employees:dashboard'))
+        response = async_to_sync(QueryBudgetMiddleware(view))(request)
+        self.assertNotIn(threading.get_ident(), threads)
+        self.assertEqual(response['X-Query-Count'], '3')
+
+
+def thread_pool(max_workers, mp_context=None, initializer=None):
+    """
+    Pool d'un thread à la place du pool de processus : les processus fils
+    ne voient pas la base de test en mémoire, et SQLite y verrouille une
+    table écrite par deux connexions à la fois
+    """
+    return ThreadPoolExecutor(max_workers=1)
+
+
+@mock.patch.object(payroll_module, 'ProcessPoolExecutor', thread_pool)
+class ShardedPayrollTests(TransactionTestCase):
+    """Les shards calculés en parallèle donnent la paie du calcul en une passe"""
+
+    def setUp(self):
+        super().setUp()
+        rng = random.Random(3)
+        departments = [Department.objects.create(name=name) for name in ('RH', 'Ventes', 'Support')]
+        self.employees = [create_employee(i, rng.choice(departments), Decimal(1000 + 50 * i)) for i in range(15)]
+        Employee.objects.filter(id=self.employees[4].id).update(is_active=False)
+        create_attendances(rng, self.employees[:-2], date(2025, 3, 1), 31, density=0.9)
+
+    def test_shards_partition_active_employees(self):
+        active = set(Employee.objects.filter(is_active=True).values_list('id', flat=True))
+        for strategy in ('department', 'id-range'):
+            with self.subTest(strategy=strategy):
+                ids = [pk for key in build_shards(strategy, 2) for pk in shard_queryset(key).values_list('id', flat=True)]
+                self.assertEqual(sorted(ids), sorted(active))
+        with self.assertRaises(ValueError):
+            shard_queryset('id:abc')
+
+    def test_matches_unsharded_payroll(self):
+        expected = calculate_payroll(3, 2025)
+        salaries = stored_salaries(3, 2025)
+        for strategy in ('department', 'id-range'):
+            with self.subTest(strategy=strategy):
+                SalaryCalculation.objects.all().delete()
+                merged, failed = run_sharded_payroll(3, 2025, build_shards(strategy, 2), workers=2)
+                self.assertEqual(failed, {})
+                self.assertEqual(stored_salaries(3, 2025), salaries)
+                self.assertEqual(merged['results'], expected['results'])
+                self.assertEqual(merged['skipped'], expected['skipped'])
+                self.assertEqual(merged['created'], expected['created'])
+
+    def test_failed_shard_is_retried_alone(self):
+        keys = build_shards('id-range', 2)
+        calls = []
+
+        def flaky_shard(key, month, year, batch_size):
+            calls.append(key)
+            if key == keys[0] and calls.count(key) == 1:
+                raise RuntimeError('processus interrompu')
+            return payroll_module.calculate_payroll(month, year, shard_queryset(key), batch_size)
+
+        failures = []
+        with mock.patch.object(payroll_module, 'run_shard', flaky_shard):
+            merged, failed = run_sharded_payroll(
+                3, 2025, keys, workers=2, retries=1, on_failure=lambda key, error, attempt: failures.append((key, attempt))
+            )
+
+        self.assertEqual(failed, {})
+        self.assertEqual(failures, [(keys[0], 0)])
+        self.assertEqual(sorted(calls), sorted(keys + [keys[0]]))
+        self.assertEqual(merged['calculated'], SalaryCalculation.objects.count())
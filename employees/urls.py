@@ -1,15 +1,21 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = 'employees'
 
 urlpatterns = [
-    path('', views.dashboard, name='dashboard'),
+    path('', views.adashboard if settings.ASYNC_DASHBOARD else views.dashboard, name='dashboard'),
     path('profile/', views.profile, name='profile'),
     path('payslips/', views.payslips, name='payslips'),
     path('payslips/<int:year>/<int:month>/', views.download_payslip, name='download_payslip'),
     path('reports/attendance/', views.attendance_report, name='attendance_report'),
+    path('reports/attendance/export/', views.export_attendance_report, name='export_attendance_report'),
     path('reports/salary/', views.salary_report, name='salary_report'),
+    path('reports/salary/export/', views.export_salary_report, name='export_salary_report'),
+    path('reports/salary/payslips/', views.download_payslip_archive, name='download_payslip_archive'),
+    path('reports/salary/payslips/archive/', views.payslip_archive, name='payslip_archive'),
+    path('reports/simulation/', views.payroll_simulation, name='payroll_simulation'),
     path('manage/employees/', views.manage_employees, name='manage_employees'),
     path('manage/departments/', views.manage_departments, name='manage_departments'),
     path('add/', views.add_employee, name='add_employee'),
@@ -1,13 +1,17 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
-from django.db.models import Q, Count, Avg
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.db.models import Q, Count, Avg, Prefetch
+from django.urls import reverse
 from django.utils import timezone
 from datetime import datetime, date, timedelta
 from decimal import Decimal
+import asyncio
 import calendar
+import csv
+import heapq
 # from reportlab.pdfgen import canvas
 # from reportlab.lib.pagesizes import letter
 # from reportlab.lib import colors
@@ -15,22 +19,102 @@ import calendar
 # from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 # from reportlab.lib.units import inch
 from io import BytesIO
+from operator import attrgetter, itemgetter
 
 from .models import Employee, Department, SalaryCalculation
-from attendance.models import Attendance, LeaveRequest
-from .views_payslip import profile, payslips, download_payslip, get_monthly_attendance_stats, get_department_stats
+from attendance.models import Attendance, AttendanceMonthlySummary, LeaveRequest
+from attendance.archive import attendance_sources
+from attendance.periods import month_filter, month_start, next_month, parse_day
+from .views_payslip import (
+    profile, payslips, download_payslip, get_monthly_attendance_stats, get_department_stats,
+    aget_monthly_attendance_stats, aget_department_stats,
+)
+from .async_queries import run_query
+from .conditional import conditional_response, page_validators, salary_rows_state
+from .decorators import query_budget, role_required
 from .forms import *
+from .payslip_archive import archive_path, current_archive, is_running, read_status, start_generation
+from .stats_cache import acached_stats, attendance_group, cached_stats
+from .simulation import DEFAULT_RATES, DEFAULT_THRESHOLDS, parse_values, simulate_deductions
 
 
+# Nombre de lignes lues par aller-retour lors des exports CSV
+EXPORT_CHUNK_SIZE = 2000
 
-@login_required
+
+class Echo:
+    """Pseudo-fichier : csv.writer renvoie chaque ligne au lieu de la stocker"""
+    
+    def write(self, value):
+        return value
+
+
+def stream_csv(filename, header, rows):
+    """Réponse CSV écrite ligne par ligne, à mémoire constante"""
+    writer = csv.writer(Echo())
+    
+    def generate():
+        # BOM UTF-8 pour qu'Excel reconnaisse les accents
+        yield '\ufeff' + writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+    
+    response = StreamingHttpResponse(generate(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def filter_attendance_report(params):
+    """
+    Applique les filtres du rapport de présences ; retourne (querysets,
+    filtres) : la table vive et les archives des années de la période,
+    chacun trié par date décroissante
+    """
+    department_filter = params.get('department')
+    status_filter = params.get('status')
+    date_from = params.get('date_from')
+    date_to = params.get('date_to')
+    
+    conditions = Q()
+    if department_filter:
+        conditions &= Q(employee__department_id=department_filter)
+    if status_filter:
+        conditions &= Q(status=status_filter)
+    
+    attendances = [
+        source.filter(conditions).order_by('-date')
+        for source in attendance_sources(parse_day(date_from), parse_day(date_to))
+    ]
+    return attendances, {
+        'department': department_filter,
+        'status': status_filter,
+        'date_from': date_from,
+        'date_to': date_to,
+    }
+
+
+def salary_report_period(params):
+    """(mois, année) demandés pour le rapport de salaires, mois courant par défaut"""
+    month = params.get('month', datetime.now().month)
+    year = params.get('year', datetime.now().year)
+    
+    try:
+        month = int(month)
+        year = int(year)
+    except (ValueError, TypeError):
+        month = datetime.now().month
+        year = datetime.now().year
+    if not 1 <= month <= 12:
+        month = datetime.now().month
+    return month, year
+
+
+
+@query_budget(8)
+@role_required()
 def dashboard(request):
     """Tableau de bord principal adapté au rôle de l'utilisateur"""
-    try:
-        employee = request.user.employee_profile
-    except Employee.DoesNotExist:
-        messages.error(request, "Profil employé non trouvé. Contactez l'administrateur.")
-        return redirect('login')
+    employee = request.employee
     
     context = {
         'employee': employee,
@@ -40,25 +124,32 @@ def dashboard(request):
     
     if employee.role == 'HR':
         # Vue HR/Admin - Accès complet
+        month_group = attendance_group(context['current_year'], context['current_month'])
+        stats = cached_stats({
+            'employees': Employee.objects.filter(is_active=True).count,
+            'departments': Department.objects.count,
+            'leaves': LeaveRequest.objects.filter(status='PENDING').count,
+            month_group: lambda: get_monthly_attendance_stats(context['current_year'], context['current_month']),
+        })
         context.update({
-            'total_employees': Employee.objects.filter(is_active=True).count(),
-            'total_departments': Department.objects.count(),
-            'recent_attendances': Attendance.objects.select_related('employee__user').order_by('-date')[:10],
-            'pending_leaves': LeaveRequest.objects.filter(status='PENDING').count(),
-            'monthly_attendance_stats': get_monthly_attendance_stats(),
+            'total_employees': stats['employees'],
+            'total_departments': stats['departments'],
+            'recent_attendances': Attendance.objects.select_related('employee__user', 'employee__department').order_by('-date')[:10],
+            'pending_leaves': stats['leaves'],
+            'monthly_attendance_stats': stats[month_group],
         })
         return render(request, 'employees/dashboard_hr.html', context)
     
     elif employee.role == 'MANAGER':
         # Vue Manager - Département uniquement
-        department_employees = Employee.objects.filter(
+        department_employees = Employee.objects.select_related('user').filter(
             department=employee.department, 
             is_active=True
         ).exclude(id=employee.id)
         
         context.update({
             'department_employees': department_employees,
-            'department_attendances': Attendance.objects.filter(
+            'department_attendances': Attendance.objects.select_related('employee__user').filter(
                 employee__department=employee.department
             ).order_by('-date')[:10],
             'department_stats': get_department_stats(employee.department),
@@ -73,26 +164,22 @@ def dashboard(request):
         # Statistiques personnelles
         my_attendances = Attendance.objects.filter(
             employee=employee,
-            date__year=current_year,
-            date__month=current_month
+            **month_filter(current_year, current_month)
         )
-        
-        present_days = my_attendances.filter(status='PRESENT').count()
-        half_days = my_attendances.filter(status='HALF_DAY').count()
-        absent_days = my_attendances.filter(status='ABSENT').count()
-        leave_days = my_attendances.filter(status='LEAVE').count()
-        
-        total_working_days = present_days + half_days + absent_days + leave_days
-        attendance_percentage = (present_days + (half_days * 0.5)) / total_working_days * 100 if total_working_days > 0 else 0
+        summary = AttendanceMonthlySummary.objects.filter(
+            employee=employee,
+            year=current_year,
+            month=current_month
+        ).first() or AttendanceMonthlySummary()
         
         context.update({
             'my_attendances': my_attendances.order_by('-date')[:10],
             'attendance_stats': {
-                'present': present_days,
-                'half_day': half_days,
-                'absent': absent_days,
-                'leave': leave_days,
-                'percentage': round(attendance_percentage, 2),
+                'present': summary.present,
+                'half_day': summary.half_day,
+                'absent': summary.absent,
+                'leave': summary.leave,
+                'percentage': summary.attendance_percentage,
             },
             'recent_payslips': SalaryCalculation.objects.filter(
                 employee=employee
@@ -101,113 +188,279 @@ def dashboard(request):
         return render(request, 'employees/dashboard_employee.html', context)
 
 
-@login_required
-def attendance_report(request):
-    """Rapport de présences (HR/Admin uniquement)"""
-    try:
-        employee = request.user.employee_profile
-    except Employee.DoesNotExist:
-        messages.error(request, "Profil employé non trouvé.")
-        return redirect('login')
+@query_budget(8)
+@role_required()
+async def adashboard(request):
+    """
+    Tableau de bord asynchrone (profil ASGI) : mêmes pages que dashboard,
+    mais les requêtes indépendantes de chaque rôle sont lancées en parallèle.
+    """
+    employee = request.employee
+    now = datetime.now()
     
-    if employee.role != 'HR':
-        messages.error(request, "Accès non autorisé.")
-        return redirect('employees:dashboard')
+    context = {
+        'employee': employee,
+        'current_month': now.month,
+        'current_year': now.year,
+    }
     
-    attendances = Attendance.objects.select_related('employee__user', 'employee__department').order_by('-date')
+    if employee.role == 'HR':
+        month_group = attendance_group(now.year, now.month)
+        stats, recent_attendances = await asyncio.gather(
+            acached_stats({
+                'employees': lambda: run_query(Employee.objects.filter(is_active=True).count),
+                'departments': lambda: run_query(Department.objects.count),
+                'leaves': lambda: run_query(LeaveRequest.objects.filter(status='PENDING').count),
+                month_group: lambda: aget_monthly_attendance_stats(now.year, now.month),
+            }),
+            run_query(list, Attendance.objects.select_related(
+                'employee__user', 'employee__department'
+            ).order_by('-date')[:10]),
+        )
+        context.update({
+            'total_employees': stats['employees'],
+            'total_departments': stats['departments'],
+            'recent_attendances': recent_attendances,
+            'pending_leaves': stats['leaves'],
+            'monthly_attendance_stats': stats[month_group],
+        })
+        template = 'employees/dashboard_hr.html'
     
-    # Filtres
-    department_filter = request.GET.get('department')
-    status_filter = request.GET.get('status')
-    date_from = request.GET.get('date_from')
-    date_to = request.GET.get('date_to')
+    elif employee.role == 'MANAGER':
+        department_employees, department_attendances, department_stats = await asyncio.gather(
+            run_query(list, Employee.objects.select_related('user').filter(
+                department=employee.department,
+                is_active=True
+            ).exclude(id=employee.id)),
+            run_query(list, Attendance.objects.select_related('employee__user').filter(
+                employee__department=employee.department
+            ).order_by('-date')[:10]),
+            aget_department_stats(employee.department),
+        )
+        context.update({
+            'department_employees': department_employees,
+            'department_attendances': department_attendances,
+            'department_stats': department_stats,
+        })
+        template = 'employees/dashboard_manager.html'
     
-    if department_filter:
-        attendances = attendances.filter(employee__department_id=department_filter)
-    if status_filter:
-        attendances = attendances.filter(status=status_filter)
-    if date_from:
-        attendances = attendances.filter(date__gte=date_from)
-    if date_to:
-        attendances = attendances.filter(date__lte=date_to)
+    else:
+        my_attendances, summary, recent_payslips = await asyncio.gather(
+            run_query(list, Attendance.objects.filter(
+                employee=employee,
+                **month_filter(now.year, now.month)
+            ).order_by('-date')[:10]),
+            run_query(AttendanceMonthlySummary.objects.filter(
+                employee=employee,
+                year=now.year,
+                month=now.month
+            ).first),
+            run_query(list, SalaryCalculation.objects.filter(
+                employee=employee
+            ).order_by('-year', '-month')[:5]),
+        )
+        summary = summary or AttendanceMonthlySummary()
+        context.update({
+            'my_attendances': my_attendances,
+            'attendance_stats': {
+                'present': summary.present,
+                'half_day': summary.half_day,
+                'absent': summary.absent,
+                'leave': summary.leave,
+                'percentage': summary.attendance_percentage,
+            },
+            'recent_payslips': recent_payslips,
+        })
+        template = 'employees/dashboard_employee.html'
+    
+    # Le rendu peut encore accéder à la session ou à des relations
+    return await sync_to_async(render)(request, template, context)
+
+
+@role_required('HR')
+def attendance_report(request):
+    """Rapport de présences (HR/Admin uniquement)"""
+    attendances, filters = filter_attendance_report(request.GET)
     
     context = {
-        'attendances': attendances,
+        'attendances': list(heapq.merge(
+            *(source.select_related('employee__user', 'employee__department') for source in attendances),
+            key=attrgetter('date'),
+            reverse=True,
+        )),
         'departments': Department.objects.all(),
         'status_choices': Attendance.STATUS_CHOICES,
-        'filters': {
-            'department': department_filter,
-            'status': status_filter,
-            'date_from': date_from,
-            'date_to': date_to,
-        }
+        'filters': filters,
     }
     
     return render(request, 'employees/attendance_report.html', context)
 
 
-@login_required
+@role_required('HR')
+def export_attendance_report(request):
+    """Export CSV en flux du rapport de présences (HR/Admin uniquement)"""
+    attendances, filters = filter_attendance_report(request.GET)
+    status_labels = dict(Attendance.STATUS_CHOICES)
+    rows = heapq.merge(
+        *(source.values_list(
+            'employee__employee_id', 'employee__user__first_name', 'employee__user__last_name',
+            'employee__department__name', 'date', 'status', 'check_in_time', 'check_out_time', 'notes',
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE) for source in attendances),
+        key=itemgetter(4),
+        reverse=True,
+    )
+    
+    header = ['ID Employé', 'Prénom', 'Nom', 'Département', 'Date', 'Statut', 'Arrivée', 'Départ', 'Notes']
+    lines = (
+        [employee_id, first_name, last_name, department, day.isoformat(), status_labels.get(status, status),
+         check_in or '', check_out or '', notes]
+        for employee_id, first_name, last_name, department, day, status, check_in, check_out, notes in rows
+    )
+    return stream_csv('rapport_presences.csv', header, lines)
+
+
+@role_required('HR')
 def salary_report(request):
     """Rapport de salaires (HR/Admin uniquement)"""
-    try:
-        employee = request.user.employee_profile
-    except Employee.DoesNotExist:
-        messages.error(request, "Profil employé non trouvé.")
-        return redirect('login')
-    
-    if employee.role != 'HR':
-        messages.error(request, "Accès non autorisé.")
-        return redirect('employees:dashboard')
-    
     # Filtrage par mois/année
-    month = request.GET.get('month', datetime.now().month)
-    year = request.GET.get('year', datetime.now().year)
+    month, year = salary_report_period(request.GET)
     
-    try:
-        month = int(month)
-        year = int(year)
-    except (ValueError, TypeError):
-        month = datetime.now().month
-        year = datetime.now().year
+    month_calculations = SalaryCalculation.objects.filter(month=month, year=year)
+    available_years = list(SalaryCalculation.objects.values_list('year', flat=True).distinct().order_by('-year'))
+    etag, last_modified = page_validators(request, salary_rows_state(month_calculations), available_years)
+    
+    def render_page():
+        salary_calculations = month_calculations.select_related(
+            'employee__user', 'employee__department'
+        ).order_by('employee__user__last_name')
+        
+        total_base_salary = sum(sc.base_salary for sc in salary_calculations)
+        total_deductions = sum(sc.deduction_amount for sc in salary_calculations)
+        total_net_salary = sum(sc.net_salary for sc in salary_calculations)
+        
+        context = {
+            'salary_calculations': salary_calculations,
+            'month': month,
+            'year': year,
+            'month_name': calendar.month_name[month],
+            'totals': {
+                'base_salary': total_base_salary,
+                'deductions': total_deductions,
+                'net_salary': total_net_salary,
+            },
+            'available_years': available_years,
+        }
+        return render(request, 'employees/salary_report.html', context)
     
-    salary_calculations = SalaryCalculation.objects.filter(
+    return conditional_response(request, etag, last_modified, render_page)
+
+
+@role_required('HR')
+def export_salary_report(request):
+    """Export CSV en flux du rapport de salaires (HR/Admin uniquement)"""
+    month, year = salary_report_period(request.GET)
+    rows = SalaryCalculation.objects.filter(
         month=month,
         year=year
-    ).select_related('employee__user', 'employee__department').order_by('employee__user__last_name')
+    ).order_by('employee__user__last_name').values_list(
+        'employee__employee_id', 'employee__user__first_name', 'employee__user__last_name',
+        'employee__department__name', 'base_salary', 'attendance_percentage',
+        'deduction_amount', 'net_salary', 'is_paid',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
     
-    total_base_salary = sum(sc.base_salary for sc in salary_calculations)
-    total_deductions = sum(sc.deduction_amount for sc in salary_calculations)
-    total_net_salary = sum(sc.net_salary for sc in salary_calculations)
+    header = ['ID Employé', 'Prénom', 'Nom', 'Département', 'Salaire de Base',
+              'Taux de Présence', 'Déduction', 'Salaire Net', 'Statut']
+    lines = (
+        list(row[:-1]) + ['Payé' if row[-1] else 'En attente']
+        for row in rows
+    )
+    return stream_csv(f'rapport_salaires_{year}_{month:02d}.csv', header, lines)
+
+
+@role_required('HR')
+def download_payslip_archive(request):
+    """Archive ZIP de tous les bulletins de paie du mois (HR/Admin uniquement)"""
+    month, year = salary_report_period(request.GET)
+    if not SalaryCalculation.objects.filter(month=month, year=year).exists():
+        messages.error(request, f"Aucun salaire calculé pour {month}/{year}.")
+        return redirect(f"{reverse('employees:salary_report')}?month={month}&year={year}")
     
+    # L'archive n'est jamais générée dans la requête ; le fichier ouvert est
+    # celui dont l'empreinte est vérifiée. Périmée : page de génération
+    file = current_archive(month, year)
+    if file is None:
+        return redirect(f"{reverse('employees:payslip_archive')}?month={month}&year={year}")
+    return FileResponse(file, as_attachment=True, filename=archive_path(month, year).name)
+
+
+@role_required('HR')
+def payslip_archive(request):
+    """Génération en arrière-plan et suivi de l'archive des bulletins du mois (HR/Admin uniquement)"""
+    month, year = salary_report_period(request.GET)
+    url = f"{reverse('employees:payslip_archive')}?month={month}&year={year}"
+    
+    if request.method == 'POST':
+        if not SalaryCalculation.objects.filter(month=month, year=year).exists():
+            messages.error(request, f"Aucun salaire calculé pour {month}/{year}.")
+        elif start_generation(month, year):
+            messages.success(request, f"Génération des bulletins de {month}/{year} lancée.")
+        else:
+            messages.info(request, f"Une génération des bulletins de {month}/{year} est déjà en cours.")
+        return redirect(url)
+    
+    file = current_archive(month, year)
+    if file is not None:
+        file.close()
+    status = read_status(month, year)
     context = {
-        'salary_calculations': salary_calculations,
         'month': month,
         'year': year,
         'month_name': calendar.month_name[month],
-        'totals': {
-            'base_salary': total_base_salary,
-            'deductions': total_deductions,
-            'net_salary': total_net_salary,
-        },
-        'available_years': SalaryCalculation.objects.values_list('year', flat=True).distinct().order_by('-year'),
+        'current': file is not None,
+        'running': is_running(status),
+        'status': status,
+        'progress': round(100 * status['done'] / status['total']) if status and status['total'] else 0,
     }
-    
-    return render(request, 'employees/salary_report.html', context)
+    return render(request, 'employees/payslip_archive.html', context)
 
 
-@login_required
-def manage_employees(request):
-    """Gestion des employés (HR/Admin uniquement)"""
+@role_required('HR')
+def payroll_simulation(request):
+    """Simulation de règles de déduction sur l'historique (HR/Admin uniquement)"""
+    # Par défaut : les 36 derniers mois complets
+    end = timezone.now().date().replace(day=1)
+    filters = {
+        'start': request.GET.get('start') or f"{end.year - 3}-{end.month:02d}",
+        'end': request.GET.get('end') or f"{(end - timedelta(days=1)):%Y-%m}",
+        'thresholds': request.GET.get('thresholds') or ','.join(map(str, DEFAULT_THRESHOLDS)),
+        'rates': request.GET.get('rates') or ','.join(map(str, DEFAULT_RATES)),
+    }
+    
+    simulation = None
     try:
-        employee = request.user.employee_profile
-    except Employee.DoesNotExist:
-        messages.error(request, "Profil employé non trouvé.")
-        return redirect('login')
+        simulation = simulate_deductions(
+            month_start(filters['start']),
+            next_month(month_start(filters['end'])),
+            parse_values(filters['thresholds'], DEFAULT_THRESHOLDS),
+            parse_values(filters['rates'], DEFAULT_RATES),
+        )
+    except ValueError:
+        messages.error(request, "Paramètres de simulation invalides.")
     
-    if employee.role != 'HR':
-        messages.error(request, "Accès non autorisé.")
-        return redirect('employees:dashboard')
+    if simulation and request.GET.get('format') == 'json':
+        return JsonResponse(simulation)
     
+    context = {
+        'simulation': simulation,
+        'filters': filters,
+    }
+    
+    return render(request, 'employees/payroll_simulation.html', context)
+
+
+@role_required('HR')
+def manage_employees(request):
+    """Gestion des employés (HR/Admin uniquement)"""
     employees = Employee.objects.select_related('user', 'department').filter(is_active=True).order_by('user__last_name')
     
     # Filtrage par département
@@ -226,7 +479,7 @@ def manage_employees(request):
 
     return render(request, 'employees/manage_employees.html', context)
 
-@login_required
+@role_required('HR')
 def add_employee(request):
     """Créer un nouvel employé"""
     if request.method == "POST":
@@ -250,7 +503,7 @@ def add_employee(request):
     })
 
 
-@login_required
+@role_required('HR')
 def edit_employee(request, employee_id):
     """Modifier un employé existant"""
     employee = get_object_or_404(Employee, id=employee_id)
@@ -275,7 +528,7 @@ def edit_employee(request, employee_id):
     })
 
 
-@login_required
+@role_required('HR')
 def delete_employee(request, employee_id):
     """Supprimer un employé"""
     employee = get_object_or_404(Employee, id=employee_id)
@@ -290,21 +543,13 @@ def delete_employee(request, employee_id):
     return redirect('employees:manage_employees')
 
 # gestion de departement 
-@login_required
+@role_required('HR')
 def manage_departments(request):
     """Gestion des départements (HR/Admin uniquement)"""
-    try:
-        employee = request.user.employee_profile
-    except Employee.DoesNotExist:
-        messages.error(request, "Profil employé non trouvé.")
-        return redirect('login')
-    
-    if employee.role != 'HR':
-        messages.error(request, "Accès non autorisé.")
-        return redirect('employees:dashboard')
-    
     departments = Department.objects.annotate(
         employee_count=Count('employees', filter=Q(employees__is_active=True))
+    ).prefetch_related(
+        Prefetch('employees', queryset=Employee.objects.select_related('user'))
     ).order_by('name')
     
     if request.method == 'POST':
@@ -7,17 +7,11 @@ from django.db.models import Q, Count, Avg
 from django.utils import timezone
 from datetime import datetime, date, timedelta
 from decimal import Decimal
-import calendar
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.units import inch
-from io import BytesIO
 
 from .models import Employee, Department, SalaryCalculation
+from .payslip_pdf import PAYSLIP_FIELDS, render_payslip
 from attendance.models import Attendance, LeaveRequest
+from attendance.periods import month_filter
 
 
 @login_required
@@ -83,84 +77,20 @@ def download_payslip(request, year, month):
         messages.error(request, "Profil employé non trouvé.")
         return redirect('login')
     
-    try:
-        payslip = SalaryCalculation.objects.get(
-            employee=employee,
-            year=year,
-            month=month
-        )
-    except SalaryCalculation.DoesNotExist:
+    payslip = SalaryCalculation.objects.filter(
+        employee=employee,
+        year=year,
+        month=month
+    ).values(*PAYSLIP_FIELDS).first()
+    if payslip is None:
         messages.error(request, "Bulletin de paie non trouvé.")
         return redirect('employees:payslips')
     
     # Génération du PDF
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-    
-    # Contenu du PDF
-    story = []
-    
-    # En-tête
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=1,  # Centré
-    )
-    
-    story.append(Paragraph("BULLETIN DE PAIE", title_style))
-    story.append(Spacer(1, 20))
-    
-    # Informations employé
-    employee_info = [
-        ['Nom:', f"{employee.user.first_name} {employee.user.last_name}"],
-        ['ID Employé:', employee.employee_id],
-        ['Département:', employee.department.name],
-        ['Période:', f"{calendar.month_name[month]} {year}"],
-    ]
-    
-    employee_table = Table(employee_info, colWidths=[2*inch, 3*inch])
-    employee_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-    ]))
+    filename, content, _ = render_payslip(payslip)
     
-    story.append(employee_table)
-    story.append(Spacer(1, 20))
-    
-    # Détails du salaire
-    salary_data = [
-        ['Description', 'Montant'],
-        ['Salaire de base', f"${payslip.base_salary:,.2f}"],
-        ['Pourcentage de présence', f"{payslip.attendance_percentage}%"],
-        ['Déduction (si < 75%)', f"${payslip.deduction_amount:,.2f}"],
-        ['', ''],
-        ['SALAIRE NET', f"${payslip.net_salary:,.2f}"],
-    ]
-    
-    salary_table = Table(salary_data, colWidths=[3*inch, 2*inch])
-    salary_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('LINEBELOW', (0, -2), (-1, -2), 1, colors.black),
-        ('LINEBELOW', (0, -1), (-1, -1), 2, colors.black),
-    ]))
-    
-    story.append(salary_table)
-    
-    doc.build(story)
-    buffer.seek(0)
-    
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="payslip_{employee.employee_id}_{year}_{month:02d}.pdf"'
+    response = HttpResponse(content, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
     
     return response
 
@@ -170,10 +100,7 @@ def get_monthly_attendance_stats():
     current_month = datetime.now().month
     current_year = datetime.now().year
     
-    attendances = Attendance.objects.filter(
-        date__year=current_year,
-        date__month=current_month
-    )
+    attendances = Attendance.objects.filter(**month_filter(current_year, current_month))
     
     total_days = attendances.count()
     present_days = attendances.filter(status='PRESENT').count()
@@ -199,8 +126,7 @@ def get_department_stats(department):
     department_employees = Employee.objects.filter(department=department, is_active=True)
     attendances = Attendance.objects.filter(
         employee__department=department,
-        date__year=current_year,
-        date__month=current_month
+        **month_filter(current_year, current_month)
     )
     
     return {
@@ -2,28 +2,30 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
-from django.db.models import Q, Count, Avg
+from django.http import FileResponse, JsonResponse
+from django.db.models import Q, Count, Avg, Sum
 from django.utils import timezone
+from django.utils.http import quote_etag
 from datetime import datetime, date, timedelta
 from decimal import Decimal
-import calendar
+import asyncio
 from io import BytesIO
 
+from .async_queries import run_query
+from .conditional import conditional_response, page_validators, salary_rows_state
+from .decorators import role_required
 from .models import Employee, Department, SalaryCalculation
-from attendance.models import Attendance, LeaveRequest
+from attendance.models import AttendanceMonthlySummary, LeaveRequest
+from .payslip_cache import cached_payslip, payslip_digest
+from .payslip_pdf import PAYSLIP_FIELDS, payslip_filename
 
 @login_required
 def add_employe(request):
     """ Ajout d'un employe """
-@login_required
+@role_required()
 def profile(request):
     """Profil de l'employé"""
-    try:
-        employee = request.user.employee_profile
-    except Employee.DoesNotExist:
-        messages.error(request, "Profil employé non trouvé.")
-        return redirect('login')
+    employee = request.employee
     
     if request.method == 'POST':
         # Mise à jour du profil
@@ -43,94 +45,83 @@ def profile(request):
     return render(request, 'employees/profile.html', {'employee': employee})
 
 
-@login_required
+@role_required()
 def payslips(request):
     """Liste des bulletins de paie de l'employé"""
-    try:
-        employee = request.user.employee_profile
-    except Employee.DoesNotExist:
-        messages.error(request, "Profil employé non trouvé.")
-        return redirect('login')
-    
-    payslips = SalaryCalculation.objects.filter(employee=employee).order_by('-year', '-month')
+    employee = request.employee
     
-    # Filtrage par année si spécifié
+    calculations = SalaryCalculation.objects.filter(employee=employee)
     year_filter = request.GET.get('year')
-    if year_filter:
-        payslips = payslips.filter(year=int(year_filter))
     
-    context = {
-        'payslips': payslips,
-        'available_years': SalaryCalculation.objects.filter(
-            employee=employee
-        ).values_list('year', flat=True).distinct().order_by('-year'),
-        'selected_year': year_filter,
-    }
+    # Toutes les lignes de l'employé : la liste des années en dépend aussi
+    etag, last_modified = page_validators(request, salary_rows_state(calculations))
     
-    return render(request, 'employees/payslips.html', context)
+    def render_page():
+        payslips = calculations.order_by('-year', '-month')
+        
+        # Filtrage par année si spécifié
+        if year_filter:
+            payslips = payslips.filter(year=int(year_filter))
+        
+        context = {
+            'payslips': payslips,
+            'available_years': calculations.values_list('year', flat=True).distinct().order_by('-year'),
+            'selected_year': year_filter,
+        }
+        return render(request, 'employees/payslips.html', context)
+    
+    return conditional_response(request, etag, last_modified, render_page)
 
 
-@login_required
+@role_required()
 def download_payslip(request, year, month):
-    """Téléchargement du bulletin de paie en PDF (version simplifiée)"""
-    try:
-        employee = request.user.employee_profile
-    except Employee.DoesNotExist:
-        messages.error(request, "Profil employé non trouvé.")
-        return redirect('login')
+    """Téléchargement du bulletin de paie en PDF (servi depuis le cache disque)"""
+    employee = request.employee
     
-    try:
-        payslip = SalaryCalculation.objects.get(
-            employee=employee,
-            year=year,
-            month=month
-        )
-    except SalaryCalculation.DoesNotExist:
+    payslip = SalaryCalculation.objects.filter(
+        employee=employee,
+        year=year,
+        month=month
+    ).values(*PAYSLIP_FIELDS, 'updated_at').first()
+    if payslip is None:
         messages.error(request, "Bulletin de paie non trouvé.")
         return redirect('employees:payslips')
     
-    # Génération d'un fichier texte simple (en attendant reportlab)
-    content = f"""
-BULLETIN DE PAIE
-================
-
-Nom: {employee.user.first_name} {employee.user.last_name}
-ID Employé: {employee.employee_id}
-Département: {employee.department.name}
-Période: {calendar.month_name[month]} {year}
-
-DÉTAILS DU SALAIRE
-==================
-Salaire de base: {payslip.base_salary:,.2f} €
-Pourcentage de présence: {payslip.attendance_percentage}%
-Déduction (si < 75%): {payslip.deduction_amount:,.2f} €
-
-SALAIRE NET: {payslip.net_salary:,.2f} €
-
-Généré le: {datetime.now().strftime('%d/%m/%Y à %H:%M')}
-    """
-    
-    response = HttpResponse(content, content_type='text/plain; charset=utf-8')
-    response['Content-Disposition'] = f'attachment; filename="payslip_{employee.employee_id}_{year}_{month:02d}.txt"'
-    
-    return response
+    # Le hash des valeurs imprimées identifie déjà le PDF : c'est un ETag fort
+    return conditional_response(
+        request,
+        quote_etag(payslip_digest(payslip)),
+        payslip['updated_at'],
+        lambda: FileResponse(
+            cached_payslip(payslip),
+            as_attachment=True,
+            filename=payslip_filename(employee.employee_id, year, month),
+            content_type='application/pdf',
+        ),
+    )
 
 
-def get_monthly_attendance_stats():
-    """Statistiques mensuelles de présence pour HR"""
-    current_month = datetime.now().month
-    current_year = datetime.now().year
+def get_monthly_attendance_stats(year=None, month=None):
+    """Statistiques mensuelles de présence pour HR (mois courant par défaut)"""
+    current_month = month or datetime.now().month
+    current_year = year or datetime.now().year
     
-    attendances = Attendance.objects.filter(
-        date__year=current_year,
-        date__month=current_month
+    totals = AttendanceMonthlySummary.objects.filter(
+        year=current_year,
+        month=current_month
+    ).aggregate(
+        total=Sum('total'),
+        present=Sum('present'),
+        absent=Sum('absent'),
+        half_day=Sum('half_day'),
+        leave=Sum('leave'),
     )
     
-    total_days = attendances.count()
-    present_days = attendances.filter(status='PRESENT').count()
-    absent_days = attendances.filter(status='ABSENT').count()
-    half_days = attendances.filter(status='HALF_DAY').count()
-    leave_days = attendances.filter(status='LEAVE').count()
+    total_days = totals['total'] or 0
+    present_days = totals['present'] or 0
+    absent_days = totals['absent'] or 0
+    half_days = totals['half_day'] or 0
+    leave_days = totals['leave'] or 0
     
     return {
         'total': total_days,
@@ -144,19 +135,40 @@ def get_monthly_attendance_stats():
 
 def get_department_stats(department):
     """Statistiques du département pour Manager"""
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-    
-    department_employees = Employee.objects.filter(department=department, is_active=True)
-    attendances = Attendance.objects.filter(
+    return {
+        'total_employees': Employee.objects.filter(department=department, is_active=True).count(),
+        **department_attendance_totals(department),
+    }
+
+
+def department_attendance_totals(department):
+    """Totaux de présence du mois courant pour un département"""
+    totals = AttendanceMonthlySummary.objects.filter(
         employee__department=department,
-        date__year=current_year,
-        date__month=current_month
+        year=datetime.now().year,
+        month=datetime.now().month
+    ).aggregate(
+        total=Sum('total'),
+        present=Sum('present'),
+        absent=Sum('absent'),
     )
     
     return {
-        'total_employees': department_employees.count(),
-        'total_attendances': attendances.count(),
-        'present_days': attendances.filter(status='PRESENT').count(),
-        'absent_days': attendances.filter(status='ABSENT').count(),
+        'total_attendances': totals['total'] or 0,
+        'present_days': totals['present'] or 0,
+        'absent_days': totals['absent'] or 0,
     }
+
+
+async def aget_monthly_attendance_stats(year=None, month=None):
+    """Version asynchrone de get_monthly_attendance_stats"""
+    return await run_query(get_monthly_attendance_stats, year, month)
+
+
+async def aget_department_stats(department):
+    """Version asynchrone de get_department_stats : effectif et totaux calculés en parallèle"""
+    total_employees, totals = await asyncio.gather(
+        run_query(Employee.objects.filter(department=department, is_active=True).count),
+        run_query(department_attendance_totals, department),
+    )
+    return {'total_employees': total_employees, **totals}
@@ -9,6 +9,7 @@ from datetime import datetime, date
 from decimal import Decimal
 from employees.models import Employee, SalaryCalculation
 from attendance.models import Attendance
+from attendance.periods import month_filter
 
 
 class Command(BaseCommand):
@@ -80,8 +81,7 @@ class Command(BaseCommand):
                 # Calculer le pourcentage de présence
                 attendances = Attendance.objects.filter(
                     employee=emp,
-                    date__year=year,
-                    date__month=month
+                    **month_filter(year, month)
                 )
                 
                 total_days = attendances.count()
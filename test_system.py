@@ -16,6 +16,7 @@ django.setup()
 from django.contrib.auth.models import User
 from employees.models import Employee, Department
 from attendance.models import Attendance
+from attendance.periods import month_filter
 
 def test_database():
     """Tester la base de données"""
@@ -60,8 +61,7 @@ def test_attendance_calculation():
     for emp in employees[:3]:  # Tester seulement les 3 premiers
         attendances = Attendance.objects.filter(
             employee=emp,
-            date__year=current_year,
-            date__month=current_month
+            **month_filter(current_year, current_month)
         )
         
         total_days = attendances.count()